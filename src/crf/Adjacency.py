@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Compressed sparse row adjacency of the nodes of a graph
+
+    Copyright Xerox(C) 2016 JL. Meunier
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+    Developed  for the EU project READ. The READ project has received funding
+    from the European Union's Horizon 2020 research and innovation programme
+    under grant agreement No 674943.
+
+"""
+import numpy as np
+
+
+class Adjacency(object):
+    """
+    The adjacency of the nodes of a graph, for one type of (undirected) edge, in compressed sparse row (CSR) format:
+        the neighbors of node i are indices[indptr[i]:indptr[i+1]]
+    
+    The neighbors of a node are in the order of the edges, as if we were appending each edge (A, B) to the list 
+    of neighbors of A and then to the one of B.
+    """
+    
+    def __init__(self, nNode, aA, aB):
+        """
+        nNode is the number of nodes
+        aA, aB are the arrays of node indices of the edges, both ends being neighbors of each other
+        """
+        aA, aB = np.asarray(aA, dtype=np.int32), np.asarray(aB, dtype=np.int32)
+        #interleaving both directions, so that a stable sort keeps the order of the edges
+        aSrc = np.column_stack([aA, aB]).ravel()
+        aTgt = np.column_stack([aB, aA]).ravel()
+        aOrder = np.argsort(aSrc, kind='mergesort')
+        self.indices = aTgt[aOrder]
+        self.indptr  = np.zeros(nNode+1, dtype=np.int64)
+        np.cumsum(np.bincount(aSrc, minlength=nNode), out=self.indptr[1:])
+    
+    def __len__(self):
+        return len(self.indptr) - 1
+    
+    def getDegree(self):
+        """
+        return the array of number of neighbors of each node
+        """
+        return np.diff(self.indptr)
+    
+    def getNeighbors(self, i):
+        """
+        return the array of the neighbor indices of the i-th node
+        """
+        return self.indices[self.indptr[i]:self.indptr[i+1]]
+    
+    def getRowIndices(self):
+        """
+        return for each entry of the indices array the node it belongs to
+        """
+        return np.repeat(np.arange(len(self), dtype=np.int32), self.getDegree())
+    
+    def countNeighbors(self, aValue, fun_compare=np.greater):
+        """
+        aValue is an array with one value per node
+        return for each node the number of its neighbors B such that fun_compare(aValue[B], aValue[node]) 
+            e.g. by default, the number of neighbors with a greater value
+        """
+        aValue = np.asarray(aValue)
+        aRow = self.getRowIndices()
+        aOk = fun_compare(aValue[self.indices], aValue[aRow])
+        return np.bincount(aRow[aOk], minlength=len(self))
+    
+    # --- several graphs -----------------------------------------------------------
+    @classmethod
+    def concat(cls, lAdjacency):
+        """
+        Concatenate the adjacencies of several graphs into the adjacency of their disjoint union
+        return a new adjacency
+        """
+        adj = cls.__new__(cls)
+        lNodeOffset = np.cumsum([0] + [len(a)          for a in lAdjacency])
+        lEntryOffset= np.cumsum([0] + [len(a.indices) for a in lAdjacency])
+        adj.indices = np.hstack([np.zeros(0, dtype=np.int32)] 
+                                + [a.indices + iOff for a, iOff in zip(lAdjacency, lNodeOffset)]).astype(np.int32)
+        adj.indptr  = np.hstack([np.zeros(1, dtype=np.int64)] 
+                                + [a.indptr[1:] + iOff for a, iOff in zip(lAdjacency, lEntryOffset)]).astype(np.int64)
+        return adj
+
+
+# --- AUTO-TESTS ------------------------------------------------------------------
+def test_Adjacency():
+    adj = Adjacency(5, [0, 3, 0, 1], [1, 0, 2, 2])
+    assert len(adj) == 5
+    assert adj.getDegree().tolist() == [3, 2, 2, 1, 0]
+    assert [adj.getNeighbors(i).tolist() for i in range(5)] == [[1, 3, 2], [0, 2], [0, 1], [0], []]
+    assert adj.countNeighbors([0, 1, 2, 3, 4]).tolist() == [3, 1, 0, 0, 0]
+    assert adj.countNeighbors([0, 1, 2, 3, 4], np.less).tolist() == [0, 1, 2, 1, 0]
+
+    adj2 = Adjacency.concat([adj, Adjacency(0, [], []), Adjacency(2, [1], [0]), adj])
+    assert len(adj2) == 12
+    assert [adj2.getNeighbors(i).tolist() for i in range(12)] == [[1, 3, 2], [0, 2], [0, 1], [0], []
+                                                                , [6], [5]
+                                                                , [8, 10, 9], [7, 9], [7, 8], [7], []]
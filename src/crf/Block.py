@@ -14,16 +14,26 @@ Copyright Xerox 2016
 
 import collections, types
 
+import numpy as np
+
 from common.trace import traceln
 
 import Edge
+from NeighborFinder import NeighborFinder
+from GridIndex import GridIndex
 # from Edge import CrossPageEdge, HorizontalEdge, VerticalEdge
 
 DEBUG=0
 DEBUG=1
 
 
-class Block:
+class Block(object):
+    
+    #slots instead of a per-instance dictionary, to save memory on large collections
+    #(the graph also offers a columnar view of its nodes, see NodeTable)
+    __slots__ = ( "pnum", "x1", "y1", "x2", "y2", "text", "orientation", "node", "domid", "cls", "type"
+                , "fontsize", "sconf"
+                , "page", "index")
         
     def __init__(self,pnum, (x, y, w, h), text, orientation, cls, nodeType, domnode=None, domid=None):
         """
@@ -48,15 +58,16 @@ class Block:
         self.fontsize = 0.0 #new in loader v04
         self.sconf = "" #new in v08
         
-        #neighbouring relationship
-        self.lHNeighbor     = None
-        self.lVNeighbor     = None
-        self.lCPNeighbor    = None
-
         #container
         self.page = None
         
 
+    def __getstate__(self):
+        return { s:getattr(self, s) for s in self.__slots__ if hasattr(self, s) }
+    
+    def __setstate__(self, dState):
+        for s, v in dState.items(): setattr(self, s, v)
+        
     def setFontSize(self, fFontSize):
         self.fontsize = fFontSize
     
@@ -222,6 +233,29 @@ class Block:
     def findPageNeighborEdges(cls, lBlk, bShortOnly=False):
         """
         find neighboring edges, horizontal and vertical ones
+        (same edges as findPageNeighborEdges_reference, but faster, and the blocks are not modified)
+        """
+        tH, tV = cls.findPageNeighborIndices(lBlk, bShortOnly)
+        
+        lHEdge, lVEdge = [ [EdgeClass(lBlk[a], lBlk[b], length) for a, b, length in zip(aA.tolist(), aB.tolist(), aLength.tolist())]
+                                for EdgeClass, (aA, aB, aLength) in [(Edge.HorizontalEdge, tH), (Edge.VerticalEdge, tV)] ]
+        return lHEdge, lVEdge
+    findPageNeighborEdges = classmethod(findPageNeighborEdges)
+    
+    def findPageNeighborIndices(cls, lBlk, bShortOnly=False):
+        """
+        find neighboring edges, horizontal and vertical ones
+        return (horizontal edges, vertical edges), each being a tuple of arrays (source indices, target indices, lengths)
+            the indices being those of the blocks in lBlk
+        """
+        aBB = np.array([blk.getBB() for blk in lBlk], dtype=np.float64).reshape( (len(lBlk), 4) )
+        return NeighborFinder.findPageNeighbors(aBB[:,0], aBB[:,1], aBB[:,2], aBB[:,3], bShortOnly)
+    findPageNeighborIndices = classmethod(findPageNeighborIndices)
+    
+    def findPageNeighborEdges_reference(cls, lBlk, bShortOnly=False):
+        """
+        find neighboring edges, horizontal and vertical ones
+        (original pure-Python implementation, kept as reference for tests and benchmarks)
         """
         #look for vertical neighbors
         lVEdge = cls._findVerticalNeighborEdges(lBlk, Edge.VerticalEdge, bShortOnly)
@@ -232,12 +266,53 @@ class Block:
         for blk in lBlk: blk.rotatePlus90deg()         #restore orientation :-)
         
         return lHEdge, lVEdge
-    findPageNeighborEdges = classmethod(findPageNeighborEdges)
+    findPageNeighborEdges_reference = classmethod(findPageNeighborEdges_reference)
     
     # ---- Internal stuff ---
     def findConsecPageOverlapEdges(cls, lPrevPageEdgeBlk, lPageBlk, epsilon = 1):
         """
         find block that overlap from a page to the other, and have same orientation
+        
+        The blocks of the previous page are indexed in a grid, one per orientation, so that significantOverlap is 
+        called only for pairs of blocks whose bounding boxes intersect.
+        (same edges, in same order, as findConsecPageOverlapEdges_reference)
+        """
+        aA, aB = cls.findConsecPageOverlapIndices(lPrevPageEdgeBlk, lPageBlk, epsilon)
+        return [Edge.CrossPageEdge(lPrevPageEdgeBlk[i], lPageBlk[j]) for i, j in zip(aA.tolist(), aB.tolist())]
+    findConsecPageOverlapEdges = classmethod(findConsecPageOverlapEdges)
+    
+    def findConsecPageOverlapIndices(cls, lPrevPageEdgeBlk, lPageBlk, epsilon = 1):
+        """
+        find block that overlap from a page to the other, and have same orientation
+        return 2 arrays: indices in lPrevPageEdgeBlk, indices in lPageBlk
+        """
+        #one spatial index per orientation
+        dlPrevIndex = collections.defaultdict(list)
+        for i, prevBlk in enumerate(lPrevPageEdgeBlk): dlPrevIndex[prevBlk.orientation].append(i)
+        dGrid = dict()
+        for orient, lIndex in dlPrevIndex.items():
+            aBB = np.array([lPrevPageEdgeBlk[i].getBB() for i in lIndex], dtype=np.float64)
+            dGrid[orient] = GridIndex(aBB[:,0], aBB[:,1], aBB[:,2], aBB[:,3])
+        
+        lPair = list()
+        for j, blk in enumerate(lPageBlk):
+            try:
+                grid, lIndex = dGrid[blk.orientation], dlPrevIndex[blk.orientation]
+            except KeyError:
+                continue
+            for k in grid.query(blk.x1, blk.y1, blk.x2, blk.y2):
+                i = lIndex[k]
+                if lPrevPageEdgeBlk[i].significantOverlap(blk): lPair.append( (i, j) )
+        lPair.sort()    #as in the N^2 brute force
+        
+        aPair = np.array(lPair, dtype=np.int32).reshape( (len(lPair), 2) )
+        return aPair[:,0], aPair[:,1]
+    findConsecPageOverlapIndices = classmethod(findConsecPageOverlapIndices)
+    
+    def findConsecPageOverlapEdges_reference(cls, lPrevPageEdgeBlk, lPageBlk, epsilon = 1):
+        """
+        find block that overlap from a page to the other, and have same orientation
+        (original N^2 implementation, kept as reference for tests)
         """
         
         #N^2 brute force
@@ -290,7 +365,7 @@ class Block:
 #         cls.checkThisAlgo(timeAlgo, lEdge, lPrevPageEdgeBlk, lPageBlk, epsilon)
         
         return lEdge 
-    findConsecPageOverlapEdges = classmethod(findConsecPageOverlapEdges)
+    findConsecPageOverlapEdges_reference = classmethod(findConsecPageOverlapEdges_reference)
     
     # ------------------------------------------------------------------------------------------------------------------------------------        
     def rotateMinus90deg(self):
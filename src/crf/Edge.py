@@ -11,6 +11,8 @@ Copyright Xerox 2016
 
 '''
 
+import numpy as np
+
 import Block
 
 DEBUG=0
@@ -59,6 +61,38 @@ class Edge:
         return lAllEdge
     computeEdges = classmethod(computeEdges)
 
+    def computeEdgeArrays(cls, lPrevPageEdgeBlk, lPageBlk, bShortOnly=False):
+        """
+        same edges as computeEdges, in same order, but as arrays, without creating any Edge object
+        
+        The node indices are those of the nodes in the list lPrevPageEdgeBlk + lPageBlk
+        return 4 arrays: source node indices, target node indices, edge type codes (see lEDGE_CLASS), edge lengths
+            (the length of a cross-page edge is 0)
+        """
+        nPrev = len(lPrevPageEdgeBlk) if lPrevPageEdgeBlk else 0
+        
+        #--- horizontal and vertical neighbors
+        tH, tV = Block.Block.findPageNeighborIndices(lPageBlk, bShortOnly)
+        if DEBUG: 
+            cls.dbgStorePolyLine("neighbors", [HorizontalEdge(lPageBlk[a], lPageBlk[b], 0) for a, b in zip(tH[0].tolist(), tH[1].tolist())])
+            cls.dbgStorePolyLine("neighbors", [VerticalEdge  (lPageBlk[a], lPageBlk[b], 0) for a, b in zip(tV[0].tolist(), tV[1].tolist())])
+        lA, lB = [tH[0] + nPrev, tV[0] + nPrev], [tH[1] + nPrev, tV[1] + nPrev]
+        lType  = [np.full(len(tH[0]), lEDGE_CLASS.index(HorizontalEdge), dtype=np.int8)
+                  , np.full(len(tV[0]), lEDGE_CLASS.index(VerticalEdge), dtype=np.int8)]
+        lLength= [tH[2], tV[2]]
+        
+        #--- overlap with previous page
+        if lPrevPageEdgeBlk:
+            aA, aB = Block.Block.findConsecPageOverlapIndices(lPrevPageEdgeBlk, lPageBlk)
+            lA.append(aA)
+            lB.append(aB + nPrev)
+            lType.append(np.full(len(aA), lEDGE_CLASS.index(CrossPageEdge), dtype=np.int8))
+            lLength.append(np.zeros(len(aA), dtype=np.float64))
+            
+        return (np.hstack(lA).astype(np.int32), np.hstack(lB).astype(np.int32)
+                , np.hstack(lType), np.hstack(lLength).astype(np.float64))
+    computeEdgeArrays = classmethod(computeEdgeArrays)
+
     def dbgStorePolyLine(cls, sAttr, lEdge):
         """
         Store a polyline in the given attribute
@@ -92,3 +126,6 @@ class HorizontalEdge(SamePageEdge): pass
 
 class VerticalEdge(SamePageEdge): pass    
 
+#The types of edge of our graphs, the index in this list being the edge type code
+lEDGE_CLASS = [HorizontalEdge, VerticalEdge, CrossPageEdge]
+
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Columnar representation of the edges of a graph
+
+    Copyright Xerox(C) 2016 JL. Meunier
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+    Developed  for the EU project READ. The READ project has received funding
+    from the European Union's Horizon 2020 research and innovation programme
+    under grant agreement No 674943.
+
+"""
+import numpy as np
+
+import Edge
+from NodeTable import NodeTable
+
+
+class EdgeTable(object):
+    """
+    The edges of a graph, as arrays:
+        A, B        int32   index of the source and target nodes, in the node list
+        type        int8    edge type code, i.e. index of the edge class in Edge.lEDGE_CLASS
+        length      float64 length of the edge (0 for cross-page edges)
+
+    The table also behaves as the list of its edges. The Edge objects are created on demand (e.g. for debugging), 
+    and are not kept. Edges can be appended, provided that their nodes are in the node list.
+    """
+
+    def __init__(self, lNode, aA=None, aB=None, aType=None, aLength=None):
+        """
+        lNode is the list of nodes (or a NodeTable), the node indices refer to
+        no array means no edge
+        """
+        self.lNode  = lNode
+        self.A      = np.zeros(0, dtype=np.int32)   if aA      is None else np.asarray(aA     , dtype=np.int32)
+        self.B      = np.zeros(0, dtype=np.int32)   if aB      is None else np.asarray(aB     , dtype=np.int32)
+        self.type   = np.zeros(0, dtype=np.int8)    if aType   is None else np.asarray(aType  , dtype=np.int8)
+        self.length = np.zeros(0, dtype=np.float64) if aLength is None else np.asarray(aLength, dtype=np.float64)
+        assert len(self.A) == len(self.B) == len(self.type) == len(self.length), "Internal error: edge arrays of different lengths"
+
+    @classmethod
+    def fromEdgeList(cls, lNode, lEdge):
+        """
+        make the table of a list of Edge objects, whose nodes are in lNode
+        """
+        dIndex = { id(nd):i for i, nd in enumerate(lNode) }
+        return cls(lNode
+                   , [dIndex[id(edge.A)] for edge in lEdge]
+                   , [dIndex[id(edge.B)] for edge in lEdge]
+                   , [Edge.lEDGE_CLASS.index(edge.__class__) for edge in lEdge]
+                   , [getattr(edge, "length", 0.0) for edge in lEdge])
+
+    # --- list-like behavior ------------------------------------------------------
+    def __len__(self):
+        return len(self.A)
+
+    def __getitem__(self, i):
+        return self._makeEdge(self.A[i], self.B[i], self.type[i], self.length[i])
+
+    def __iter__(self):
+        for iA, iB, iType, length in zip(self.A.tolist(), self.B.tolist(), self.type.tolist(), self.length.tolist()):
+            yield self._makeEdge(iA, iB, iType, length)
+
+    def append(self, edge):
+        self.extend([edge])
+        
+    def extend(self, lEdge):
+        """
+        append these Edge objects (or the edges of another table on the same nodes), whose nodes are in the node list
+        """
+        if isinstance(lEdge, EdgeTable):
+            assert lEdge.lNode is self.lNode, "Internal error: not the same nodes"
+            tbl = lEdge
+        else:
+            lEdge = list(lEdge)
+            dIndex = self._getNodeIndex()
+            tbl = EdgeTable(self.lNode
+                           , [dIndex[id(edge.A)] for edge in lEdge]
+                           , [dIndex[id(edge.B)] for edge in lEdge]
+                           , [Edge.lEDGE_CLASS.index(edge.__class__) for edge in lEdge]
+                           , [getattr(edge, "length", 0.0) for edge in lEdge])
+        self.A      = np.hstack([self.A     , tbl.A])
+        self.B      = np.hstack([self.B     , tbl.B])
+        self.type   = np.hstack([self.type  , tbl.type])
+        self.length = np.hstack([self.length, tbl.length])
+
+    def _getNodeIndex(self):
+        """
+        return the dictionary id(node) --> index in the node list, updated if nodes were added to the list
+        """
+        try:
+            dIndex = self._dNodeIndex
+        except AttributeError:
+            dIndex = self._dNodeIndex = dict()
+        for i in range(len(dIndex), len(self.lNode)):
+            dIndex[id(self.lNode[i])] = i
+        return dIndex
+    
+    def _makeEdge(self, iA, iB, iType, length):
+        cEdge = Edge.lEDGE_CLASS[iType]
+        if issubclass(cEdge, Edge.SamePageEdge):
+            return cEdge(self.lNode[iA], self.lNode[iB], float(length))
+        else:
+            return cEdge(self.lNode[iA], self.lNode[iB])
+
+    # --- columns --------------------------------------------------------------------
+    def getEdgeMatrix(self):
+        """
+        return the 2-columns matrix of the source and target node indices
+        """
+        return np.column_stack([self.A, self.B]).reshape( (len(self), 2) )
+
+    def getTypeMask(self, cEdgeClass):
+        """
+        return the boolean array of the edges of that class
+        """
+        return self.type == Edge.lEDGE_CLASS.index(cEdgeClass)
+
+    def withNodes(self, lNode):
+        """
+        return an edge table with same edges (sharing the arrays), referring to another list of the same nodes, 
+            e.g. to the NodeTable of the graph
+        """
+        assert len(lNode) == len(self.lNode), "Internal error: not the same nodes"
+        return self.__class__(lNode, self.A, self.B, self.type, self.length)
+    
+    # --- several graphs -----------------------------------------------------------
+    @classmethod
+    def concat(cls, lTable, lNode=None):
+        """
+        Concatenate several edge tables (e.g. one per graph) into one, referring to the concatenation of their nodes
+            (or to NodeTable.concat of their node tables, if they all refer to a NodeTable)
+        lNode is this concatenation of the nodes, if already done by the caller
+        return a new edge table
+        """
+        if lNode is not None:
+            assert len(lNode) == sum(len(t.lNode) for t in lTable), "Internal error: not the concatenated nodes"
+        elif lTable and all(isinstance(t.lNode, NodeTable) for t in lTable):
+            lNode = NodeTable.concat([t.lNode for t in lTable])
+        else:
+            lNode = [nd for t in lTable for nd in t.lNode]
+        lNodeOffset = np.cumsum([0] + [len(t.lNode) for t in lTable])
+        return cls(lNode
+                   , np.hstack([np.zeros(0, dtype=np.int32)] + [t.A + iOff for t, iOff in zip(lTable, lNodeOffset)])
+                   , np.hstack([np.zeros(0, dtype=np.int32)] + [t.B + iOff for t, iOff in zip(lTable, lNodeOffset)])
+                   , np.hstack([np.zeros(0, dtype=np.int8)]  + [t.type   for t in lTable])
+                   , np.hstack([np.zeros(0, dtype=np.float64)] + [t.length for t in lTable]))
+
+
+# --- AUTO-TESTS ------------------------------------------------------------------
+def test_EdgeTable():
+    from Block import Block
+    lNode = [Block(1, (i, 0, 1, 1), "t%d"%i, 0, 0, None) for i in range(4)]
+    lEdge = [Edge.VerticalEdge(lNode[0], lNode[1], 3.5), Edge.CrossPageEdge(lNode[1], lNode[3]), Edge.HorizontalEdge(lNode[2], lNode[0], 2)]
+    tbl = EdgeTable.fromEdgeList(lNode, lEdge)
+    assert len(tbl) == 3
+    assert tbl.getEdgeMatrix().tolist() == [[0, 1], [1, 3], [2, 0]]
+    assert tbl.getTypeMask(Edge.CrossPageEdge).tolist() == [False, True, False]
+    assert [(e.__class__, e.A, e.B, getattr(e, "length", None)) for e in tbl] == [(e.__class__, e.A, e.B, getattr(e, "length", None)) for e in lEdge]
+    assert tbl[2].B is lNode[0] and tbl[2].length == 2
+
+    tbl2 = EdgeTable.concat([tbl, EdgeTable(lNode[:1]), tbl])
+    assert len(tbl2.lNode) == 9 and len(tbl2) == 6
+    assert tbl2.getEdgeMatrix().tolist() == [[0, 1], [1, 3], [2, 0], [5, 6], [6, 8], [7, 5]]
+    assert tbl2[4].B is lNode[3]
+    assert len(EdgeTable.concat([])) == 0
+    
+    tbl3 = EdgeTable(lNode[:2])
+    tbl3.append(lEdge[0])
+    lNode2 = tbl3.lNode
+    lNode2.extend(lNode[2:])
+    tbl3.extend(lEdge[1:])
+    tbl3.extend(EdgeTable.fromEdgeList(lNode2, lEdge[:1]))
+    assert tbl3.getEdgeMatrix().tolist() == [[0, 1], [1, 3], [2, 0], [0, 1]]
+    assert tbl3.type.dtype == np.int8 and [e.__class__ for e in tbl3] == [e.__class__ for e in lEdge+lEdge[:1]]
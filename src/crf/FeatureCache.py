@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+"""
+    A disk cache of the feature matrices of graphs, to avoid computing again and again the same features
+
+    Copyright Xerox(C) 2016 JL. Meunier
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+    Developed  for the EU project READ. The READ project has received funding
+    from the European Union's Horizon 2020 research and innovation programme
+    under grant agreement No 674943.
+
+"""
+import os
+import hashlib
+import shutil
+import tempfile
+
+import numpy as np
+import scipy.sparse as sp
+
+from common.trace import traceln
+
+from GraphCache import GraphCache
+
+
+class FeatureCache(GraphCache):
+    """
+    A folder containing one entry per (XML file, graph configuration, fitted transformers).
+    
+    An entry is a sub-folder with one .npy file per array of the (node_features, edges, edge_features) of the graph,
+    a sparse feature matrix being stored as its 3 CSR arrays and its shape.
+    The arrays are loaded memory-mapped (read-only), so that they are read from the OS page cache and shared between 
+    the processes that use the same features, e.g. repeated training or test runs.
+    
+    The key of an entry is the graph cache key of the file (content of the file, graph class and node types) combined 
+    with a fingerprint of the fitted transformers (see Model.getTransformerFingerprint).
+    """
+    iVERSION    = 1         #change it when changing the format of the entries
+    sEXT        = ".features"
+    
+    lMATRIX     = ["node_features", "edges", "edge_features"]
+    
+    # --- Keys ------------------------------------------------------------------------
+    def getKey(self, cGraphClass, sFilename, sTransformerFingerprint):
+        """
+        return the key of the entry for this file, given the graph class and the fingerprint of the transformers
+        """
+        md5 = hashlib.md5()
+        md5.update(GraphCache.getKey(self, cGraphClass, sFilename))
+        md5.update(sTransformerFingerprint)
+        return md5.hexdigest()
+
+    # --- Load / Save -----------------------------------------------------------------
+    def load(self, graph, sFilename, sTransformerFingerprint):
+        """
+        Look for the features of the graph of this file in the cache
+        return the tuple (node_features, edges, edge_features) of memory-mapped arrays, or None if no entry exists
+        """
+        sEntryDir = self.getEntryFilename(self.getKey(graph.__class__, sFilename, sTransformerFingerprint))
+        X = None
+        if os.path.isdir(sEntryDir):
+            try:
+                X = tuple(self._loadMatrix(sEntryDir, sName) for sName in self.lMATRIX)
+            except Exception as e:
+                traceln("\t- WARNING: ignoring corrupted feature cache entry %s: %s"%(sEntryDir, e))
+                X = None
+        if X is None:
+            self.nMiss += 1
+        else:
+            self.nHit += 1
+        return X
+
+    def save(self, graph, sFilename, sTransformerFingerprint, X):
+        """
+        Store the features X=(node_features, edges, edge_features) of the graph of this file in the cache
+        return the entry folder
+        """
+        sEntryDir = self.getEntryFilename(self.getKey(graph.__class__, sFilename, sTransformerFingerprint))
+        #write then rename, so that concurrent readers never see a partial entry
+        sTmpDir = tempfile.mkdtemp(suffix=".tmp", dir=self.sDir)
+        for sName, M in zip(self.lMATRIX, X): self._saveMatrix(sTmpDir, sName, M)
+        try:
+            os.rename(sTmpDir, sEntryDir)
+        except OSError:
+            #another process stored the same entry meanwhile
+            shutil.rmtree(sTmpDir, True)
+        return sEntryDir
+
+    # --- Matrices ------------------------------------------------------------------
+    def _saveMatrix(cls, sDir, sName, M):
+        if sp.issparse(M):
+            M = M.tocsr()
+            for sArray, a in [("data", M.data), ("indices", M.indices), ("indptr", M.indptr), ("shape", np.array(M.shape))]:
+                np.save(os.path.join(sDir, "%s.%s.npy"%(sName, sArray)), a)
+        else:
+            np.save(os.path.join(sDir, sName+".npy"), np.asarray(M))
+    _saveMatrix = classmethod(_saveMatrix)
+
+    def _loadMatrix(cls, sDir, sName):
+        sFilename = os.path.join(sDir, sName+".npy")
+        if os.path.exists(sFilename): return np.load(sFilename, mmap_mode='r')
+        data, indices, indptr = [np.load(os.path.join(sDir, "%s.%s.npy"%(sName, sArray)), mmap_mode='r') for sArray in ("data", "indices", "indptr")]
+        shape = tuple(np.load(os.path.join(sDir, sName+".shape.npy")).tolist())
+        return sp.csr_matrix( (data, indices, indptr), shape=shape, copy=False)
+    _loadMatrix = classmethod(_loadMatrix)
+
+
+# --- AUTO-TESTS ------------------------------------------------------------------
+def test_FeatureCache():
+    sDir = tempfile.mkdtemp()
+    try:
+        X = (np.arange(12, dtype=np.float64).reshape(3, 4), np.array([[0, 1], [1, 2]]), sp.csr_matrix(np.eye(2, 5)))
+        for sName, M in zip(FeatureCache.lMATRIX, X): FeatureCache._saveMatrix(sDir, sName, M)
+        X2 = [FeatureCache._loadMatrix(sDir, sName) for sName in FeatureCache.lMATRIX]
+        assert np.array_equal(X2[0], X[0]) and np.array_equal(X2[1], X[1])
+        assert sp.issparse(X2[2]) and np.array_equal(X2[2].toarray(), X[2].toarray())
+        assert isinstance(X2[0], np.memmap)
+    finally:
+        shutil.rmtree(sDir, True)
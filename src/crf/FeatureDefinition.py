@@ -27,6 +27,10 @@
     
 """
 
+from EdgeTable import EdgeTable
+from NodeTable import NodeTable
+from PartialFit import PartialFit
+
 class FeatureDefinition:
     """
     A class to sub-class to define which features from a Tranformer class, you want for node and edges
@@ -44,16 +48,33 @@ class FeatureDefinition:
         Fit the transformers using the graphs
         return True 
         """
-        lAllNode = [nd for g in lGraph for nd in g.lNode]
+        lAllNode = NodeTable.concat([g.getNodeTable() for g in lGraph])
         self._node_transformer.fit(lAllNode)
-        del lAllNode #trying to free the memory!
         
-        lAllEdge = [edge for g in lGraph for edge in g.lEdge]
+        #the edges refer to the same node table, so that the node text n-grams are computed once 
+        lAllEdge = EdgeTable.concat([g.lEdge for g in lGraph], lAllNode)
         self._edge_transformer.fit(lAllEdge)
-        del lAllEdge
+        del lAllEdge, lAllNode #trying to free the memory!
         
         return True
 
+    def fitTranformersStreaming(self, iterGraph):
+        """
+        Fit the transformers graph by graph, e.g. using a generator of graphs loaded one at a time from disk (see 
+        Graph.iterGraphs), so that neither all the graphs nor the concatenation of their nodes and edges are in memory.
+        The fitted transformers are those of fitTranformers (up to floating-point rounding for the scalers). 
+        return True 
+        """
+        lPartialFit = [PartialFit.make(trans) for trans in (self._node_transformer, self._edge_transformer)]
+        fitNode, fitEdge = lPartialFit
+        for g in iterGraph:
+            tblNode = g.getNodeTable()
+            if fitNode: fitNode.partial_fit(tblNode)
+            if fitEdge: fitEdge.partial_fit(g.lEdge.withNodes(tblNode))
+        for o in lPartialFit: 
+            if o: o.finish()
+        return True
+
     def cleanTransformers(self):
         """
         Some extractors/transfomers keep a large state in memory , which is not required in "production".
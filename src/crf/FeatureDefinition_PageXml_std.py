@@ -27,11 +27,11 @@
 
 import numpy as np
 
-from sklearn.pipeline import Pipeline, FeatureUnion
+from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
-from sklearn.feature_extraction.text import TfidfVectorizer
 
-from crf.Transformer import SparseToDense
+from crf.Transformer import SparseToDense, ThreadedFeatureUnion
+from crf.NgramVectorizer import NodeTextTfidfVectorizer
 from crf.Transformer_PageXml import NodeTransformerTextEnclosed, NodeTransformerTextLen, NodeTransformerXYWH, NodeTransformerNeighbors, Node1HotFeatures
 from crf.Transformer_PageXml import Edge1HotFeatures, EdgeBooleanFeatures, EdgeNumericalSelector, EdgeTransformerSourceText, EdgeTransformerTargetText
 from crf.PageNumberSimpleSequenciality import PageNumberSimpleSequenciality
@@ -41,44 +41,56 @@ from FeatureDefinition import FeatureDefinition
 class FeatureDefinition_PageXml_StandardOnes(FeatureDefinition):
     
     def __init__(self, n_tfidf_node=None, t_ngrams_node=None, b_tfidf_node_lc=None
-                     , n_tfidf_edge=None, t_ngrams_edge=None, b_tfidf_edge_lc=None): 
+                     , n_tfidf_edge=None, t_ngrams_edge=None, b_tfidf_edge_lc=None
+                     , b_sparse=False, n_jobs=1, dtype=np.float64): 
+        """
+        if b_sparse, the TF-IDF features are not densified, and the node and edge feature matrices are scipy.sparse
+            (the CRF model must then accept them, e.g. SparseEdgeFeatureGraphCRF)
+        n_jobs is the number of threads computing the branches of the node and edge feature unions
+        dtype is the type of the features, e.g. np.float32 (or "float32") to halve their memory
+        """
         FeatureDefinition.__init__(self)
         
         self.n_tfidf_node, self.t_ngrams_node, self.b_tfidf_node_lc = n_tfidf_node, t_ngrams_node, b_tfidf_node_lc
         self.n_tfidf_edge, self.t_ngrams_edge, self.b_tfidf_edge_lc = n_tfidf_edge, t_ngrams_edge, b_tfidf_edge_lc
+        self.b_sparse = b_sparse
+        self.n_jobs = n_jobs
+        self.dtype = np.dtype(dtype).type
+        
+        #pystruct needs an array, not a sparse matrix, unless we use the sparse adapter
+        todense = lambda : [] if self.b_sparse else [('todense', SparseToDense())]
 
-        tdifNodeTextVectorizer = TfidfVectorizer(lowercase=self.b_tfidf_node_lc, max_features=self.n_tfidf_node
+        tdifNodeTextVectorizer = NodeTextTfidfVectorizer(lowercase=self.b_tfidf_node_lc, max_features=self.n_tfidf_node
                                                                                   , analyzer = 'char', ngram_range=self.t_ngrams_node #(2,6)
-                                                                                  , dtype=np.float64)
+                                                                                  , dtype=self.dtype)
         
-        node_transformer = FeatureUnion( [  #CAREFUL IF YOU CHANGE THIS - see cleanTransformers method!!!!
+        node_transformer = ThreadedFeatureUnion( [  #CAREFUL IF YOU CHANGE THIS - see cleanTransformers method!!!!
                                     ("text", Pipeline([
                                                        ('selector', NodeTransformerTextEnclosed()),
 #                                                         ('tfidf', TfidfVectorizer(lowercase=self.b_tfidf_node_lc, max_features=self.n_tfidf_node
 #                                                                                   , analyzer = 'char', ngram_range=self.tNODE_NGRAMS #(2,6)
 #                                                                                   , dtype=np.float64)),
                                                        ('tfidf', tdifNodeTextVectorizer), #we can use it separately from the pipleline once fitted
-                                                       ('todense', SparseToDense())  #pystruct needs an array, not a sparse matrix
-                                                       ])
+                                                       ] + todense())
                                      )
                                     , 
                                     ("textlen", Pipeline([
-                                                         ('selector', NodeTransformerTextLen()),
+                                                         ('selector', NodeTransformerTextLen(dtype=self.dtype)),
                                                          ('textlen', StandardScaler(copy=False, with_mean=True, with_std=True))  #use in-place scaling
                                                          ])
                                        )
                                     , ("xywh", Pipeline([
-                                                         ('selector', NodeTransformerXYWH()),
+                                                         ('selector', NodeTransformerXYWH(dtype=self.dtype)),
                                                          ('xywh', StandardScaler(copy=False, with_mean=True, with_std=True))  #use in-place scaling
                                                          ])
                                        )
                                     , ("neighbors", Pipeline([
-                                                         ('selector', NodeTransformerNeighbors()),
+                                                         ('selector', NodeTransformerNeighbors(dtype=self.dtype)),
                                                          ('neighbors', StandardScaler(copy=False, with_mean=True, with_std=True))  #use in-place scaling
                                                          ])
                                        )
                                     , ("1hot", Pipeline([
-                                                         ('1hot', Node1HotFeatures())  #does the 1-hot encoding directly
+                                                         ('1hot', Node1HotFeatures(dtype=self.dtype))  #does the 1-hot encoding directly
                                                          ])
                                        )
 #                                     , ('ocr' , Pipeline([
@@ -94,76 +106,70 @@ class FeatureDefinition_PageXml_StandardOnes(FeatureDefinition):
 #                                                          #THIS ONE MUST BE LAST, because it include a placeholder column for the doculent-level tfidf
 #                                                          ])
 #                                        )                                          
-                                      ])
+                                      ], n_jobs=self.n_jobs)
     
         lEdgeFeature = [  #CAREFUL IF YOU CHANGE THIS - see cleanTransformers method!!!!
                                       ("1hot", Pipeline([
-                                                         ('1hot', Edge1HotFeatures(PageNumberSimpleSequenciality()))
+                                                         ('1hot', Edge1HotFeatures(PageNumberSimpleSequenciality(), dtype=self.dtype))
                                                          ])
                                         )
                                     , ("boolean", Pipeline([
-                                                         ('boolean', EdgeBooleanFeatures())
+                                                         ('boolean', EdgeBooleanFeatures(dtype=self.dtype))
                                                          ])
                                         )
                                     , ("numerical", Pipeline([
-                                                         ('selector', EdgeNumericalSelector()),
+                                                         ('selector', EdgeNumericalSelector(dtype=self.dtype)),
                                                          ('numerical', StandardScaler(copy=False, with_mean=True, with_std=True))  #use in-place scaling
                                                          ])
                                         )
                                     , ("sourcetext0", Pipeline([
                                                        ('selector', EdgeTransformerSourceText(0)),
-                                                       ('tfidf', TfidfVectorizer(lowercase=self.b_tfidf_edge_lc, max_features=self.n_tfidf_edge
+                                                       ('tfidf', NodeTextTfidfVectorizer(lowercase=self.b_tfidf_edge_lc, max_features=self.n_tfidf_edge
                                                                                  , analyzer = 'char', ngram_range=self.t_ngrams_edge  #(2,6)
-                                                                                 , dtype=np.float64)),
-                                                       ('todense', SparseToDense())  #pystruct needs an array, not a sparse matrix
-                                                       ])
+                                                                                 , dtype=self.dtype)),
+                                                       ] + todense())
                                        )
                                     , ("targettext0", Pipeline([
                                                        ('selector', EdgeTransformerTargetText(0)),
-                                                       ('tfidf', TfidfVectorizer(lowercase=self.b_tfidf_edge_lc, max_features=self.n_tfidf_edge
+                                                       ('tfidf', NodeTextTfidfVectorizer(lowercase=self.b_tfidf_edge_lc, max_features=self.n_tfidf_edge
                                                                                  , analyzer = 'char', ngram_range=self.t_ngrams_edge
                                                                                  #, analyzer = 'word', ngram_range=self.tEDGE_NGRAMS
-                                                                                 , dtype=np.float64)),
-                                                       ('todense', SparseToDense())  #pystruct needs an array, not a sparse matrix
-                                                       ])
+                                                                                 , dtype=self.dtype)),
+                                                       ] + todense())
                                        )
                                     , ("sourcetext1", Pipeline([
                                                        ('selector', EdgeTransformerSourceText(1)),
-                                                       ('tfidf', TfidfVectorizer(lowercase=self.b_tfidf_edge_lc, max_features=self.n_tfidf_edge
+                                                       ('tfidf', NodeTextTfidfVectorizer(lowercase=self.b_tfidf_edge_lc, max_features=self.n_tfidf_edge
                                                                                  , analyzer = 'char', ngram_range=self.t_ngrams_edge  #(2,6)
-                                                                                 , dtype=np.float64)),
-                                                       ('todense', SparseToDense())  #pystruct needs an array, not a sparse matrix
-                                                       ])
+                                                                                 , dtype=self.dtype)),
+                                                       ] + todense())
                                        )
                                     , ("targettext1", Pipeline([
                                                        ('selector', EdgeTransformerTargetText(1)),
-                                                       ('tfidf', TfidfVectorizer(lowercase=self.b_tfidf_edge_lc, max_features=self.n_tfidf_edge
+                                                       ('tfidf', NodeTextTfidfVectorizer(lowercase=self.b_tfidf_edge_lc, max_features=self.n_tfidf_edge
                                                                                  , analyzer = 'char', ngram_range=self.t_ngrams_edge
                                                                                  #, analyzer = 'word', ngram_range=self.tEDGE_NGRAMS
-                                                                                 , dtype=np.float64)),
-                                                       ('todense', SparseToDense())  #pystruct needs an array, not a sparse matrix
-                                                       ])
+                                                                                 , dtype=self.dtype)),
+                                                       ] + todense())
                                        )
                                     , ("sourcetext2", Pipeline([
                                                        ('selector', EdgeTransformerSourceText(2)),
-                                                       ('tfidf', TfidfVectorizer(lowercase=self.b_tfidf_edge_lc, max_features=self.n_tfidf_edge
+                                                       ('tfidf', NodeTextTfidfVectorizer(lowercase=self.b_tfidf_edge_lc, max_features=self.n_tfidf_edge
                                                                                  , analyzer = 'char', ngram_range=self.t_ngrams_edge  #(2,6)
-                                                                                 , dtype=np.float64)),
-                                                       ('todense', SparseToDense())  #pystruct needs an array, not a sparse matrix
-                                                       ])
+                                                                                 , dtype=self.dtype)),
+                                                       ] + todense())
                                        )
                                     , ("targettext2", Pipeline([
                                                        ('selector', EdgeTransformerTargetText(2)),
-                                                       ('tfidf', TfidfVectorizer(lowercase=self.b_tfidf_edge_lc, max_features=self.n_tfidf_edge
+                                                       ('tfidf', NodeTextTfidfVectorizer(lowercase=self.b_tfidf_edge_lc, max_features=self.n_tfidf_edge
                                                                                  , analyzer = 'char', ngram_range=self.t_ngrams_edge
                                                                                  #, analyzer = 'word', ngram_range=self.tEDGE_NGRAMS
-                                                                                 , dtype=np.float64)),
-                                                       ('todense', SparseToDense())  #pystruct needs an array, not a sparse matrix
-                                                       ])
+                                                                                 , dtype=self.dtype)),
+                                                       ] + todense())
                                        )                        
                         ]
                         
-        edge_transformer = FeatureUnion( lEdgeFeature )
+        edge_transformer = ThreadedFeatureUnion( lEdgeFeature, n_jobs=self.n_jobs )
           
         #return _node_transformer, _edge_transformer, tdifNodeTextVectorizer
         self._node_transformer = node_transformer
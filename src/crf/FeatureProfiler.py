@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Timing and memory instrumentation of the feature extraction
+
+    Copyright Xerox(C) 2016 JL. Meunier
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+    Developed  for the EU project READ. The READ project has received funding
+    from the European Union's Horizon 2020 research and innovation programme
+    under grant agreement No 674943.
+
+"""
+import json
+import threading
+import time
+
+try:
+    import resource
+except ImportError:     #not on Windows
+    resource = None
+
+import scipy.sparse as sp
+from sklearn.pipeline import FeatureUnion, Pipeline
+
+from common.trace import traceln
+
+
+def _getPeakRSS():
+    """
+    return the peak resident memory of the process, in bytes (0 if unknown)
+    """
+    if resource is None: return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024   #kilobytes on Linux
+
+
+class FeatureProfiler:
+    """
+    Records, per graph and per transformer, the time spent in the transform method of the node and edge transformers,
+    the number of calls, the shape and size in bytes of their output and the increase of the peak resident memory of 
+    the process during the call (Python 2 has no allocation tracer).
+
+    Each transformer is named by its path in the tree of FeatureUnion and Pipeline, e.g. "node/text/tfidf".
+    The time of a FeatureUnion or Pipeline includes the time of its transformers.
+    The transformers are instrumented only while computing the features of a graph, so that they can be pickled 
+    as usual otherwise. Since the transformers are shared, the graphs are profiled one at a time: concurrent calls
+    (e.g. feature threads of the prediction pipeline, or concurrent requests to the prediction server) wait.
+    """
+    def __init__(self):
+        self.lGraphRecord = list()
+        self._lock = threading.Lock()       #the branches of a ThreadedFeatureUnion run in threads
+        self._graphLock = threading.Lock()  #one graph at a time, while the transformers are instrumented
+        self._dRecord = None                #path --> record, for the current graph
+
+    def buildNodeEdgeMatrices(self, g, node_transformer, edge_transformer):
+        """
+        compute the features of the graph (see Graph.buildNodeEdgeMatrices), recording the profile of the transformers
+        return (node_features, edges, edge_features)
+        """
+        with self._graphLock:
+            lRecord = list()
+            lPatched = list()
+            try:
+                lPatched.extend(self._instrument("node", node_transformer, lRecord))
+                lPatched.extend(self._instrument("edge", edge_transformer, lRecord))
+                self._dRecord = { dRecord["path"]:dRecord for dRecord in lRecord }
+                t0 = time.time()
+                X = g.buildNodeEdgeMatrices(node_transformer, edge_transformer)
+            finally:
+                for est, cls in reversed(lPatched): est.__class__ = cls
+                self._dRecord = None
+            self.lGraphRecord.append( { "index"        : len(self.lGraphRecord)
+                                      , "file"         : getattr(g, "sFilename", None)
+                                      , "nodes"        : len(g.lNode)
+                                      , "edges"        : len(g.lEdge)
+                                      , "time"         : time.time() - t0
+                                      , "transformers" : lRecord } )
+        return X
+
+    def _instrument(self, sPath, est, lRecord):
+        """
+        instrument the transform method of this transformer and of its sub-transformers, adding a record for each
+        return the list of instrumented transformers, with their original class
+        
+        (Pipeline.transform being a property, the transform method is overloaded by a subclass made on the fly)
+        """
+        lRecord.append( {"path":sPath, "class":est.__class__.__name__, "calls":0, "time":0.0
+                         , "shape":None, "nbytes":0, "peak_rss_increase":0} )
+        fun = est.transform
+        def transform(X, *args, **kwargs):
+            iRSS, t0 = _getPeakRSS(), time.time()
+            Y = fun(X, *args, **kwargs)
+            self._record(sPath, time.time() - t0, Y, _getPeakRSS() - iRSS)
+            return Y
+        cls = est.__class__
+        est.__class__ = type(cls.__name__, (cls,), {"transform":lambda _self, X, *args, **kwargs: transform(X, *args, **kwargs)})
+        lPatched = [(est, cls)]
+
+        if isinstance(est, FeatureUnion):
+            lSub = est.transformer_list
+        elif isinstance(est, Pipeline):
+            lSub = est.steps
+        else:
+            lSub = []
+        for sName, sub in lSub:
+            if sub is not None: lPatched.extend(self._instrument(sPath + "/" + sName, sub, lRecord))
+        return lPatched
+
+    def _record(self, sPath, t, Y, iRSSIncrease):
+        if sp.issparse(Y):
+            nbytes = Y.data.nbytes + Y.indices.nbytes + Y.indptr.nbytes if sp.isspmatrix_csr(Y) or sp.isspmatrix_csc(Y) else 0
+        else:
+            nbytes = getattr(Y, "nbytes", 0)
+        shape = list(Y.shape) if hasattr(Y, "shape") else [len(Y)]
+        with self._lock:
+            dRecord = self._dRecord[sPath]
+            dRecord["calls"]    += 1
+            dRecord["time"]     += t
+            dRecord["shape"]    = shape
+            dRecord["nbytes"]   = max(dRecord["nbytes"], int(nbytes))
+            dRecord["peak_rss_increase"] = max(dRecord["peak_rss_increase"], int(iRSSIncrease))
+
+    # --- Report ---------------------------------------------------------------------
+    def getReport(self):
+        """
+        return the profile as a JSON-serializable dictionary:
+            - "graphs": one entry per graph, with its list of transformer records
+            - "transformers": the records summed over the graphs (maximum for the sizes, shape of the last graph)
+            - "time": the total time
+        """
+        lTotal, dTotal = list(), dict()
+        for dGraph in self.lGraphRecord:
+            for dRecord in dGraph["transformers"]:
+                try:
+                    dSum = dTotal[dRecord["path"]]
+                except KeyError:
+                    dSum = dict(dRecord, calls=0, time=0.0, shape=None, nbytes=0, peak_rss_increase=0)
+                    dTotal[dRecord["path"]] = dSum
+                    lTotal.append(dSum)
+                dSum["calls"]   += dRecord["calls"]
+                dSum["time"]    += dRecord["time"]
+                dSum["shape"]   = dRecord["shape"]
+                for sKey in ["nbytes", "peak_rss_increase"]: dSum[sKey] = max(dSum[sKey], dRecord[sKey])
+        return { "graphs"       : self.lGraphRecord
+               , "transformers" : lTotal
+               , "time"         : sum(dGraph["time"] for dGraph in self.lGraphRecord) }
+
+    def saveReport(self, sFilename):
+        """
+        save the report as a JSON file
+        """
+        with open(sFilename, "w") as fd:
+            json.dump(self.getReport(), fd, indent=2)
+
+    def traceReport(self):
+        """
+        trace a summary of the report
+        """
+        dReport = self.getReport()
+        traceln("\t- feature extraction profile: %d graph(s), %.2fs"%(len(dReport["graphs"]), dReport["time"]))
+        traceln("\t\t%-40s %6s %9s %10s %12s"%("transformer", "calls", "time (s)", "size (MB)", "peak RSS +MB"))
+        for dRecord in dReport["transformers"]:
+            traceln("\t\t%-40s %6d %9.3f %10.2f %12.2f"%(dRecord["path"], dRecord["calls"], dRecord["time"]
+                                                       , dRecord["nbytes"] / 1e6, dRecord["peak_rss_increase"] / 1e6))
+
+
+# --- AUTO-TESTS ------------------------------------------------------------------
+def test_FeatureProfiler():
+    import numpy as np
+    from sklearn.preprocessing import StandardScaler
+    from Transformer import Transformer
+
+    class Selector(Transformer):
+        def transform(self, lNode):
+            return np.array([[len(s), s.count(" ")] for s in lNode], dtype=np.float64).reshape( (len(lNode), 2) )
+    class MyGraph:
+        def __init__(self, lNode): self.lNode, self.lEdge = lNode, []
+        def buildNodeEdgeMatrices(self, node_transformer, edge_transformer):
+            return node_transformer.transform(self.lNode), None, edge_transformer.transform(self.lNode)
+
+    lNode = ["a b", "", "c d e"]
+    node_transformer = FeatureUnion( [ ("len", Pipeline([("selector", Selector()), ("scaler", StandardScaler())]))
+                                     , ("raw", Selector()) ] ).fit(lNode)
+    edge_transformer = Selector()
+    prf = FeatureProfiler()
+    for g in [MyGraph(lNode), MyGraph(lNode[:2])]:
+        X = prf.buildNodeEdgeMatrices(g, node_transformer, edge_transformer)
+        assert X[0].shape == (len(g.lNode), 4)
+    dReport = json.loads(json.dumps(prf.getReport()))
+    assert [d["nodes"] for d in dReport["graphs"]] == [3, 2]
+    lPath = ["node", "node/len", "node/len/selector", "node/len/scaler", "node/raw", "edge"]
+    assert [d["path"] for d in dReport["transformers"]] == lPath
+    assert [d["calls"] for d in dReport["transformers"]] == [2] * len(lPath)
+    dRecord = dReport["graphs"][1]["transformers"][0]
+    assert dRecord["class"] == "FeatureUnion" and dRecord["shape"] == [2, 4] and dRecord["nbytes"] == 2*4*8
+    #not instrumented anymore
+    assert node_transformer.__class__ is FeatureUnion and node_transformer.transformer_list[0][1].__class__ is Pipeline
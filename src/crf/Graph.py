@@ -25,6 +25,7 @@
     
 """
 import collections
+import multiprocessing
 
 import numpy as np
 import libxml2
@@ -32,6 +33,10 @@ import libxml2
 from common.trace import traceln
 
 import Edge
+from Adjacency import Adjacency
+from EdgeTable import EdgeTable
+from GraphCache import GraphCache
+from NodeTable import NodeTable
 
 class Graph:
     """
@@ -47,9 +52,15 @@ class Graph:
     _lPageConstraintDef = None  #optionnal page-level constraints
                 
     def __init__(self, lNode = [], lEdge = []):
+        """
+        lEdge is either an EdgeTable or a list of Edge objects
+        """
         self.lNode = lNode
-        self.lEdge = lEdge
+        self.lEdge = lEdge if isinstance(lEdge, EdgeTable) else EdgeTable.fromEdgeList(lNode, lEdge)  #a list-like EdgeTable
         self.doc   = None
+        self._nodeTable = None     #columnar view of the nodes, computed on demand
+        self._dAdjacency = None    #adjacency of the nodes per edge class, computed on demand
+        self.sFilename = None      #file the graph was loaded from, if any
         
     # --- Node Types -------------------------------------------------
     @classmethod
@@ -96,8 +107,17 @@ class Graph:
         Parse the label of the graph from the dataset, and set the node label
         return the set of observed class (set of integers in N+)
         """
+        setSeensLabels = self._parseDomLabels(self.lNode)
+        self._nodeTable = None  #labels have changed
+        return setSeensLabels    
+
+    def _parseDomLabels(self, lNode):
+        """
+        Parse the label of the given nodes from their DOM node, and set the node label
+        return the set of observed class (set of integers in N+)
+        """
         setSeensLabels = set()
-        for nd in self.lNode:
+        for nd in lNode:
             nodeType = nd.type 
             #a LabelSet object knows how to parse a DOM node of a Graph object!!
             sLabel = nodeType.parseDomNodeLabel(nd.node)
@@ -119,6 +139,15 @@ class Graph:
             nd.type.setDomNodeLabel(nd.node, sLabel)
         return self.doc
 
+    def setDomLabelsStreaming(self, Y, sFilename, sOutFilename, sCreator=None, sComments=None):
+        """
+        For a graph loaded in streaming mode: write a copy of the given file, with the node labels set from Y, 
+        page by page, so that the DOM of the whole document is never in memory.
+        If a creator is given, the metadata is updated (with the comments, if any)
+        return the output filename
+        """
+        raise Exception("Must be specialized")
+
     # --- Constraints -----------------------------------------------------------
     def setPageConstraint(cls, lPageConstraintDef):
         """
@@ -155,22 +184,124 @@ class Graph:
     
     # --- Graph building --------------------------------------------------------
     @classmethod
-    def loadGraphs(cls, lsFilename, bNeighbourhood=True, bDetach=False, bLabelled=False, iVerbose=0):
+    def loadGraphs(cls, lsFilename, bNeighbourhood=True, bDetach=False, bLabelled=False, iVerbose=0, n_jobs=1, sCacheDir=None
+                   , bStreaming=False):
         """
         Load one graph per file, and detach its DOM
+        If n_jobs > 1, the files are parsed by a pool of n_jobs processes. The graphs must then be detached 
+            from their DOM (bDetach=True) so that they can be sent back from the workers. 
+            The returned list follows the order of lsFilename.
+        If sCacheDir is given, detached graphs are looked up in this graph cache folder, and stored there after
+            being parsed. (The cache is ignored for graphs attached to their DOM.)
+        If bStreaming, the files are parsed page by page, and the DOM of each page is released as soon as its nodes
+            and edges are built, so that only two pages are in memory at a time. Such graphs are detached by 
+            construction, so bDetach must be True. (See setDomLabelsStreaming to write their labels.)
         return the list of loaded graphs
         """
-        lGraph = []
-        for sFilename in lsFilename:
-            if iVerbose: traceln("\t%s"%sFilename)
-            g = cls()
-            g.parseXmlFile(sFilename, iVerbose)
-            if bNeighbourhood: g.collectNeighbors()            
-            if bLabelled: g.parseDomLabels()
-            if bDetach: g.detachFromDOM()
-            lGraph.append(g)
+        if n_jobs > 1 and len(lsFilename) > 1 and not bDetach: 
+            raise ValueError("Parallel loading of graphs requires to detach them from their DOM (bDetach=True)")
+        if bStreaming and not bDetach:
+            raise ValueError("Streaming graphs are detached from their DOM (bDetach=True)")
+        
+        cache = None
+        if sCacheDir:
+            if bDetach:
+                cache = GraphCache(sCacheDir)
+            else:
+                traceln("\t- WARNING: graph cache ignored, because the graphs must remain attached to their DOM")
+        
+        if cache:
+            lGraph = [cache.load(cls, sFilename, bLabelled) for sFilename in lsFilename]
+        else:
+            lGraph = [None] * len(lsFilename)
+        lsToParse = [sFilename for sFilename, g in zip(lsFilename, lGraph) if g is None]
+        
+        if n_jobs > 1 and len(lsToParse) > 1:
+            lParsedGraph = cls._loadGraphs_parallel(lsToParse, bLabelled, iVerbose, n_jobs, bStreaming)
+        else:
+            lParsedGraph = [cls._loadGraph(sFilename, bLabelled, bDetach, iVerbose, bStreaming) for sFilename in lsToParse]
+        
+        if cache:
+            for sFilename, g in zip(lsToParse, lParsedGraph): cache.save(g, sFilename, bLabelled)
+            if iVerbose: traceln("\t- graph cache: %d hit(s), %d miss(es)   (%s)"%(cache.nHit, cache.nMiss, sCacheDir))
+        
+        iterParsedGraph = iter(lParsedGraph)
+        lGraph = [iterParsedGraph.next() if g is None else g for g in lGraph]
+        for sFilename, g in zip(lsFilename, lGraph): g.sFilename = sFilename
+
+        if bNeighbourhood: 
+            for g in lGraph: g.collectNeighbors()
         return lGraph
 
+    @classmethod
+    def iterGraphs(cls, lsFilename, bNeighbourhood=True, bDetach=True, bLabelled=False, iVerbose=0, sCacheDir=None
+                   , bStreaming=False):
+        """
+        Load one graph per file, one file at a time, as a generator, so that only one graph is in memory at a time 
+        (if the caller does not keep them). Same parameters as loadGraphs.
+        """
+        for sFilename in lsFilename:
+            [g] = cls.loadGraphs([sFilename], bNeighbourhood=bNeighbourhood, bDetach=bDetach, bLabelled=bLabelled
+                                 , iVerbose=iVerbose, sCacheDir=sCacheDir, bStreaming=bStreaming)
+            yield g
+            
+    @classmethod
+    def _loadGraph(cls, sFilename, bLabelled, bDetach, iVerbose, bStreaming=False):
+        """
+        Load one graph from the given file
+        return the graph
+        """
+        if iVerbose: traceln("\t%s"%sFilename)
+        g = cls()
+        if bStreaming: return g.parseXmlFileStreaming(sFilename, bLabelled, iVerbose)
+        g.parseXmlFile(sFilename, iVerbose)
+        if bLabelled: g.parseDomLabels()
+        if bDetach: g.detachFromDOM()
+        return g
+        
+    @classmethod
+    def _loadGraphs_parallel(cls, lsFilename, bLabelled, iVerbose, n_jobs, bStreaming=False):
+        """
+        Parse the files in a pool of processes, each worker returning a labelled (if requested) and detached graph.
+        The neighbourhood is collected by the caller, rather than in the workers, so that the pickled graphs do not 
+        contain long chains of node references.
+        
+        NOTE: the workers are forked, so they inherit the node types and label dictionaries of this class of graph, 
+        and the label indices are the same as in a sequential load.
+        """
+        if iVerbose: traceln("\t- parallel loading of %d files with %d processes"%(len(lsFilename), n_jobs))
+        pool = multiprocessing.Pool(n_jobs)
+        try:
+            lGraph = pool.map(_loadGraph_worker
+                              , [(cls, sFilename, bLabelled, iVerbose, bStreaming) for sFilename in lsFilename]
+                              , chunksize=1)
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+        
+        #the unpickled graphs have their own copy of the node types. Let's share those of the class.
+        dNodeType = { nt.name:nt for nt in cls.getNodeTypeList() }
+        for g in lGraph:
+            for nd in g.lNode: nd.type = dNodeType[nd.type.name]
+        return lGraph
+        
+    @classmethod
+    def loadGraphFromMemory(cls, sXml, bNeighbourhood=True, bLabelled=False, iVerbose=0):
+        """
+        Load one graph from an XML document given as a string (e.g. received over the network), rather than a file
+        The graph remains attached to its DOM (see setDomLabels), and has no filename.
+        return the graph
+        """
+        doc = libxml2.parseMemory(sXml, len(sXml))
+        g = cls()
+        g.parseXmlDoc(doc, iVerbose)
+        if bLabelled: g.parseDomLabels()
+        if bNeighbourhood: g.collectNeighbors()
+        return g
+    
     def parseXmlFile(self, sFilename, iVerbose=0):
         """
         Load that document as a CRF Graph.
@@ -178,11 +309,21 @@ class Graph:
         
         Return a CRF Graph object
         """
+        return self.parseXmlDoc(libxml2.parseFile(sFilename), iVerbose)
     
-        self.doc = libxml2.parseFile(sFilename)
-        self.lNode, self.lEdge = list(), list()
+    def parseXmlDoc(self, doc, iVerbose=0):
+        """
+        Load that DOM as a CRF Graph.
+        Also set the self.doc variable!
+        
+        Return a CRF Graph object
+        """
+        self.doc = doc
+        self.lNode, self.lEdge = list(), EdgeTable([])
+        self._nodeTable, self._dAdjacency = None, None
         #load the block of each page, keeping the list of blocks of previous page
         lPrevPageNode = None
+        ltEdgeArray = list()
 
         for pnum, page, domNdPage in self._iter_Page_DomNode(self.doc):
             #now that we have the page, let's create the node for each type!
@@ -197,18 +338,75 @@ class Graph:
             assert len(setPageNdDomId) == len(lPageNode), "ERROR: some nodes fit with multiple NodeTypes"
             
         
+            tPageEdgeArray = self._computePageEdgeArrays(lPrevPageNode, lPageNode, len(self.lNode))
             self.lNode.extend(lPageNode)
             
-            lPageEdge = Edge.Edge.computeEdges(lPrevPageNode, lPageNode)
-            
-            self.lEdge.extend(lPageEdge)
-            if iVerbose>=2: traceln("\tPage %5d    %6d nodes    %7d edges"%(pnum, len(lPageNode), len(lPageEdge)))
+            ltEdgeArray.append(tPageEdgeArray)
+            if iVerbose>=2: traceln("\tPage %5d    %6d nodes    %7d edges"%(pnum, len(lPageNode), len(tPageEdgeArray[0])))
             
             lPrevPageNode = lPageNode
+        self.lEdge = self._makeEdgeTable(ltEdgeArray)
         if iVerbose: traceln("\t- %d nodes,  %d edges)"%(len(self.lNode), len(self.lEdge)) )
         
         return self
 
+    def parseXmlFileStreaming(self, sFilename, bLabelled=False, iVerbose=0):
+        """
+        Load that document as a CRF Graph, page by page, without loading its whole DOM.
+        The edges are computed on a window of two pages (the current one and the previous one), and the DOM of each 
+        page is released as soon as its nodes are built (and labelled if bLabelled).
+        
+        The graph is detached from the DOM: self.doc is None
+        Return a CRF Graph object
+        """
+        self.doc = None
+        self.lNode, self.lEdge = list(), EdgeTable([])
+        self._nodeTable, self._dAdjacency = None, None
+        lPrevPageNode = None
+        ltEdgeArray = list()
+
+        for pnum, page, domNdPage, doc in self._iter_Page_DomNode_streaming(sFilename):
+            lPageNode = [nd for nodeType in self.getNodeTypeList() for nd in nodeType._iter_GraphNode(doc, domNdPage, page) ]
+            
+            #check that each node appears once
+            setPageNdDomId = set([nd.domid for nd in lPageNode])
+            assert len(setPageNdDomId) == len(lPageNode), "ERROR: some nodes fit with multiple NodeTypes"
+            
+            tPageEdgeArray = self._computePageEdgeArrays(lPrevPageNode, lPageNode, len(self.lNode))
+            
+            if bLabelled: self._parseDomLabels(lPageNode)
+            
+            #the DOM of this page is going to be freed
+            for nd in lPageNode: nd.detachFromDOM()
+            page.detachFromDOM()
+            
+            self.lNode.extend(lPageNode)
+            ltEdgeArray.append(tPageEdgeArray)
+            if iVerbose>=2: traceln("\tPage %5d    %6d nodes    %7d edges"%(pnum, len(lPageNode), len(tPageEdgeArray[0])))
+            
+            lPrevPageNode = lPageNode
+        self.lEdge = self._makeEdgeTable(ltEdgeArray)
+        if iVerbose: traceln("\t- %d nodes,  %d edges)"%(len(self.lNode), len(self.lEdge)) )
+        
+        return self
+    
+    def _computePageEdgeArrays(self, lPrevPageNode, lPageNode, iFirstIndex):
+        """
+        compute the edges of a page, and with its previous page
+        iFirstIndex is the index in the graph node list of the first node of the page
+        return the arrays of the edges (see Edge.computeEdgeArrays), the node indices being in the graph node list
+        """
+        aA, aB, aType, aLength = Edge.Edge.computeEdgeArrays(lPrevPageNode, lPageNode)
+        iOffset = iFirstIndex - (len(lPrevPageNode) if lPrevPageNode else 0)
+        return aA + iOffset, aB + iOffset, aType, aLength
+    
+    def _makeEdgeTable(self, ltEdgeArray):
+        """
+        return the EdgeTable of the graph, given the edge arrays of each page
+        """
+        if not ltEdgeArray: return EdgeTable(self.lNode)
+        return EdgeTable(self.lNode, *[np.hstack(lArray) for lArray in zip(*ltEdgeArray)])
+    
     def _iter_Page_DomNode(self, doc):
         """
         Parse a Xml DOM, by page
@@ -219,37 +417,57 @@ class Graph:
         """
         raise Exception("Must be specialized")
     
+    def _iter_Page_DomNode_streaming(self, sFilename):
+        """
+        Parse a Xml file, page by page, without loading the whole DOM
+
+        iterator on the file, that returns per page:
+            page-num (int), page object, page dom node, DOM
+        The page DOM node is valid only until the next iteration.
+        """
+        raise Exception("Must be specialized")
+    
     def collectNeighbors(self):
         """
-        record the lists of hotizontal-, vertical- and cross-page neighbours for each node
-        """
-        for blk in self.lNode:
-            blk.lHNeighbor = list()
-            blk.lVNeighbor = list()
-            blk.lCPNeighbor = list()        
-        for edge in self.lEdge:
-            a, b = edge.A, edge.B
-            if isinstance(edge, Edge.CrossPageEdge):
-                a.lCPNeighbor.append(b)
-                b.lCPNeighbor.append(a)
-            elif isinstance(edge, Edge.HorizontalEdge):
-                a.lHNeighbor.append(b)
-                b.lHNeighbor.append(a)
-            else:
-                assert  isinstance(edge, Edge.VerticalEdge)
-                a.lVNeighbor.append(b)
-                b.lVNeighbor.append(a)
+        record the hotizontal-, vertical- and cross-page neighbours of the nodes, as one compressed sparse row 
+        adjacency per type of edge, built from the edge matrix  (see getAdjacency)
+        """
+        tblEdge = self.lEdge
+        self._dAdjacency = dict()
+        for cEdge in Edge.lEDGE_CLASS:
+            aMask = tblEdge.getTypeMask(cEdge)
+            self._dAdjacency[cEdge] = Adjacency(len(self.lNode), tblEdge.A[aMask], tblEdge.B[aMask])
+        self._nodeTable = None
+
+    def getAdjacency(self, cEdgeClass):
+        """
+        return the adjacency (an Adjacency object) of the nodes for this class of edge
+        """
+        if self._dAdjacency is None or len(self._dAdjacency[cEdgeClass]) != len(self.lNode): self.collectNeighbors()
+        return self._dAdjacency[cEdgeClass]
     
     def detachFromDOM(self):
         """
         Detach the graph from the DOM node, which can then be freed
         """
-        for nd in self.lNode: nd.detachFromDOM()
+        for nd in self.lNode: 
+            nd.detachFromDOM()
+            if nd.page: nd.page.detachFromDOM()
         self.doc.freeDoc()
         self.doc = None
 
 
     # --- Numpy matrices --------------------------------------------------------
+    def getNodeTable(self):
+        """
+        return the columnar view of the nodes of this graph (a NodeTable, which also behaves as the list of nodes)
+        """
+        if self._nodeTable is None or len(self._nodeTable) != len(self.lNode):
+            dAdjacency = { cEdge:self.getAdjacency(cEdge) for cEdge in Edge.lEDGE_CLASS }
+            self._nodeTable = NodeTable(self.lNode)
+            self._nodeTable.dAdjacency = dAdjacency
+        return self._nodeTable
+    
     def buildNodeEdgeMatrices(self, node_transformer, edge_transformer):
         """
         make 1 node-feature matrix
@@ -258,16 +476,16 @@ class Graph:
          for the graph
         return 3 Numpy matrices
         """
-        node_features = node_transformer.transform(self.lNode)
+        node_features = node_transformer.transform(self.getNodeTable())
         edges = self._indexNodes_and_BuildEdgeMatrix()
-        edge_features = edge_transformer.transform(self.lEdge)
+        edge_features = edge_transformer.transform(self.lEdge.withNodes(self.getNodeTable()))
         return (node_features, edges, edge_features)       
     
     def buildLabelMatrix(self):
         """
         Return the matrix of labels
         """
-        Y = np.array( [nd.cls for nd in self.lNode] , dtype=np.uint8)
+        Y = self.getNodeTable().cls.astype(np.uint8)
         return Y
     
     def _indexNodes_and_BuildEdgeMatrix(self):
@@ -279,11 +497,7 @@ class Graph:
         for i, nd in enumerate(self.lNode):
             nd.index = i
 
-        edges = np.empty( (len(self.lEdge), 2) , dtype=np.int32)
-        for i, edge in enumerate(self.lEdge):
-            edges[i,0] = edge.A.index
-            edges[i,1] = edge.B.index
-        return edges
+        return self.lEdge.getEdgeMatrix()
 
     def getNodeIndexByPage(self):
         """
@@ -306,10 +520,12 @@ class Graph:
         for pnum in sorted(dlIndexByPage.keys()):
             llIndexByPage.append( sorted(dlIndexByPage[pnum]) )
         return llIndexByPage
-            
-        
-        
-        
 
-        
-        
+
+# --- Multiprocessing worker ------------------------------------------------------
+def _loadGraph_worker((cls, sFilename, bLabelled, iVerbose, bStreaming)):
+    """
+    Load one graph in a worker process
+    return the graph, detached from its DOM
+    """
+    return cls._loadGraph(sFilename, bLabelled, True, iVerbose, bStreaming)
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+"""
+    A disk cache of graphs, to avoid parsing again and again the same XML files
+
+    Copyright Xerox(C) 2016 JL. Meunier
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+    Developed  for the EU project READ. The READ project has received funding
+    from the European Union's Horizon 2020 research and innovation programme
+    under grant agreement No 674943.
+
+"""
+import os
+import cPickle
+import hashlib
+import tempfile
+
+import numpy as np
+
+from common.trace import traceln
+
+from Block import Block
+from EdgeTable import EdgeTable
+from Page import Page
+
+
+class GraphCache:
+    """
+    A folder containing one entry per (XML file, graph configuration).
+
+    An entry is a compact serialisation of a detached graph: geometry, text, page information and label of
+    the nodes, and the edges as arrays of node indices.
+
+    The key of an entry is computed from the content of the XML file and from the configuration of the graph class,
+    i.e. its node types (labels, xpath expressions). So any change in the file or in the configuration is a miss.
+    """
+    iVERSION    = 1         #change it when changing the format of the entries or the way graphs are computed
+    sEXT        = ".graph.pkl"
+
+    def __init__(self, sCacheDir):
+        if os.path.exists(sCacheDir):
+            assert os.path.isdir(sCacheDir), "Not a folder: %s"%sCacheDir
+        else:
+            os.makedirs(sCacheDir)
+        self.sDir = sCacheDir
+        self.nHit, self.nMiss = 0, 0
+
+    # --- Keys ------------------------------------------------------------------------
+    def getKey(self, cGraphClass, sFilename):
+        """
+        return the key of the entry for this file, given the graph class and its node types
+        """
+        md5 = hashlib.md5()
+        md5.update(repr( (self.iVERSION, cGraphClass.__module__, cGraphClass.__name__, getattr(cGraphClass, "sxpPage", None)) ))
+        for nodeType in cGraphClass.getNodeTypeList(): md5.update(nodeType.getSignature())
+        with open(sFilename, "rb") as fd:
+            for sBuffer in iter(lambda: fd.read(1<<20), ""): md5.update(sBuffer)
+        return md5.hexdigest()
+
+    def getEntryFilename(self, sKey):
+        return os.path.join(self.sDir, sKey+self.sEXT)
+
+    # --- Load / Save -----------------------------------------------------------------
+    def load(self, cGraphClass, sFilename, bLabelled=False):
+        """
+        Look for the graph of this file in the cache
+        return a detached graph, or None if no suitable entry exists
+        """
+        sEntryFilename = self.getEntryFilename(self.getKey(cGraphClass, sFilename))
+        dat = None
+        if os.path.exists(sEntryFilename):
+            try:
+                with open(sEntryFilename, "rb") as fd: dat = cPickle.load(fd)
+            except Exception as e:
+                traceln("\t- WARNING: ignoring corrupted graph cache entry %s: %s"%(sEntryFilename, e))
+                dat = None
+        if dat is None or (bLabelled and not dat["bLabelled"]):
+            self.nMiss += 1
+            return None
+        self.nHit += 1
+        return self.fromCompactForm(cGraphClass, dat)
+
+    def save(self, graph, sFilename, bLabelled=False):
+        """
+        Store the graph of this file in the cache
+        return the entry filename
+        """
+        sEntryFilename = self.getEntryFilename(self.getKey(graph.__class__, sFilename))
+        dat = self.toCompactForm(graph, bLabelled)
+        #write then rename, so that concurrent readers never see a partial entry
+        fd, sTmpFilename = tempfile.mkstemp(suffix=".tmp", dir=self.sDir)
+        with os.fdopen(fd, "wb") as fd:
+            cPickle.dump(dat, fd, protocol=2)
+        os.rename(sTmpFilename, sEntryFilename)
+        return sEntryFilename
+
+    def getHitMissCounts(self):
+        return self.nHit, self.nMiss
+
+    # --- Compact form ------------------------------------------------------------------
+    def toCompactForm(self, graph, bLabelled):
+        """
+        return a dictionary of lists and numpy arrays representing the graph
+        """
+        lNodeType   = graph.getNodeTypeList()
+        lPage, dPageIndex = list(), dict()
+        for nd in graph.lNode:
+            if id(nd.page) not in dPageIndex:
+                dPageIndex[id(nd.page)] = len(lPage)
+                lPage.append(nd.page)
+        tblEdge = graph.lEdge
+
+        return { "bLabelled"    : bLabelled
+                , "lPage"       : [(page.pnum, page.pagecnt, page.w, page.h, page.domid) for page in lPage]
+                , "aBB"         : np.array([nd.getBB() for nd in graph.lNode], dtype=np.float64).reshape( (len(graph.lNode), 4) )
+                , "aPageIndex"  : np.array([dPageIndex[id(nd.page)]     for nd in graph.lNode], dtype=np.int32)
+                , "aType"       : np.array([lNodeType.index(nd.type)    for nd in graph.lNode], dtype=np.int8)
+                , "aOrientation": np.array([nd.orientation              for nd in graph.lNode], dtype=np.int8)
+                , "aCls"        : np.array([nd.cls                      for nd in graph.lNode], dtype=np.int32)
+                , "lText"       : [nd.text  for nd in graph.lNode]
+                , "lDomId"      : [nd.domid for nd in graph.lNode]
+                , "aEdgeType"   : tblEdge.type
+                , "aEdge"       : tblEdge.getEdgeMatrix()
+                , "aEdgeLength" : tblEdge.length
+                }
+
+    def fromCompactForm(self, cGraphClass, dat):
+        """
+        return a detached graph from its compact form
+        """
+        lNodeType = cGraphClass.getNodeTypeList()
+        lPage = [Page(pnum, pagecnt, w, h, domid=domid) for (pnum, pagecnt, w, h, domid) in dat["lPage"]]
+
+        lNode = list()
+        for (x1, y1, x2, y2), iPage, iType, orient, cls, sText, domid in zip(dat["aBB"].tolist(), dat["aPageIndex"].tolist()
+                                                                            , dat["aType"].tolist(), dat["aOrientation"].tolist()
+                                                                            , dat["aCls"].tolist(), dat["lText"], dat["lDomId"]):
+            page = lPage[iPage]
+            blk = Block(page.pnum, (x1, y1, x2-x1, y2-y1), sText, orient, cls, lNodeType[iType], None, domid=domid)
+            blk.setBB( (x1, y1, x2, y2) )     #exact same coordinates as when stored
+            blk.page = page
+            lNode.append(blk)
+
+        aEdge = dat["aEdge"]
+        tblEdge = EdgeTable(lNode, aEdge[:,0], aEdge[:,1], dat["aEdgeType"], dat["aEdgeLength"])
+
+        g = cGraphClass(lNode, tblEdge)
+        g.doc = None
+        return g
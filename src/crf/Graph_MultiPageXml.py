@@ -25,6 +25,10 @@
     
 """
 
+import collections
+
+import libxml2
+
 from Graph import Graph
 from Page import Page
 
@@ -43,6 +47,9 @@ class Graph_MultiPageXml(Graph):
     
     #How to list the pages of a (Multi)PageXml doc
     sxpPage     = "//pc:Page"
+    #... and when streaming the file: the name of the PAGE elements (in PageXml namespace) and of the metadata elements
+    sPageElt        = "Page"
+    sMetadataElt    = "Metadata"
 
     def __init__(self, lNode = [], lEdge = []):
         Graph.__init__(self, lNode, lEdge)
@@ -74,5 +81,114 @@ class Graph_MultiPageXml(Graph):
             
         ctxt.xpathFreeContext()       
         
-        raise StopIteration()        
+        raise StopIteration()
+
+    def _iter_Page_DomNode_streaming(self, sFilename):
+        """
+        Parse a Multi-pageXml file, page by page, using a libxml2 text reader
+
+        iterator on the file, that returns per page:
+            page-num (int), page object, page dom node, DOM
+        The page DOM node is valid only until the next iteration, since the reader then frees the page subtree.
+        """
+        #a first pass, not building any tree, to count the pages
+        pagecnt = sum(1 for _reader in self._iter_Page_Reader(sFilename))
+        
+        pnum = 0
+        for reader in self._iter_Page_Reader(sFilename):
+            pnum += 1
+            ndPage = reader.Expand()
+            iPageWidth  = int( ndPage.prop("imageWidth") )
+            iPageHeight = int( ndPage.prop("imageHeight") )
+            page = Page(pnum, pagecnt, iPageWidth, iPageHeight, cls=None, domnode=ndPage, domid=ndPage.prop("id"))
+            yield (pnum, page, ndPage, ndPage.doc)
+        
+        raise StopIteration()
+    
+    def _iter_Page_Reader(cls, sFilename):
+        """
+        iterator on the PAGE elements of a file
+        yield a libxml2 text reader positioned on each PAGE element in turn
+        """
+        reader = libxml2.newTextReaderFilename(sFilename)
+        ret = reader.Read()
+        while ret == 1:
+            if cls._isPageXmlElement(reader, cls.sPageElt):
+                yield reader
+                ret = reader.Next()     #skip the page subtree
+            else:
+                ret = reader.Read()
+        if ret < 0: raise ValueError("XML error when reading %s"%sFilename)
+        raise StopIteration()
+    _iter_Page_Reader = classmethod(_iter_Page_Reader)
+    
+    def _isPageXmlElement(cls, reader, sName):
+        return reader.NodeType() == 1 and reader.LocalName() == sName and reader.NamespaceUri() == PageXml.NS_PAGE_XML
+    _isPageXmlElement = classmethod(_isPageXmlElement)
+    
+    def setDomLabelsStreaming(self, Y, sFilename, sOutFilename, sCreator=None, sComments=None):
+        """
+        For a graph loaded in streaming mode: write a copy of the given file, with the node labels set from Y, 
+        page by page, so that the DOM of the whole document is never in memory.
+        The nodes are found back in their page by their DOM id.
+        If a creator is given, the Metadata elements are updated, as MultiPageXml.setMetadata does.
+        return the output filename
+        """
+        #the labelled nodes of each page
+        dlNdLabelByPnum = collections.defaultdict(list)
+        for i, nd in enumerate(self.lNode):
+            if nd.domid is None: raise ValueError("Page %d, a node without id cannot be found back in the file"%nd.pnum)
+            dlNdLabelByPnum[nd.pnum].append( (nd, self._dLabelByCls[ Y[i] ]) )
+        
+        reader = libxml2.newTextReaderFilename(sFilename)
+        fd = open(sOutFilename, "wb")
+        try:
+            fd.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            sEndTag = ""
+            pnum = 0
+            ret = reader.Read()
+            while ret == 1:
+                if reader.NodeType() != 1 or reader.Depth() > 1:
+                    ret = reader.Read()
+                    continue
+                if reader.Depth() == 0:
+                    #the root start tag, with its attributes and namespaces, but without its content
+                    ndRoot = reader.CurrentNode().copyNode(2)
+                    s = ndRoot.serialize("UTF-8")
+                    ndRoot.freeNode()
+                    if not reader.IsEmptyElement():
+                        assert s.endswith("/>")
+                        s, sEndTag = s[:-2] + ">", "</%s>\n"%reader.Name()
+                    fd.write(s + "\n")
+                    ret = reader.Read()
+                    continue
+                #a top-level element, which we load, update and write
+                nd = reader.Expand()
+                if self._isPageXmlElement(reader, self.sPageElt):
+                    pnum += 1
+                    self._setPageDomLabels(nd, dlNdLabelByPnum.pop(pnum, []))
+                elif sCreator and self._isPageXmlElement(reader, self.sMetadataElt):
+                    PageXml.setMetadata(None, nd, sCreator, sComments)
+                fd.write(nd.serialize("UTF-8", 1))
+                fd.write("\n")
+                ret = reader.Next()
+            if ret < 0: raise ValueError("XML error when reading %s"%sFilename)
+            fd.write(sEndTag)
+        finally:
+            fd.close()
+        if dlNdLabelByPnum: 
+            raise ValueError("Pages %s of the graph not found in %s"%(sorted(dlNdLabelByPnum.keys()), sFilename))
+        return sOutFilename
+
+    def _setPageDomLabels(self, ndPage, lNdLabel):
+        """
+        set the label of the given nodes in the given page DOM node
+        """
+        if not lNdLabel: return
+        ctxt = ndPage.doc.xpathNewContext()
+        ctxt.setContextNode(ndPage)
+        dDomNdById = { domNd.prop("id"):domNd for domNd in ctxt.xpathEval(".//*[@id]") }
+        ctxt.xpathFreeContext()
+        for nd, sLabel in lNdLabel:
+            nd.type.setDomNodeLabel(dDomNdById[nd.domid], sLabel)        
         
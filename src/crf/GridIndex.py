@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+"""
+    A simple grid spatial index over bounding boxes
+
+    Copyright Xerox(C) 2016 JL. Meunier
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+    Developed  for the EU project READ. The READ project has received funding
+    from the European Union's Horizon 2020 research and innovation programme
+    under grant agreement No 674943.
+
+"""
+import collections
+import math
+
+import numpy as np
+
+
+class GridIndex:
+    """
+    The plane is cut into square cells, and each box is registered in all the cells it intersects.
+    A query returns the boxes that have a strictly positive intersection with the query box.
+
+    By default, the cell size is the median of the largest dimension of the indexed boxes, so that a box
+    spans a few cells only.
+    """
+
+    def __init__(self, x1, y1, x2, y2, fCellSize=None):
+        self.x1, self.y1, self.x2, self.y2 = [np.asarray(a, dtype=np.float64) for a in (x1, y1, x2, y2)]
+        if fCellSize is None:
+            fCellSize = np.median(np.maximum(self.x2-self.x1, self.y2-self.y1)) if len(self.x1) else 1.0
+        self.fCellSize = max(1.0, float(fCellSize))
+
+        self.dCell = collections.defaultdict(list)  # (i, j) --> list of box indices
+        aI1, aJ1, aI2, aJ2 = [self._cell(a) for a in (self.x1, self.y1, self.x2, self.y2)]
+        for k, (i1, j1, i2, j2) in enumerate(zip(aI1.tolist(), aJ1.tolist(), aI2.tolist(), aJ2.tolist())):
+            for i in range(i1, i2+1):
+                for j in range(j1, j2+1):
+                    self.dCell[(i, j)].append(k)
+
+    def _cell(self, a):
+        return np.floor(a / self.fCellSize).astype(np.int64)
+
+    def __len__(self):
+        return len(self.x1)
+
+    def query(self, x1, y1, x2, y2):
+        """
+        return the sorted list of the index of the boxes having a positive intersection with the given box
+        """
+        c = self.fCellSize
+        setCandidate = set()
+        for i in range(int(math.floor(x1/c)), int(math.floor(x2/c))+1):
+            for j in range(int(math.floor(y1/c)), int(math.floor(y2/c))+1):
+                lk = self.dCell.get( (i, j) )
+                if lk: setCandidate.update(lk)
+        if not setCandidate: return []
+        ak = np.array(sorted(setCandidate), dtype=np.int64)
+        bOk = (  (np.minimum(self.x2[ak], x2) - np.maximum(self.x1[ak], x1) > 0)
+               & (np.minimum(self.y2[ak], y2) - np.maximum(self.y1[ak], y1) > 0) )
+        return ak[bOk].tolist()
+
+
+# --- AUTO-TESTS ------------------------------------------------------------------
+def test_GridIndex():
+    import random
+    rnd = random.Random(1)
+    lBB = list()
+    for _i in range(200):
+        x, y = rnd.uniform(-100, 1000), rnd.uniform(-100, 1000)
+        lBB.append( (x, y, x+rnd.uniform(0, 150), y+rnd.uniform(0, 50)) )
+    a = np.array(lBB)
+    idx = GridIndex(a[:,0], a[:,1], a[:,2], a[:,3])
+    for (x1, y1, x2, y2) in lBB[:50] + [(0, 0, 1000, 1000), (-500, -500, -400, -400)]:
+        lRef = [k for k, (u1, v1, u2, v2) in enumerate(lBB) if min(x2, u2) - max(x1, u1) > 0 and min(y2, v2) - max(y1, v1) > 0]
+        assert idx.query(x1, y1, x2, y2) == lRef
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Lazy activation of the page-level logical constraints: solve without constraints, re-solve the violating pages only
+
+    Copyright Xerox(C) 2016 JL. Meunier
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+    Developed  for the EU project READ. The READ project has received funding
+    from the European Union's Horizon 2020 research and innovation programme
+    under grant agreement No 674943.
+
+"""
+import numpy as np
+
+
+class LazyConstraintInference:
+    """
+    MAP inference with logical constraints (see Graph.instanciatePageConstraints), activated lazily:
+    1 - the whole graph is solved without constraints
+    2 - each constraint is checked against this solution
+    3 - the nodes of the constraints that are violated, typically the nodes of a few pages, are solved again, with all
+        the constraints on these nodes, the labels of the other nodes being fixed: the potentials of the edges between 
+        both sets of nodes are folded into the unary potentials of the re-solved nodes.
+    4 - the constraints are checked again, and steps 3-4 are repeated with the newly violated ones, if any.
+    If no constraint is violated, which is the common case, the solution is the one of the unconstrained inference,
+    which is also the solution of the constrained one. Otherwise, only the violating pages are solved with constraints.
+    
+    The solver is a function:  fSolve(unary_potentials, pairwise_potentials, edges, constraints=None) --> labels
+    The unconstrained solve can be done by another function, e.g. a faster approximate one.
+    """
+    
+    def __init__(self, fSolve, fSolveUnconstrained=None):
+        self.fSolve = fSolve
+        self.fSolveUnconstrained = fSolveUnconstrained or fSolve
+        self.nGraph, self.nResolvedGraph, self.nViolated, self.nConstraint, self.nResolvedNode, self.nNode = 0, 0, 0, 0, 0, 0
+        
+    def infer(self, crf, x, w, lConstraint):
+        """
+        constrained MAP inference for the graph x=(node_features, edges, edge_features), given the crf and its weights
+        return a 1-dim array of labels
+        """
+        return self.inference(crf._get_unary_potentials(x, w), crf._get_pairwise_potentials(x, w), crf._get_edges(x), lConstraint)
+    
+    def inference(self, unary_potentials, pairwise_potentials, edges, lConstraint):
+        """
+        constrained MAP inference given the potentials, the edges and the instanciated constraints
+        return a 1-dim array of labels
+        """
+        Y = np.array(self.fSolveUnconstrained(unary_potentials, pairwise_potentials, edges), dtype=np.int64)
+        lViolated = [c for c in lConstraint if not self.isSatisfied(c, Y)]
+        
+        self.nGraph         += 1
+        self.nNode          += len(Y)
+        self.nConstraint    += len(lConstraint)
+        self.nViolated      += len(lViolated)
+        if not lViolated: return Y
+        
+        lUnary = [np.asarray(unaries, dtype=np.int64) for (_op, unaries, _states, _neg) in lConstraint]
+        setActive = set()   #index of the activated constraints
+        setViolated = set(i for i, c in enumerate(lConstraint) if not self.isSatisfied(c, Y))
+        while not setViolated <= setActive:
+            setActive |= setViolated
+            #the nodes of the active constraints, and any constraint on those nodes, until closure
+            while True:
+                bSub = np.zeros(len(Y), dtype=np.bool)
+                for i in setActive: bSub[lUnary[i]] = True
+                setMore = set(i for i, aUnary in enumerate(lUnary) if i not in setActive and bSub[aUnary].any())
+                if not setMore: break
+                setActive |= setMore
+            aSub = np.flatnonzero(bSub)
+            Y[aSub] = self._solveSubGraph(unary_potentials, pairwise_potentials, edges, Y, aSub
+                                          , [lConstraint[i] for i in sorted(setActive)])
+            #the labels of the nodes of other constraints may have changed, through the edges
+            setViolated = set(i for i, c in enumerate(lConstraint) if not self.isSatisfied(c, Y))
+        #(if the solver could not satisfy the active constraints, we stop there)
+        self.nResolvedGraph += 1
+        self.nResolvedNode  += len(aSub)
+        return Y
+    
+    def _solveSubGraph(self, unary, pairwise, edges, Y, aSub, lConstraint):
+        """
+        solve the sub-graph of the nodes aSub with these constraints, the labels Y of the other nodes being fixed
+        return the labels of the nodes aSub
+        """
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        aNewIndex = np.full(len(Y), -1, dtype=np.int64)
+        aNewIndex[aSub] = np.arange(len(aSub))
+        bInA, bInB = aNewIndex[edges[:,0]] >= 0, aNewIndex[edges[:,1]] >= 0
+        
+        subUnary = np.array(unary[aSub], dtype=np.float64)
+        #edges from a re-solved node to a fixed node, and conversely
+        bOut = bInA & ~bInB
+        np.add.at(subUnary, aNewIndex[edges[bOut,0]], pairwise[np.flatnonzero(bOut), :, Y[edges[bOut,1]]])
+        bOut = ~bInA & bInB
+        np.add.at(subUnary, aNewIndex[edges[bOut,1]], pairwise[np.flatnonzero(bOut), Y[edges[bOut,0]], :])
+        
+        bIn = bInA & bInB
+        subEdges = aNewIndex[edges[bIn]].reshape(-1, 2)
+        subConstraint = [(op, aNewIndex[np.asarray(unaries, dtype=np.int64)].tolist(), states, neg) for (op, unaries, states, neg) in lConstraint]
+        return self.fSolve(subUnary, pairwise[bIn], subEdges, constraints=subConstraint)
+    
+    def getReport(self):
+        """
+        return a short text about the constraints activated so far
+        """
+        return "%d/%d constraints violated without constraint, %d/%d graphs and %d/%d nodes solved again with constraints"%( 
+                    self.nViolated, self.nConstraint, self.nResolvedGraph, self.nGraph, self.nResolvedNode, self.nNode)
+        
+    # --- Constraint checking ------------------------------------------------------------
+    def isSatisfied(cls, (op, unaries, states, neg), Y):
+        """
+        check a constraint, as instanciated by Graph.instanciatePageConstraints, against the labels Y
+        An unknown operator is deemed violated, so that the solver deals with it.
+        return a boolean
+        """
+        if not len(unaries): return True
+        aUnary = np.asarray(unaries, dtype=np.int64)
+        #the boolean variables of the constraint: the unary is in its state, or not if negated
+        aBool = (Y[aUnary] == np.asarray(states)) != np.asarray(neg, dtype=np.bool)
+        n = aBool.sum()
+        if   op == 'ATMOSTONE'  : return n <= 1
+        elif op == 'XOR'        : return n == 1
+        elif op == 'OR'         : return n >= 1
+        elif op == 'XOROUT'     : return aBool[:-1].sum() == 1 if aBool[-1] else aBool[:-1].sum() != 1
+        elif op == 'OROUT'      : return aBool[-1] == aBool[:-1].any()
+        elif op == 'ANDOUT'     : return aBool[-1] == aBool[:-1].all()
+        elif op == 'IMPLY'      : return aBool[-1] or not aBool[:-1].all()
+        return False
+    isSatisfied = classmethod(isSatisfied)
+    
+    
+# --- AUTO-TESTS ------------------------------------------------------------------
+def _bruteForce(unary, pairwise, edges, constraints=None):
+    import itertools
+    n_nodes, n_states = unary.shape
+    edges = np.asarray(edges).reshape(-1, 2)
+    def score(y):
+        return unary[np.arange(n_nodes), y].sum() + pairwise[np.arange(len(edges)), y[edges[:,0]], y[edges[:,1]]].sum()
+    lY = [np.array(y) for y in itertools.product(range(n_states), repeat=n_nodes)]
+    lY = [y for y in lY if all(LazyConstraintInference.isSatisfied(c, y) for c in (constraints or []))]
+    return max(lY, key=score)
+
+def test_isSatisfied():
+    Y = np.array([0, 1, 1, 2])
+    f = LazyConstraintInference.isSatisfied
+    assert     f(('ATMOSTONE', [0, 1, 3], 1, False), Y)
+    assert not f(('ATMOSTONE', [0, 1, 2], 1, False), Y)
+    assert not f(('ATMOSTONE', [0, 1, 3], 1, True), Y)
+    assert     f(('XOR', [0, 1, 3], [1, 1, 1], False), Y)
+    assert not f(('XOR', [0, 3], 1, False), Y)
+    assert     f(('OR', [0, 1], 1, False), Y) and not f(('OR', [0, 3], 1, False), Y)
+    assert     f(('IMPLY', [1, 2], 1, False), Y) and not f(('IMPLY', [1, 0], 1, False), Y)
+    assert     f(('ANDOUT', [1, 2, 2], 1, False), Y) and not f(('ANDOUT', [1, 0, 2], 1, False), Y)
+    assert     f(('OROUT', [0, 3, 3], 1, False), Y) and not f(('OROUT', [0, 3, 1], 1, False), Y)
+    assert     f(('XOROUT', [0, 1, 2], 1, False), Y) and not f(('XOROUT', [1, 2, 2], 1, False), Y)
+    assert not f(('FOO', [0], 0, False), Y)
+    assert     f(('ATMOSTONE', [], 1, False), Y)
+
+def test_lazy():
+    rnd = np.random.RandomState(0)
+    nResolved = 0
+    for _i in range(30):
+        #2 pages of 3 nodes, without edge between pages, so that the lazy solution is the constrained optimum
+        n_states = 3
+        lPage = [[0, 1, 2], [3, 4, 5]]
+        edges = np.array([(a, b) for lNode in lPage for a in lNode for b in lNode if a < b and rnd.rand() < 0.5], dtype=np.int64).reshape(-1, 2)
+        unary, pairwise = rnd.normal(size=(6, n_states)), rnd.normal(size=(len(edges), n_states, n_states))
+        unary[:, 1] += 1.0  #so that the state 1 is frequent
+        lConstraint = [('ATMOSTONE', lNode, 1, False) for lNode in lPage]
+        
+        lazy = LazyConstraintInference(_bruteForce)
+        Y = lazy.inference(unary, pairwise, edges, lConstraint)
+        assert list(Y) == list(_bruteForce(unary, pairwise, edges, lConstraint))
+        Y0 = _bruteForce(unary, pairwise, edges)
+        for c in lConstraint:
+            if LazyConstraintInference.isSatisfied(c, Y0): assert list(Y[c[1]]) == list(Y0[c[1]])
+        nResolved += lazy.nResolvedGraph
+    assert 0 < nResolved < 30
+    
+    #with edges between pages: the constraints are satisfied, the valid pages are unchanged
+    edges = np.array([(a, b) for a in range(6) for b in range(a+1, 6) if rnd.rand() < 0.4], dtype=np.int64).reshape(-1, 2)
+    unary, pairwise = rnd.normal(size=(6, 3)), rnd.normal(size=(len(edges), 3, 3))
+    unary[:3, 1] += 2.0
+    Y = LazyConstraintInference(_bruteForce).inference(unary, pairwise, edges, lConstraint)
+    assert all(LazyConstraintInference.isSatisfied(c, Y) for c in lConstraint)
+    
+    #several constraints on the same nodes: the re-solve must not violate the constraint that was satisfied
+    unary = np.array([[0, 5, 4], [0, 5, 4], [0, 0, 1]], dtype=np.float64)
+    lConstraint = [('ATMOSTONE', [0, 1, 2], 1, False), ('ATMOSTONE', [0, 1, 2], 2, False)]
+    edges, pairwise = np.zeros((0, 2), dtype=np.int64), np.zeros((0, 3, 3))
+    Y = LazyConstraintInference(_bruteForce).inference(unary, pairwise, edges, lConstraint)
+    assert list(Y) == list(_bruteForce(unary, pairwise, edges, lConstraint)) == [1, 2, 0]
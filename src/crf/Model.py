@@ -26,9 +26,12 @@
 """
 import os
 import cPickle, gzip, json
+import multiprocessing
+import hashlib
 import types
 
 import numpy as np
+import scipy.sparse as sp
 
 from sklearn.utils.class_weight import compute_class_weight
 
@@ -36,6 +39,9 @@ from common.trace import  traceln
 from common.chrono import chronoOn, chronoOff
 
 from TestReport import TestReport
+from FeatureCache import FeatureCache
+from FeatureProfiler import FeatureProfiler
+from ModelBundle import ModelBundle
 
 class ModelException(Exception):
     """
@@ -45,6 +51,8 @@ class ModelException(Exception):
 
 class Model:
     
+    sBUNDLE_EXT = "_bundle"
+    
     def __init__(self, sName, sModelDir):
         """
         a CRF model, with a name and a folder where it will be stored or retrieved from
@@ -59,6 +67,11 @@ class Model:
 
         self._node_transformer   = None
         self._edge_transformer   = None
+        self._sTransformerFingerprint = None
+        
+        self._featureCache       = None
+        self._featureProfiler    = None
+        self.n_jobs_graph        = 1   #number of processes computing the features of several graphs
         
         self._lMdlBaseline       = []  #contains possibly empty list of models
             
@@ -77,6 +90,8 @@ class Model:
         return os.path.join(self.sDir, self.sName+"_config.json")
     def getBaselineFilename(self):
         return os.path.join(self.sDir, self.sName+"_baselines.pkl")
+    def getBundleDirname(self):
+        return os.path.join(self.sDir, self.sName+self.sBUNDLE_EXT)
     
     # --- Model loading/writing -------------------------------------------------------------
     def load(self, expiration_timestamp=None):
@@ -112,6 +127,56 @@ class Model:
             raise ModelException("File %s not found."%sFilename)
         return dat
     
+    # --- Model bundle -------------------------------------------------------------
+    def getBundleParts(self):
+        """
+        return the dictionary of the parts of the trained model to be stored in a model bundle
+        """
+        return {  "transformers" : (self._node_transformer, self._edge_transformer)
+                , "baselines"    : self.getBaselineModelList() }
+        
+    def setBundleParts(self, dPart):
+        """
+        set the parts of the trained model, as loaded from a model bundle
+        """
+        self.setTranformers(dPart["transformers"])
+        self._lMdlBaseline = dPart["baselines"]
+
+    def saveBundle(self):
+        """
+        Save the trained model as a fast-loading model bundle (see ModelBundle)
+        return the bundle folder
+        """
+        sBundleDir = self.getBundleDirname()
+        dInfo = {  "name"                    : self.sName
+                 , "model_class"             : "%s.%s"%(self.__class__.__module__, self.__class__.__name__)
+                 , "transformer_fingerprint" : self.getTransformerFingerprint() }
+        ModelBundle(sBundleDir).save(self.getBundleParts(), dInfo)
+        return sBundleDir
+    
+    def loadBundle(self, expiration_timestamp=None, bMmap=True):
+        """
+        Look on disk for a model bundle, fresher than the timestamp and than the pickled model files, and load it
+        If bMmap, its arrays are memory-mapped read-only
+        return True if the bundle was loaded, False if there is no such bundle
+        """
+        bndl = ModelBundle(self.getBundleDirname())
+        if not bndl.exists(): return False
+        traceln("\t- loading model bundle from: %s"%bndl.sDir)
+        fTimestamp = bndl.getTimestamp()
+        if not fTimestamp > expiration_timestamp:
+            traceln("\t\t bundle is rotten, ignoring it.")
+            return False
+        for sFilename in [self.getModelFilename(), self.getTransformerFilename(), self.getBaselineFilename()]:
+            if os.path.exists(sFilename) and os.path.getmtime(sFilename) > fTimestamp:
+                traceln("\t\t bundle is older than %s, ignoring it."%sFilename)
+                return False
+        dPart, dManifest = bndl.load(bMmap)
+        self.setBundleParts(dPart)
+        #same fingerprint as the transformer file it was made from, so that the feature cache entries remain valid
+        self._sTransformerFingerprint = dManifest["info"]["transformer_fingerprint"]
+        return True
+        
     def gzip_cPickle_dump(cls, sFilename, dat):
         with gzip.open(sFilename, "wb") as zfd:
                 cPickle.dump( dat, zfd, protocol=2)
@@ -129,6 +194,7 @@ class Model:
         return True 
         """
         self._node_transformer, self._edge_transformer = node_transformer, edge_transformer        
+        self._sTransformerFingerprint = None
         return True
 
     def getTransformers(self):
@@ -144,7 +210,10 @@ class Model:
         return the filename
         """
         sTransfFile = self.getTransformerFilename()
-        self.gzip_cPickle_dump(sTransfFile, (self._node_transformer, self._edge_transformer))
+        sDat = cPickle.dumps( (self._node_transformer, self._edge_transformer), protocol=2)
+        with gzip.open(sTransfFile, "wb") as zfd:
+                zfd.write(sDat)
+        self._sTransformerFingerprint = hashlib.md5(sDat).hexdigest()
         return sTransfFile
         
     def loadTransformers(self, expiration_timestamp=0):
@@ -156,25 +225,103 @@ class Model:
         """
         sTransfFile = self.getTransformerFilename()
 
-        dat =  self._loadIfFresh(sTransfFile, expiration_timestamp, self.gzip_cPickle_load)
-        self._node_transformer, self._edge_transformer = dat        
+        def loadFun(sFilename):
+            with gzip.open(sFilename, "rb") as zfd:
+                return zfd.read()
+        sDat =  self._loadIfFresh(sTransfFile, expiration_timestamp, loadFun)
+        self._node_transformer, self._edge_transformer = cPickle.loads(sDat)
+        self._sTransformerFingerprint = hashlib.md5(sDat).hexdigest()
         return True
+    
+    def getTransformerFingerprint(self):
+        """
+        return a fingerprint of the fitted transformers: the MD5 of their pickle, as saved in the transformer file
+        """
+        if self._sTransformerFingerprint is None:
+            sDat = cPickle.dumps( (self._node_transformer, self._edge_transformer), protocol=2)
+            self._sTransformerFingerprint = hashlib.md5(sDat).hexdigest()
+        return self._sTransformerFingerprint
+        
+    def setFeatureCacheDir(self, sFeatureCacheDir):
+        """
+        Cache the features of the graphs in this folder (or no cache if None), to skip their computation at next run.
+        The graphs must know the file they were loaded from.
+        """
+        self._featureCache = FeatureCache(sFeatureCacheDir) if sFeatureCacheDir else None
+        
+    def setFeatureProfiling(self, bProfile):
+        """
+        Record the time and memory spent by each node and edge transformer, for each graph, in transformGraphs 
+        (see getFeatureProfile). The graphs are then processed one by one, in this process.
+        """
+        self._featureProfiler = FeatureProfiler() if bProfile else None
         
+    def getFeatureProfile(self):
+        """
+        return the FeatureProfiler recording the feature extraction, or None
+        Its getReport method returns a JSON-serializable report, its saveReport method saves it as JSON.
+        """
+        return self._featureProfiler
+    
     def transformGraphs(self, lGraph, bLabelled=False):
         """
         Compute node and edge features and return one X matrix for each graph as a list
+        (or read them from the feature cache, if any)
+        (and record their profile, if feature profiling is on)
         If bLabelled==True, return the Y matrix for each as a list
         return either:
          - a list of X and a list of Y
          - a list of X
         """
-        lX = [g.buildNodeEdgeMatrices(self._node_transformer, self._edge_transformer) for g in lGraph]
+        if self._featureCache:
+            cache, sFingerprint = self._featureCache, self.getTransformerFingerprint()
+            lX = [cache.load(g, g.sFilename, sFingerprint) if g.sFilename else None for g in lGraph]
+            liToCompute = [i for i, X in enumerate(lX) if X is None]
+            for i, X in zip(liToCompute, self._buildNodeEdgeMatrices([lGraph[i] for i in liToCompute])):
+                lX[i] = X
+                if lGraph[i].sFilename: cache.save(lGraph[i], lGraph[i].sFilename, sFingerprint, X)
+            traceln("\t- feature cache: %d hit(s), %d miss(es)   (%s)"%(cache.nHit, cache.nMiss, cache.sDir))
+        else:
+            lX = self._buildNodeEdgeMatrices(lGraph)
         if bLabelled:
             lY = [g.buildLabelMatrix() for g in lGraph]
             return lX, lY
         else:
             return lX
 
+    def setTransformGraphsJobs(self, n_jobs_graph):
+        """
+        Number of processes computing the features of the graphs, in transformGraphs
+        """
+        self.n_jobs_graph = max(1, n_jobs_graph)
+        
+    def _buildNodeEdgeMatrices(self, lGraph):
+        """
+        compute the features of the graphs, in parallel if n_jobs_graph > 1 (unless profiling)
+        return the list of (node_features, edges, edge_features)
+        """
+        if self._featureProfiler:
+            return [self._featureProfiler.buildNodeEdgeMatrices(g, self._node_transformer, self._edge_transformer) for g in lGraph]
+        
+        if self.n_jobs_graph <= 1 or len(lGraph) <= 1:
+            return [g.buildNodeEdgeMatrices(self._node_transformer, self._edge_transformer) for g in lGraph]
+        
+        #The workers are forked, so they inherit the graphs and the transformers, which are not pickled (the graphs 
+        #may refer to their DOM). Only the features are sent back.
+        global _transformGraphs_worker_data
+        _transformGraphs_worker_data = (self._node_transformer, self._edge_transformer, lGraph)
+        pool = multiprocessing.Pool(min(self.n_jobs_graph, len(lGraph)))
+        try:
+            lX = pool.map(_transformGraphs_worker, range(len(lGraph)), chunksize=1)
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+            _transformGraphs_worker_data = None
+        return lX
+    
     def saveConfiguration(self, config_data):
         """
         Save the configuration on disk
@@ -213,7 +360,7 @@ class Model:
         Train the baseline models, if any
         """
         if self._lMdlBaseline:
-            X_flat = np.vstack( [node_features for (node_features, _, _) in lX] )
+            X_flat = self._vstackNodeFeatures(lX)
             Y_flat = np.hstack(lY)
             for mdlBaseline in self._lMdlBaseline:
                 chronoOn()
@@ -230,7 +377,7 @@ class Model:
         """
         lTstRpt = []
         if self._lMdlBaseline:
-            X_flat = np.vstack( [node_features for (node_features, _, _) in lX] )
+            X_flat = self._vstackNodeFeatures(lX)
             Y_flat = np.hstack(lY)
             lTstRpt = list()
             for mdl in self._lMdlBaseline:   #code in extenso, to call del on the Y_pred_flat array...
@@ -240,6 +387,17 @@ class Model:
             del X_flat, Y_flat
         return lTstRpt                                                                              
     
+    def _vstackNodeFeatures(cls, lX):
+        """
+        stack the node features of all graphs, as a sparse matrix if they are sparse
+        """
+        lNF = [node_features for (node_features, _, _) in lX]
+        if any(sp.issparse(nf) for nf in lNF):
+            return sp.vstack(lNF, format='csr')
+        else:
+            return np.vstack(lNF)
+    _vstackNodeFeatures = classmethod(_vstackNodeFeatures)
+    
     def predictBaselines(self, X):
         """
         predict with the baseline models, 
@@ -284,6 +442,13 @@ class Model:
         return a numpy array, which is a 1-dim array of size the number of nodes of the graph. 
         """
         raise Exception("Method must be overridden")
+
+    def predictFromFeatures(self, graph, X):
+        """
+        predict the class of each node of the graph, given its features as computed by transformGraphs
+        return a numpy array, which is a 1-dim array of size the number of nodes of the graph. 
+        """
+        raise Exception("Method must be overridden")
             
     def computeClassWeight(cls, lY):
         Y = np.hstack(lY)
@@ -294,6 +459,17 @@ class Model:
     computeClassWeight = classmethod(computeClassWeight)
 
 
+# --- Multiprocessing worker ------------------------------------------------------
+_transformGraphs_worker_data = None     #set by the parent process before forking the workers
+
+def _transformGraphs_worker(i):
+    """
+    compute the features of the i-th graph in a worker process
+    """
+    node_transformer, edge_transformer, lGraph = _transformGraphs_worker_data
+    return lGraph[i].buildNodeEdgeMatrices(node_transformer, edge_transformer)
+
+
 # --- AUTO-TESTS ------------------------------------------------------------------
 def test_computeClassWeight():
     a = np.array([1,1,2], dtype=np.int32)
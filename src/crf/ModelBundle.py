@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+"""
+    A fast-loading on-disk format for trained models: a JSON manifest, numpy arrays and a small pickled skeleton
+
+    Copyright Xerox(C) 2016 JL. Meunier
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+    Developed  for the EU project READ. The READ project has received funding
+    from the European Union's Horizon 2020 research and innovation programme
+    under grant agreement No 674943.
+
+"""
+import os
+import sys
+import cPickle, json
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from common.trace import traceln
+
+
+class ModelBundleException(Exception):
+    """
+    Exception specific to this class
+    """
+    pass
+
+class ModelBundle:
+    """
+    A folder storing the parts of a trained model (e.g. the SSVM, the fitted transformers, the baseline models) so that
+    loading them is close to zero-copy:
+    - every numeric numpy array found in the parts (weights, scaler means and scales, TF-IDF idf, ...) is saved as
+        a raw .npy file, loaded memory-mapped (read-only), so that it is read from the OS page cache and shared between
+        the processes that load the same model.
+    - every vocabulary, i.e. a dictionary from strings to integers, or a set of strings, is saved as a sorted array
+        of its strings, plus the array of the integer values for a dictionary.
+    - what remains of the parts, i.e. the structure of the objects, is a small uncompressed pickle, the skeleton, 
+        in which the arrays and vocabularies above are persistent references (see the pickle module).
+    - a JSON manifest lists the parts, the arrays and the vocabularies, with some information about the model.
+    """
+    iVERSION            = 1         #change it when changing the format of the bundle
+    sFORMAT             = "TranskribusDU model bundle"
+    sMANIFEST           = "manifest.json"
+    sSKELETON           = "skeleton.pkl"
+    
+    iMIN_VOCABULARY_SIZE = 16       #smaller dictionaries or sets are simply pickled
+
+    def __init__(self, sBundleDir):
+        self.sDir = sBundleDir
+
+    def exists(self):
+        return os.path.exists(self.getManifestFilename())
+    
+    def getManifestFilename(self):
+        return os.path.join(self.sDir, self.sMANIFEST)
+    
+    def getTimestamp(self):
+        """
+        return the modification time of the bundle, i.e. of its manifest
+        """
+        return os.path.getmtime(self.getManifestFilename())
+    
+    # --- Save / Load ------------------------------------------------------------------
+    def save(self, dPart, dInfo={}):
+        """
+        Save the parts, a dictionary: part name --> object
+        dInfo is any JSON-serializable information about the model, stored in the manifest
+        return the manifest
+        """
+        sParentDir = os.path.dirname(os.path.abspath(self.sDir))
+        #write then rename, so that concurrent readers never see a partial bundle
+        sTmpDir = tempfile.mkdtemp(suffix=".tmp", dir=sParentDir)
+        try:
+            dArray, dVocabulary = dict(), dict()
+            dPid    = dict()    #id(obj) --> persistent id
+            lKeep   = list()    #keep the externalized objects alive while pickling, so that their ids stay unique
+            def persistent_id(o):
+                try:
+                    return dPid[id(o)]
+                except KeyError:
+                    pass
+                if self._isArray(o):
+                    sPid = "a%d"%len(dArray)
+                    dArray[sPid] = self._saveArray(sTmpDir, sPid, o)
+                elif self._isVocabulary(o):
+                    sPid = "v%d"%len(dVocabulary)
+                    dVocabulary[sPid] = self._saveVocabulary(sTmpDir, sPid, o)
+                else:
+                    return None
+                dPid[id(o)] = sPid
+                lKeep.append(o)
+                return sPid
+            
+            with open(os.path.join(sTmpDir, self.sSKELETON), "wb") as fd:
+                pckl = cPickle.Pickler(fd, 2)
+                pckl.persistent_id = persistent_id
+                pckl.dump(dPart)
+            
+            dManifest = {  "format"        : self.sFORMAT
+                         , "version"       : self.iVERSION
+                         , "created"       : time.strftime("%Y-%m-%d %H:%M:%S")
+                         , "info"          : dInfo
+                         , "parts"         : sorted(dPart.keys())
+                         , "skeleton"      : self.sSKELETON
+                         , "arrays"        : dArray
+                         , "vocabularies"  : dVocabulary
+                         }
+            with open(os.path.join(sTmpDir, self.sMANIFEST), "w") as fd:
+                json.dump(dManifest, fd, indent=1, sort_keys=True)
+            
+            if os.path.exists(self.sDir): shutil.rmtree(self.sDir)
+            os.rename(sTmpDir, self.sDir)
+        except:
+            shutil.rmtree(sTmpDir, True)
+            raise
+        return dManifest
+
+    def load(self, bMmap=True):
+        """
+        Load the parts
+        If bMmap, the arrays are memory-mapped read-only, otherwise they are read in memory.
+        return the dictionary of parts and the manifest
+        Raise a ModelBundleException if the folder does not contain a bundle in the current format
+        """
+        dManifest = self.loadManifest()
+        sMmapMode = 'r' if bMmap else None
+        dObj = dict()   #persistent id --> object
+        def persistent_load(sPid):
+            try:
+                return dObj[sPid]
+            except KeyError:
+                pass
+            if sPid in dManifest["arrays"]:
+                o = np.load(os.path.join(self.sDir, dManifest["arrays"][sPid]["file"]), mmap_mode=sMmapMode)
+            elif sPid in dManifest["vocabularies"]:
+                o = self._loadVocabulary(self.sDir, dManifest["vocabularies"][sPid], sMmapMode)
+            else:
+                raise ModelBundleException("Unknown reference '%s' in bundle %s"%(sPid, self.sDir))
+            dObj[sPid] = o
+            return o
+        
+        with open(os.path.join(self.sDir, dManifest["skeleton"]), "rb") as fd:
+            upckl = cPickle.Unpickler(fd)
+            upckl.persistent_load = persistent_load
+            dPart = upckl.load()
+        return dPart, dManifest
+    
+    def loadManifest(self):
+        """
+        return the manifest
+        Raise a ModelBundleException if the folder does not contain a bundle in the current format
+        """
+        sManifestFile = self.getManifestFilename()
+        if not os.path.exists(sManifestFile): raise ModelBundleException("No model bundle in %s"%self.sDir)
+        with open(sManifestFile, "r") as fd:
+            dManifest = json.load(fd)
+        if dManifest.get("format") != self.sFORMAT or dManifest.get("version") != self.iVERSION:
+            raise ModelBundleException("Model bundle %s: unsupported format %s version %s"%(self.sDir, dManifest.get("format"), dManifest.get("version")))
+        return dManifest
+        
+    # --- Arrays ------------------------------------------------------------------
+    def _isArray(cls, o):
+        #object arrays cannot be saved as raw .npy files
+        return isinstance(o, np.ndarray) and o.dtype.kind in "biufcSU" and o.ndim > 0
+    _isArray = classmethod(_isArray)
+    
+    def _saveArray(cls, sDir, sPid, a):
+        sFile = sPid+".npy"
+        a = np.asarray(a)   #a memory-mapped array is saved as a plain array
+        np.save(os.path.join(sDir, sFile), a)
+        return {"file":sFile, "dtype":a.dtype.str, "shape":list(a.shape)}
+    _saveArray = classmethod(_saveArray)
+
+    # --- Vocabularies ------------------------------------------------------------------
+    def _isVocabulary(cls, o):
+        """
+        a dictionary from strings to integers, or a set of strings, of same string type, and big enough
+        """
+        if type(o) in (dict, set, frozenset) and len(o) >= cls.iMIN_VOCABULARY_SIZE:
+            cStr = type(next(iter(o)))
+            if cStr not in (str, unicode): return False
+            if not all(type(s) is cStr for s in o): return False
+            if type(o) is dict and not all(type(v) in (int, long) for v in o.itervalues()): return False
+            #numpy strips the trailing NUL characters of the strings
+            return not any(s.endswith(cStr("\0")) for s in o)
+        return False
+    _isVocabulary = classmethod(_isVocabulary)
+    
+    def _saveVocabulary(cls, sDir, sPid, o):
+        lKey = sorted(o)
+        aKey = np.array(lKey, dtype=np.unicode_ if type(lKey[0]) is unicode else np.string_)
+        dVoc = {"kind": type(o).__name__, "size": len(lKey), "keys": sPid+".keys.npy"}
+        np.save(os.path.join(sDir, dVoc["keys"]), aKey)
+        if type(o) is dict:
+            dVoc["values"] = sPid+".values.npy"
+            np.save(os.path.join(sDir, dVoc["values"]), np.array([o[s] for s in lKey], dtype=np.int64))
+        return dVoc
+    _saveVocabulary = classmethod(_saveVocabulary)
+
+    def _loadVocabulary(cls, sDir, dVoc, sMmapMode):
+        lKey = np.load(os.path.join(sDir, dVoc["keys"]), mmap_mode=sMmapMode).tolist()
+        if dVoc["kind"] == "dict":
+            lValue = np.load(os.path.join(sDir, dVoc["values"]), mmap_mode=sMmapMode).tolist()
+            return dict(zip(lKey, lValue))
+        return {"set":set, "frozenset":frozenset}[dVoc["kind"]](lKey)
+    _loadVocabulary = classmethod(_loadVocabulary)
+
+
+# --- AUTO-TESTS ------------------------------------------------------------------
+def test_ModelBundle():
+    import scipy.sparse as sp
+    sDir = tempfile.mkdtemp()
+    try:
+        w = np.arange(10, dtype=np.float64)
+        dVoc = {u"ab":3, u"b":0, u"cé":1, u" x":2}
+        dVoc.update( (u"w%d"%i, 4+i) for i in range(20) )
+        setStop = set("s%d"%i for i in range(30))
+        dPart = {  "ssvm"  : {"w":w, "other_w":w, "n":3}
+                 , "transf": [dVoc, setStop, sp.csr_matrix(np.eye(3)), np.array([1, "a"], dtype=object), {"a":1}]
+                 }
+        bndl = ModelBundle(os.path.join(sDir, "m_bundle"))
+        assert not bndl.exists()
+        dManifest = bndl.save(dPart, {"name":"m"})
+        assert bndl.exists()
+        assert len(dManifest["vocabularies"]) == 2
+        
+        dPart2, dManifest2 = bndl.load()
+        assert dManifest2["info"] == {"name":"m"}
+        assert isinstance(dPart2["ssvm"]["w"], np.memmap) and np.array_equal(dPart2["ssvm"]["w"], w)
+        assert dPart2["ssvm"]["w"] is dPart2["ssvm"]["other_w"]
+        dVoc2, setStop2, M2, aObj2, d2 = dPart2["transf"]
+        assert dVoc2 == dVoc and type(dVoc2.keys()[0]) is unicode
+        assert setStop2 == setStop and type(iter(setStop2).next()) is str
+        assert np.array_equal(M2.toarray(), np.eye(3))
+        assert aObj2.tolist() == [1, "a"] and d2 == {"a":1}
+        
+        #saving again replaces the bundle
+        bndl.save({"x":1})
+        assert bndl.load()[0] == {"x":1}
+        assert os.listdir(sDir) == ["m_bundle"]
+    finally:
+        shutil.rmtree(sDir, True)
+
+
+if __name__ == "__main__":
+    #converting an existing pickled model into a bundle
+    from Model_SSVM_AD3 import Model_SSVM_AD3
+    
+    if len(sys.argv) != 3:
+        traceln("Usage: %s <model-folder> <model-name>"%sys.argv[0])
+        traceln("Convert the pickled model files <model-name>_*.pkl into a fast-loading model bundle <model-name>%s"%Model_SSVM_AD3.sBUNDLE_EXT)
+        sys.exit(1)
+    sModelDir, sModelName = sys.argv[1:3]
+    mdl = Model_SSVM_AD3(sModelName, sModelDir)
+    mdl.load(bBundle=False)
+    sBundleDir = mdl.saveBundle()
+    traceln("Saved bundle: %s"%sBundleDir)
@@ -28,15 +28,19 @@
     
 """
 import gc
+import copy
 
 from pystruct.utils import SaveLogger
 from pystruct.learners import OneSlackSSVM
-from pystruct.models import EdgeFeatureGraphCRF
+from pystruct.inference import inference_dispatch
 
 from common.trace import traceln
 from common.chrono import chronoOn, chronoOff
 from Model import Model
 from TestReport import TestReport
+from SparseEdgeFeatureGraphCRF import SparseEdgeFeatureGraphCRF
+from FastInference import FastInference
+from LazyConstraintInference import LazyConstraintInference
 
 class Model_SSVM_AD3(Model):
     #default values for the solver
@@ -47,6 +51,12 @@ class Model_SSVM_AD3(Model):
     save_every       = 50     #save every 50 iterations,for warm start
     max_iter         = 1000
     
+    sInferenceMethod = "ad3"  #inference at test and prediction time, or one of FastInference.lMETHOD
+    bLazyConstraints = False  #logical constraints activated only on the pages that violate them
+    
+    #state of the learner that is needed to continue a training, but not to predict, hence not stored in a model bundle
+    lSSVM_TRAINING_STATE = ["constraints_", "cached_constraint_", "alphas", "old_solution", "inference_cache_", "logger"]
+    
     def __init__(self, sName, sModelDir):
         """
         a CRF model, that uses SSVM and AD3, with a name and a folder where it will be stored or retrieved from
@@ -62,17 +72,48 @@ class Model_SSVM_AD3(Model):
         if None != save_every       : self.save_every        = save_every
         if None != max_iter         : self.max_iter          = max_iter
 
-    def load(self, expiration_timestamp=None):
+    def setInferenceMethod(self, sInferenceMethod):
+        """
+        Select the inference used by test and predict: "ad3" (exact, as during training) or one of the approximate, 
+        faster, FastInference methods.
+        """
+        if sInferenceMethod != "ad3" and sInferenceMethod not in FastInference.lMETHOD:
+            raise ValueError("Unknown inference method '%s', must be one of %s"%(sInferenceMethod, ["ad3"]+FastInference.lMETHOD))
+        self.sInferenceMethod = sInferenceMethod
+        
+    def setLazyConstraints(self, bLazyConstraints):
+        """
+        If True, the logical constraints, if any, are activated lazily at test and prediction time: the graph is solved 
+        without constraints, then only the pages violating some constraint are solved again with their constraints.
+        (see LazyConstraintInference)
+        """
+        self.bLazyConstraints = bLazyConstraints
+        
+    def load(self, expiration_timestamp=None, bBundle=True):
         """
         Load myself from disk
         If an expiration timestamp is given, the model stored on disk must be fresher than timestamp
+        If bBundle, a fresh model bundle is preferred to the pickled model files
         return self or raise a ModelException
         """
+        if bBundle and self.loadBundle(expiration_timestamp): return self
         Model.load(self, expiration_timestamp)
         self.ssvm = self._loadIfFresh(self.getModelFilename(), expiration_timestamp, lambda x: SaveLogger(x).load())
         self.loadTransformers(expiration_timestamp)
         return self
     
+    def getBundleParts(self):
+        dPart = Model.getBundleParts(self)
+        ssvm = copy.copy(self.ssvm)
+        for sAttr in self.lSSVM_TRAINING_STATE:
+            if hasattr(ssvm, sAttr): setattr(ssvm, sAttr, None)
+        dPart["ssvm"] = ssvm
+        return dPart
+    
+    def setBundleParts(self, dPart):
+        Model.setBundleParts(self, dPart)
+        self.ssvm = dPart["ssvm"]
+        
     # --- TRAIN / TEST / PREDICT ------------------------------------------------
     def train(self, lGraph, bWarmStart=True, expiration_timestamp=None):
         """
@@ -104,7 +145,8 @@ class Model_SSVM_AD3(Model):
             clsWeights = self.computeClassWeight(lY)
             traceln("\t\t\t%s"%clsWeights)
             
-            crf = EdgeFeatureGraphCRF(inference_method='ad3', class_weight=clsWeights)
+            #accepts dense as well as sparse features
+            crf = SparseEdgeFeatureGraphCRF(inference_method='ad3', class_weight=clsWeights)
     
             self.ssvm = OneSlackSSVM(crf
                                 , inference_cache=self.inference_cache, C=self.C, tol=self.tol, n_jobs=self.njobs
@@ -150,9 +192,9 @@ class Model_SSVM_AD3(Model):
         traceln("\t- predicting on test set")
         if bConstraint:
             lConstraints = [g.instanciatePageConstraints() for g in lGraph]
-            lY_pred = self.ssvm.predict(lX, constraints=lConstraints)
+            lY_pred = self._ssvmPredict(lX, lConstraints)
         else:
-            lY_pred = self.ssvm.predict(lX)
+            lY_pred = self._ssvmPredict(lX)
              
         traceln("\t done")
         
@@ -173,14 +215,56 @@ class Model_SSVM_AD3(Model):
         return a numpy array, which is a 1-dim array of size the number of nodes of the graph. 
         """
         [X] = self.transformGraphs([graph])
+        return self.predictFromFeatures(graph, X)
+
+    def predictFromFeatures(self, graph, X):
+        """
+        predict the class of each node of the graph, given its features as computed by transformGraphs
+        return a numpy array, which is a 1-dim array of size the number of nodes of the graph. 
+        """
         bConstraint  = graph.getPageConstraint()
         
         traceln("\t  #features nodes=%d  edges=%d "%(X[0].shape[1], X[2].shape[1]))
         if bConstraint:
-            [Y] = self.ssvm.predict([X], constraints=[graph.instanciatePageConstraints()])
+            [Y] = self._ssvmPredict([X], [graph.instanciatePageConstraints()])
         else:
-            [Y] = self.ssvm.predict([X])
+            [Y] = self._ssvmPredict([X])
             
         return Y
         
+    def _ssvmPredict(self, lX, lConstraints=None):
+        """
+        predict with the selected inference method
+        The approximate methods ignore the logical constraints, so AD3 is used if there are some, unless the 
+        constraints are lazy, in which case the approximate method solves the unconstrained problem.
+        return the list of label arrays
+        """
+        if lConstraints and self.bLazyConstraints:
+            return self._ssvmPredictLazy(lX, lConstraints)
+        if self.sInferenceMethod == "ad3" or lConstraints:
+            if lConstraints:
+                if self.sInferenceMethod != "ad3": traceln("\t- WARNING: '%s' inference ignores constraints, using AD3"%self.sInferenceMethod)
+                return self.ssvm.predict(lX, constraints=lConstraints)
+            return self.ssvm.predict(lX)
+        inf = FastInference(self.sInferenceMethod)
+        return [inf.infer(self.ssvm.model, X, self.ssvm.w) for X in lX]
+
+    def _ssvmPredictLazy(self, lX, lConstraints):
+        """
+        predict with lazy activation of the constraints
+        return the list of label arrays
+        """
+        crf = self.ssvm.model
+        def fSolve(unary_potentials, pairwise_potentials, edges, constraints=None):
+            #as the crf would do
+            if constraints:
+                return inference_dispatch(unary_potentials, pairwise_potentials, edges, crf.inference_method, constraints=constraints)
+            return inference_dispatch(unary_potentials, pairwise_potentials, edges, crf.inference_method)
+        
+        fSolveUnconstrained = None if self.sInferenceMethod == "ad3" else FastInference(self.sInferenceMethod).inference
+        lazy = LazyConstraintInference(fSolve, fSolveUnconstrained)
+        lY = [lazy.infer(crf, X, self.ssvm.w, lConstraint) for X, lConstraint in zip(lX, lConstraints)]
+        traceln("\t  lazy constraints: %s"%lazy.getReport())
+        return lY
+        
 # --- AUTO-TESTS ------------------------------------------------------------------
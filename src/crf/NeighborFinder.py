@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Finding the horizontal and vertical neighbors of the blocks of a page, working on coordinate arrays
+
+    Copyright Xerox(C) 2016 JL. Meunier
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+    Developed  for the EU project READ. The READ project has received funding
+    from the European Union's Horizon 2020 research and innovation programme
+    under grant agreement No 674943.
+
+"""
+import bisect
+
+import numpy as np
+
+
+class NeighborFinder:
+    """
+    Same edges as Block._findVerticalNeighborEdges, but:
+    - the blocks are given as 4 coordinate arrays (x1, y1, x2, y2)
+    - the blocks are swept by increasing (rounded) y1, and the candidates below a block are tested by chunks,
+        using numpy
+    - the "visible below" test uses the union of the already observed overlaps, kept as sorted disjoint intervals,
+        so it is logarithmic instead of linear in the number of observed overlaps
+    - horizontal neighbors are computed on rotated coordinate arrays, so the blocks are not modified
+
+    The edges are returned as 3 arrays: index of the source block, index of the target block, length of the edge.
+    """
+    iCHUNK = 32     #initial number of candidate blocks tested at once below a given block
+
+    def epsilonRound(cls, a, epsilon):
+        """
+        vectorized Block.epsilonRound: round half away from zero (like Python 2 round), then truncate
+        """
+        a = np.asarray(a, dtype=np.float64) / epsilon
+        return (np.sign(a) * np.floor(np.abs(a) + 0.5) * epsilon).astype(np.int64)
+    epsilonRound = classmethod(epsilonRound)
+
+    def findPageNeighbors(cls, x1, y1, x2, y2, bShortOnly=False):
+        """
+        find horizontal and vertical neighbors
+        return (horizontal edges, vertical edges), each being a tuple (source indices, target indices, lengths)
+        """
+        x1, y1, x2, y2 = [np.asarray(a, dtype=np.float64) for a in (x1, y1, x2, y2)]
+        tV = cls.findVerticalNeighbors(x1, y1, x2, y2, bShortOnly)
+        #rotate by -90 degrees (like Block.rotateMinus90deg) and look for vertical neighbors :-)
+        tH = cls.findVerticalNeighbors(-y2, x1, -y1, x2, bShortOnly)
+        return tH, tV
+    findPageNeighbors = classmethod(findPageNeighbors)
+
+    def findVerticalNeighbors(cls, x1, y1, x2, y2, bShortOnly=False, epsilon=2):
+        """
+        any dimension smaller than epsilon is zero
+
+        return 3 arrays: source block indices, target block indices, edge lengths
+        """
+        n = len(x1)
+        lA, lB, lLength = list(), list(), list()
+        if n == 0: return cls._toArrays(lA, lB, lLength)
+
+        rx1, ry1, rx2, ry2 = [cls.epsilonRound(a, epsilon) for a in (x1, y1, x2, y2)]
+
+        #sweep order: by increasing rounded y1, then by index (stable sort)
+        aOrder = np.argsort(ry1, kind='mergesort')
+        srx1, srx2 = rx1[aOrder], rx2[aOrder]
+        sry1 = ry1[aOrder]
+        lY1 = np.unique(sry1)           #sorted unique y1 values
+        n1 = len(lY1)
+        aGroupStart = np.searchsorted(sry1, lY1, 'left')    #position of the first block of each y1 group
+        aGroup      = np.searchsorted(lY1, sry1, 'left')    #y1 group of each block
+        #for each block: index of the first y1 group that is >= y2 (capped to the last group, as in Block)
+        aFirstGroupBelow = np.minimum(np.searchsorted(lY1, ry2[aOrder], 'left'), n1-1)
+        aFirstGroupBelow, aGroup, aGroupStart = aFirstGroupBelow.tolist(), aGroup.tolist(), aGroupStart.tolist()
+
+        lOrder = aOrder.tolist()
+        lsrx1, lsrx2 = srx1.tolist(), srx2.tolist()
+        ly1, ly2 = y1.tolist(), y2.tolist()
+
+        for k in range(n):
+            Ax1, Ax2 = lsrx1[k], lsrx2[k]
+            if Ax1 >= Ax2: continue     #nothing can overlap it
+            jstart = max(aFirstGroupBelow[k] - 1, aGroup[k] + 1) #some blocks overlap each other, so we try the previous group
+            if jstart >= n1: continue   #nothing below
+            iA = lOrder[k]
+            Ay2, A_height = ly2[iA], ly2[iA] - ly1[iA]
+
+            lStart, lEnd = list(), list()   #union of the observed overlaps, as sorted disjoint intervals
+            pos, iChunk = aGroupStart[jstart], cls.iCHUNK
+            bCovered = False
+            while pos < n and not bCovered:
+                end = min(n, pos + iChunk)
+                aOv1 = np.maximum(srx1[pos:end], Ax1)
+                aOv2 = np.minimum(srx2[pos:end], Ax2)
+                liOv = np.flatnonzero(aOv1 < aOv2).tolist()
+                if liOv: aOv1, aOv2 = aOv1.tolist(), aOv2.tolist()
+                for i in liOv:
+                    ov1, ov2 = aOv1[i], aOv2[i]
+                    #visible if no positive overlap with the union of previous overlaps
+                    j = bisect.bisect_left(lStart, ov2)
+                    if j == 0 or lEnd[j-1] <= ov1:
+                        iB = lOrder[pos+i]
+                        length = abs(ly1[iB] - Ay2)
+                        if not bShortOnly or length < A_height:
+                            lA.append(iA)
+                            lB.append(iB)
+                            lLength.append(length)
+                    #an hidden object may hide another one: add this overlap to the union
+                    jmin = bisect.bisect_left(lEnd, ov1)    #first interval that ends at or after ov1
+                    jmax = bisect.bisect_right(lStart, ov2) #first interval starting after ov2
+                    if jmin < jmax:
+                        ov1, ov2 = min(ov1, lStart[jmin]), max(ov2, lEnd[jmax-1])
+                    lStart[jmin:jmax], lEnd[jmin:jmax] = [ov1], [ov2]
+                    if lStart[0] <= Ax1 and lEnd[0] >= Ax2:
+                        bCovered = True     #nothing else below is visible anymore
+                        break
+                pos, iChunk = end, 2 * iChunk
+
+        return cls._toArrays(lA, lB, lLength)
+    findVerticalNeighbors = classmethod(findVerticalNeighbors)
+
+    def _toArrays(cls, lA, lB, lLength):
+        return np.array(lA, dtype=np.int32), np.array(lB, dtype=np.int32), np.array(lLength, dtype=np.float64)
+    _toArrays = classmethod(_toArrays)
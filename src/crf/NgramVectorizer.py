@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Text n-gram featurisation shared by node and edge text features: each node text is analysed once
+
+    Copyright Xerox(C) 2016 JL. Meunier
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+    Developed  for the EU project READ. The READ project has received funding
+    from the European Union's Horizon 2020 research and innovation programme
+    under grant agreement No 674943.
+
+"""
+import numpy as np
+import scipy.sparse as sp
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+
+class NodeTextDocuments(object):
+    """
+    The list of text documents of a feature extractor, each being the text of a node, enclosed as "{%s}", 
+     or the filler text "_" (e.g. for the edges of another type).
+    
+    It behaves as the list of these strings, so any text vectorizer accepts it, but it also knows the node of each 
+    document, so that a NodeTextTfidfVectorizer gathers the n-gram counts of the nodes instead of analysing the texts.
+    """
+    sFILLER = "_"
+    
+    def __init__(self, tblNode, aIndex=None):
+        """
+        tblNode is a NodeTable
+        aIndex gives the node index of each document, or -1 for the filler text. None means all nodes, in order.
+        """
+        self.tblNode = tblNode
+        self.aIndex  = np.arange(len(tblNode), dtype=np.int32) if aIndex is None else np.asarray(aIndex, dtype=np.int32)
+        
+    def __len__(self):
+        return len(self.aIndex)
+    
+    def __getitem__(self, i):
+        iNode = self.aIndex[i]
+        return self.sFILLER if iNode < 0 else "{%s}"%self.tblNode.getText(iNode)
+    
+    def __iter__(self):
+        lText = self.tblNode.getTextList()
+        for iNode in self.aIndex.tolist():
+            yield self.sFILLER if iNode < 0 else "{%s}"%lText[iNode]
+
+    def getNgramCounts(self, analyze, sKey):
+        """
+        n-gram counts of all node texts of the table, computed once per analyser (identified by sKey) and kept in the table 
+        return the array of the n-grams, and the sparse matrix of counts, with one row per node plus a last row for the filler 
+        """
+        try:
+            return self.tblNode.dNgramCounts[sKey]
+        except KeyError:
+            pass
+        lText = self.tblNode.getTextList() + [None]
+        
+        dNgram, dTextRow = dict(), dict()       #n-gram --> column,  text --> row in the matrix of distinct texts
+        lCol, lCnt, lIndptr = list(), list(), [0]
+        aRow = np.zeros(len(lText), dtype=np.int32)
+        for i, s in enumerate(lText):
+            try:
+                aRow[i] = dTextRow[s]
+                continue
+            except KeyError:
+                aRow[i] = dTextRow[s] = len(lIndptr) - 1
+            dCount = dict()
+            for sNgram in analyze(self.sFILLER if s is None else "{%s}"%s):
+                j = dNgram.setdefault(sNgram, len(dNgram))
+                dCount[j] = dCount.get(j, 0) + 1
+            lCol.extend(dCount.keys())
+            lCnt.extend(dCount.values())
+            lIndptr.append(len(lCol))
+        X = sp.csr_matrix( (np.array(lCnt, dtype=np.float64), np.array(lCol, dtype=np.int32), np.array(lIndptr, dtype=np.int32))
+                           , shape=(len(lIndptr)-1, len(dNgram)) )
+        aNgram = np.empty(len(dNgram), dtype=object)
+        for sNgram, j in dNgram.items(): aNgram[j] = sNgram
+        
+        t = (aNgram, X[aRow])
+        self.tblNode.dNgramCounts[sKey] = t
+        return t
+
+
+class NodeTextTfidfVectorizer(TfidfVectorizer):
+    """
+    A TfidfVectorizer which, when given NodeTextDocuments, gathers the rows of the n-gram counts of the nodes, 
+    instead of analysing each document. 
+    So the text of a node is analysed once, whatever the number of vectorizers and of edges it is involved in.
+    
+    The vocabulary, stop words and features are the same as those of a TfidfVectorizer with same parameters, except 
+    that the features are of the given dtype. (The float64 idf of TfidfVectorizer turns float32 features into float64.)
+    """
+    
+    #parameters that define the analyser
+    lANALYZER_PARAM = ['input', 'encoding', 'decode_error', 'strip_accents', 'lowercase', 'preprocessor', 'tokenizer'
+                       , 'stop_words', 'token_pattern', 'ngram_range', 'analyzer']
+    
+    def _count_vocab(self, raw_documents, fixed_vocab):
+        if not isinstance(raw_documents, NodeTextDocuments) or self.input != 'content':
+            return TfidfVectorizer._count_vocab(self, raw_documents, fixed_vocab)
+        
+        sKey = repr([getattr(self, s) for s in self.lANALYZER_PARAM])
+        aNgram, XNode = raw_documents.getNgramCounts(self.build_analyzer(), sKey)
+        aIndex = raw_documents.aIndex
+        X = XNode[np.where(aIndex < 0, XNode.shape[0]-1, aIndex)]
+        
+        #column of each node n-gram in the vocabulary, or -1
+        aCol = - np.ones(len(aNgram), dtype=np.int64)
+        if fixed_vocab:
+            vocabulary = self.vocabulary_
+            for j, sNgram in enumerate(aNgram.tolist()): aCol[j] = vocabulary.get(sNgram, -1)
+        else:
+            aUsed = np.unique(X.indices)
+            if len(aUsed) == 0:
+                raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+            aCol[aUsed] = np.arange(len(aUsed))
+            vocabulary = dict(zip(aNgram[aUsed].tolist(), range(len(aUsed))))
+            
+        aKept = np.flatnonzero(aCol >= 0)
+        P = sp.csr_matrix( (np.ones(len(aKept)), (aKept, aCol[aKept])), shape=(len(aNgram), len(vocabulary)) )
+        X = sp.csr_matrix(X * P, dtype=self.dtype)
+        X.sort_indices()
+        return vocabulary, X
+
+    def fit_transform(self, raw_documents, y=None):
+        return self._astype(TfidfVectorizer.fit_transform(self, raw_documents, y))
+    
+    def transform(self, raw_documents, copy=True):
+        return self._astype(TfidfVectorizer.transform(self, raw_documents, copy))
+
+    def _astype(self, X):
+        #(the default dtype is an integer type, for the counts)
+        return X.astype(self.dtype, copy=False) if np.issubdtype(self.dtype, np.floating) else X
+
+
+# --- AUTO-TESTS ------------------------------------------------------------------
+def test_NodeTextTfidfVectorizer():
+    from Block import Block
+    from Page import Page
+    from NodeTable import NodeTable
+    page = Page(1, 1, 100, 100)
+    lNode = list()
+    for s in ["abc", "", "abcd", "Hello World", "abc", "world"]:
+        blk = Block(1, (1, 2, 3, 4), s, 0, 1, None)
+        blk.page = page
+        lNode.append(blk)
+    tbl = NodeTable(lNode)
+    for aIndex in [None, [0, -1, 2, 3, -1, 5, 1], [-1, 2, 2, 4]]:
+        for kw in [ dict(analyzer='char', ngram_range=(2,3)), dict(analyzer='char', ngram_range=(1,2), lowercase=False, max_features=7)
+                    , dict(analyzer='word') ]:
+            docs = NodeTextDocuments(tbl, aIndex)
+            lDoc = list(docs)
+            assert [docs[i] for i in range(len(docs))] == lDoc
+            ref, vect = TfidfVectorizer(**kw), NodeTextTfidfVectorizer(**kw)
+            assert (ref.fit_transform(lDoc) - vect.fit_transform(docs)).nnz == 0
+            assert ref.vocabulary_ == vect.vocabulary_ and ref.stop_words_ == vect.stop_words_
+            docs2 = NodeTextDocuments(tbl, [3, 2, -1, 1, 0])
+            assert abs(ref.transform(list(docs2)) - vect.transform(docs2)).max() < 1e-12
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Columnar view of the nodes of a graph
+
+    Copyright Xerox(C) 2016 JL. Meunier
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+    Developed  for the EU project READ. The READ project has received funding
+    from the European Union's Horizon 2020 research and innovation programme
+    under grant agreement No 674943.
+
+"""
+import numpy as np
+
+from Adjacency import Adjacency
+
+
+class NodeTable(object):
+    """
+    A struct-of-arrays view of a list of nodes (Block objects): one numpy array per node attribute.
+
+    Node columns:
+        x1, y1, x2, y2      float64
+        pnum                int32
+        orientation         int8
+        cls                 int32
+        pageindex           int32   index of the node page in the page columns
+        textstart, textend  int32   offsets of the node text in the text buffer sText
+    Page columns:
+        page_pnum, page_cnt int32   page number and number of pages of the document
+        page_w, page_h      float64 page width and height
+    Adjacency:
+        dAdjacency          edge class --> Adjacency of the nodes for this class of edge, if set by the graph
+    Text n-grams:
+        dNgramCounts        analyser key --> n-gram counts of the node texts (see NgramVectorizer.NodeTextDocuments)
+
+    The table also behaves as the (read-only) list of its nodes, so that it can be passed to any code that expects
+    a list of Block, e.g. feature transformers that iterate over the nodes.
+    """
+
+    def __init__(self, lNode):
+        self.lNode = lNode
+        self.dAdjacency = None
+        self.dNgramCounts = dict()
+        n = len(lNode)
+
+        #--- pages
+        lPage, dPageIndex = list(), dict()
+        for nd in lNode:
+            if id(nd.page) not in dPageIndex:
+                dPageIndex[id(nd.page)] = len(lPage)
+                lPage.append(nd.page)
+        self.page_pnum  = np.array([page.pnum    for page in lPage], dtype=np.int32)
+        self.page_cnt   = np.array([page.pagecnt for page in lPage], dtype=np.int32)
+        self.page_w     = np.array([page.w       for page in lPage], dtype=np.float64)
+        self.page_h     = np.array([page.h       for page in lPage], dtype=np.float64)
+
+        #--- nodes
+        aBB = np.array([nd.getBB() for nd in lNode], dtype=np.float64).reshape( (n, 4) )
+        self.x1, self.y1, self.x2, self.y2 = [np.ascontiguousarray(aBB[:,i]) for i in range(4)]
+        self.pnum           = np.array([nd.pnum              for nd in lNode], dtype=np.int32)
+        self.orientation    = np.array([nd.orientation       for nd in lNode], dtype=np.int8)
+        self.cls            = np.array([nd.cls               for nd in lNode], dtype=np.int32)
+        self.pageindex      = np.array([dPageIndex[id(nd.page)] for nd in lNode], dtype=np.int32)
+
+        #--- text
+        lText = [nd.text for nd in lNode]
+        self.sText = "".join(lText)
+        self.textend    = np.cumsum([len(s) for s in lText], dtype=np.int64).astype(np.int32)
+        self.textstart  = self.textend - np.array([len(s) for s in lText], dtype=np.int32)
+
+    # --- list-like behavior ------------------------------------------------------
+    def __len__(self):
+        return len(self.lNode)
+
+    def __getitem__(self, i):
+        return self.lNode[i]
+
+    def __iter__(self):
+        return iter(self.lNode)
+
+    # --- columns --------------------------------------------------------------------
+    def getText(self, i):
+        """
+        return the text of the i-th node
+        """
+        return self.sText[self.textstart[i]:self.textend[i]]
+
+    def getTextList(self):
+        """
+        return the list of node texts
+        """
+        s = self.sText
+        return [s[i:j] for i,j in zip(self.textstart.tolist(), self.textend.tolist())]
+
+    def getPageColumns(self):
+        """
+        return the page columns, indexed per node:  page width, page height, page count
+        """
+        return self.page_w[self.pageindex], self.page_h[self.pageindex], self.page_cnt[self.pageindex]
+
+    def getAdjacency(self, cEdgeClass):
+        """
+        return the adjacency of the nodes for this class of edge
+        """
+        if self.dAdjacency is None: raise ValueError("No adjacency in this node table")
+        return self.dAdjacency[cEdgeClass]
+
+    # --- several graphs -----------------------------------------------------------
+    @classmethod
+    def concat(cls, lTable):
+        """
+        Concatenate several node tables (e.g. one per graph) into one
+        return a new node table
+        """
+        tbl = cls.__new__(cls)
+        tbl.lNode = [nd for t in lTable for nd in t.lNode]
+        tbl.dNgramCounts = dict()
+        for sCol in ["page_pnum", "page_cnt", "page_w", "page_h"
+                     , "x1", "y1", "x2", "y2", "pnum", "orientation", "cls"]:
+            setattr(tbl, sCol, np.hstack([getattr(t, sCol) for t in lTable]))
+
+        #shifting the page indices and text offsets
+        lPageOffset = np.cumsum([0] + [len(t.page_pnum) for t in lTable])
+        lTextOffset = np.cumsum([0] + [len(t.sText)     for t in lTable])
+        tbl.pageindex = np.hstack([t.pageindex + iOff for t, iOff in zip(lTable, lPageOffset)]).astype(np.int32)
+        tbl.textstart = np.hstack([t.textstart + iOff for t, iOff in zip(lTable, lTextOffset)]).astype(np.int32)
+        tbl.textend   = np.hstack([t.textend   + iOff for t, iOff in zip(lTable, lTextOffset)]).astype(np.int32)
+        tbl.sText = "".join([t.sText for t in lTable])
+        
+        if lTable and all(t.dAdjacency is not None for t in lTable):
+            tbl.dAdjacency = { cEdge:Adjacency.concat([t.dAdjacency[cEdge] for t in lTable]) for cEdge in lTable[0].dAdjacency }
+        else:
+            tbl.dAdjacency = None
+        return tbl
+
+
+# --- AUTO-TESTS ------------------------------------------------------------------
+def test_NodeTable():
+    from Block import Block
+    from Page import Page
+    p1, p2 = Page(1, 2, 100, 200), Page(2, 2, 110, 210)
+    lNode = list()
+    for page, (x, y, w, h), s in [(p1, (1, 2, 3, 4), "abc"), (p1, (10, 20, 30, 40), ""), (p2, (5, 6, 7, 8), "de")]:
+        blk = Block(page.pnum, (x, y, w, h), s, 0, 1, None)
+        blk.page = page
+        lNode.append(blk)
+    tbl = NodeTable(lNode)
+    assert len(tbl) == 3 and tbl[1] is lNode[1] and list(tbl) == lNode
+    assert tbl.x2.tolist() == [4, 40, 12]
+    assert tbl.getTextList() == ["abc", "", "de"]
+    assert [tbl.getText(i) for i in range(3)] == ["abc", "", "de"]
+    assert tbl.pageindex.tolist() == [0, 0, 1]
+    assert tbl.getPageColumns()[0].tolist() == [100, 100, 110]
+
+    tbl2 = NodeTable.concat([tbl, NodeTable(lNode[1:]), tbl])
+    assert len(tbl2) == 8
+    assert tbl2.getTextList() == ["abc", "", "de", "", "de", "abc", "", "de"]
+    assert tbl2.pageindex.tolist() == [0, 0, 1, 2, 3, 4, 4, 5]
+    assert tbl2.getPageColumns()[1].tolist() == [200, 200, 210, 200, 210, 200, 200, 210]
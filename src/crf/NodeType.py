@@ -85,6 +85,12 @@ class NodeType:
         """
         return "%s_%s"%(self.name, sXmlLabel.strip())
     
+    def getSignature(self):
+        """
+        return a string that characterises the configuration of this node type (e.g. to key a cache of graphs)
+        """
+        return repr( (self.__class__.__name__, self.name, self.lsXmlLabel, self.lsXmlIgnoredLabel, self.sDefaultLabel) )
+    
     def setXpathExpr(self, o):
         """
         set any Xpath related information to extract the nodes from an XML file
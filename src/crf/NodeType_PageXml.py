@@ -46,6 +46,12 @@ class NodeType_PageXml(NodeType):
         self.sxpNode    = sxpNode
         self.sxpTextual = sxpTextual
         
+    def getSignature(self):
+        """
+        return a string that characterises the configuration of this node type, including its xpath expressions
+        """
+        return NodeType.getSignature(self) + repr( (self.sxpNode, self.sxpTextual) )
+        
     def parseDomNodeLabel(self, domnode, defaultCls=None):
         """
         Parse and set the graph node label and return its class index
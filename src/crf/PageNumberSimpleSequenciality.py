@@ -9,21 +9,72 @@ March 21st, 2016
 
 Copyright Xerox 2016
 '''
+import numpy as np
+
 
 class PageNumberSimpleSequenciality:
     """
     whether or not two strings could be considered as part of a page numbering sequence?
+    
+    The numeric value of the strings is memorized in a bounded cache: documents repeat the same short 
+    strings (page numbers, folio marks, catch-words...) again and again. When full, the cache is emptied.
+    The cache is not pickled with the object.
     """
-    def __init__(self):
-        pass
+    iDEFAULT_MAX_SIZE = 100000
+    
+    def __init__(self, iMaxSize=None):
+        self.iMaxSize = iMaxSize or self.iDEFAULT_MAX_SIZE
+        self._initCache()
 
-    def isPossibleSequence(self, s1, s2):
+    def _initCache(self):
+        self._dCache = dict()
+        self.nMiss = 0
+        
+    def __getstate__(self):
+        return {"iMaxSize":self.iMaxSize}
+    
+    def __setstate__(self, d):
+        self.iMaxSize = d.get("iMaxSize", self.iDEFAULT_MAX_SIZE)
+        self._initCache()
+    
+    def toNumber(self, s):
+        """
+        return the integer value of the string, or None
+        """
         try:
-            n1 = int(s1)
-            n2 = int(s2)
-            return (n1 + 1) == n2
+            return self._dCache[s]
+        except KeyError:
+            pass
+        try:
+            n = int(s)
         except:
-            return False
+            n = None
+        #(no lock: concurrent updates of the dict are safe, at worst a number is converted twice)
+        if len(self._dCache) >= self.iMaxSize: self._dCache.clear()
+        self._dCache[s] = n
+        self.nMiss += 1
+        return n
+    
+    def isPossibleSequence(self, s1, s2):
+        n1 = self.toNumber(s1)
+        if n1 is None: return False
+        n2 = self.toNumber(s2)
+        return n2 is not None and (n1 + 1) == n2
+    
+    def isPossibleSequenceBatch(self, lText, aA, aB):
+        """
+        lText is a list of strings, aA and aB are arrays of indices in this list
+        return the boolean array of isPossibleSequence(lText[aA[i]], lText[aB[i]])
+            (each string is converted once)
+        """
+        lN = [self.toNumber(s) for s in lText]
+        bNumber = np.array([n is not None for n in lN], dtype=np.bool_)
+        lN = [0 if n is None else n for n in lN]
+        #Python long integers are kept as such
+        bInt64 = all(-2**62 < n < 2**62 for n in lN)
+        aN = np.array(lN, dtype=np.int64 if bInt64 else object).reshape( (len(lN),) )
+        aA, aB = np.asarray(aA, dtype=np.int64), np.asarray(aB, dtype=np.int64)
+        return bNumber[aA] & bNumber[aB] & ((aN[aA] + 1) == aN[aB])
     
 
 def test_basic():
@@ -56,4 +107,23 @@ def test_basic():
     assert not pns.isPossibleSequence("114739", ".41147391")
     assert not pns.isPossibleSequence("", "")
     
+    lText = ["1", "2", " 3", "", "A1", "12", "1.0", u"4", "99999999999999999999", "100000000000000000000"]
+    aA = [i for i in range(len(lText)) for j in range(len(lText))]
+    aB = [j for i in range(len(lText)) for j in range(len(lText))]
+    assert pns.isPossibleSequenceBatch(lText, aA, aB).tolist() == [pns.isPossibleSequence(lText[i], lText[j]) for i, j in zip(aA, aB)]
+    assert pns.isPossibleSequenceBatch(lText[:3], [], []).tolist() == []
+
+def test_cache():
+    import cPickle
+    pns = PageNumberSimpleSequenciality(3)
+    for s1, s2 in [("1", "2"), ("2", "3"), ("1", "2"), ("x", "1"), ("5", "6")]:
+        assert pns.isPossibleSequence(s1, s2) == (s1 != "x")
+    assert pns.nMiss == 6
+    assert sorted(pns._dCache.keys()) == ["5", "6", "x"]
+    #the cache is not pickled
+    pns2 = cPickle.loads(cPickle.dumps(pns, 2))
+    assert pns2.iMaxSize == 3 and len(pns2._dCache) == 0
+    assert cPickle.dumps(pns2, 2) == cPickle.dumps(pns, 2)
+    assert pns2.isPossibleSequence("41", "42")
+    
         
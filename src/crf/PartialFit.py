@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Fitting feature transformers chunk by chunk (e.g. graph by graph), without holding all the data in memory
+
+    Copyright Xerox(C) 2016 JL. Meunier
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+    Developed  for the EU project READ. The READ project has received funding
+    from the European Union's Horizon 2020 research and innovation programme
+    under grant agreement No 674943.
+
+"""
+import numpy as np
+import scipy.sparse as sp
+
+from sklearn.pipeline import Pipeline, FeatureUnion
+from sklearn.preprocessing import StandardScaler
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from Transformer import Transformer
+
+
+class PartialFit(object):
+    """
+    Fit an estimator by chunks of data: call partial_fit for each chunk, then finish.
+    
+    Use PartialFit.make(estimator) to get the suitable PartialFit for an estimator: 
+    - a FeatureUnion, or a Pipeline of feature transformers
+    - a StandardScaler, using its own partial_fit
+    - a TfidfVectorizer, accumulating the document and term frequencies of each n-gram 
+    - our Transformer's, which do not need fitting
+    
+    The fitted estimator is the same as if fitted on the concatenation of the chunks (up to floating-point rounding 
+    for the StandardScaler)
+    """
+    def __init__(self, est):
+        self.est = est
+        
+    def partial_fit(self, X):
+        raise Exception("Method must be overridden")
+
+    def finish(self):
+        """
+        end of the data
+        return the fitted estimator
+        """
+        return self.est
+    
+    def isStateless(cls, est):
+        """
+        True if the estimator does not need to be fitted
+        """
+        return isinstance(est, Transformer)
+    isStateless = classmethod(isStateless)
+    
+    def make(cls, est):
+        """
+        return the PartialFit object for this estimator, or None if it does not need to be fitted 
+        raise a ValueError if it cannot be fitted by chunks
+        """
+        if cls.isStateless(est): return None
+        if isinstance(est, FeatureUnion)    : return UnionPartialFit(est)
+        if isinstance(est, Pipeline)        : return PipelinePartialFit.makePipeline(est)
+        if isinstance(est, StandardScaler)  : return ScalerPartialFit(est)
+        if isinstance(est, TfidfVectorizer) : return TfidfPartialFit(est)
+        raise ValueError("Cannot fit by chunks a %s"%est.__class__.__name__)
+    make = classmethod(make)
+
+
+class UnionPartialFit(PartialFit):
+    def __init__(self, est):
+        PartialFit.__init__(self, est)
+        self.lPartialFit = [o for o in (PartialFit.make(trans) for _name, trans in est.transformer_list) if o is not None]
+        
+    def partial_fit(self, X):
+        for o in self.lPartialFit: o.partial_fit(X)
+
+    def finish(self):
+        for o in self.lPartialFit: o.finish()
+        return self.est
+
+
+class PipelinePartialFit(PartialFit):
+    """
+    The steps before the fitted one must not need fitting, as well as the steps after it 
+    """
+    def __init__(self, est, iStep):
+        PartialFit.__init__(self, est)
+        self.lPrevious = [trans for _name, trans in est.steps[:iStep]]
+        self.fitStep = PartialFit.make(est.steps[iStep][1])
+
+    def makePipeline(cls, est):
+        lo = [PartialFit.make(trans) for _name, trans in est.steps]
+        liStep = [i for i, o in enumerate(lo) if o is not None]
+        if not liStep: return None
+        if len(liStep) > 1: raise ValueError("Cannot fit by chunks a Pipeline with several steps to fit: %s"%est)
+        return cls(est, liStep[0])
+    makePipeline = classmethod(makePipeline)
+    
+    def partial_fit(self, X):
+        for trans in self.lPrevious: X = trans.transform(X)
+        self.fitStep.partial_fit(X)
+
+    def finish(self):
+        self.fitStep.finish()
+        return self.est
+
+
+class ScalerPartialFit(PartialFit):
+    def __init__(self, est):
+        PartialFit.__init__(self, est)
+        est._reset()
+        
+    def partial_fit(self, X):
+        if X.shape[0] > 0: self.est.partial_fit(X)
+    
+    def finish(self):
+        if not hasattr(self.est, "n_samples_seen_"): raise ValueError("No data to fit %s"%self.est)
+        return self.est
+        
+        
+class TfidfPartialFit(PartialFit):
+    """
+    Accumulate the number of documents, and the document frequency and total count of each n-gram,
+    then do as TfidfVectorizer.fit (sorted vocabulary, limited by max_df, min_df, max_features, then idf)
+    """
+    def __init__(self, est):
+        PartialFit.__init__(self, est)
+        est._validate_vocabulary()
+        self.nDoc = 0
+        if est.fixed_vocabulary_:
+            self.aDf = np.zeros(len(est.vocabulary_), dtype=np.int64)
+            self.aTf = np.zeros(len(est.vocabulary_), dtype=np.float64)
+        else:
+            self.dDf, self.dTf = dict(), dict()
+    
+    def partial_fit(self, lDoc):
+        est = self.est
+        self.nDoc += len(lDoc)
+        if len(lDoc) == 0: return
+        try:
+            vocabulary, X = est._count_vocab(lDoc, est.fixed_vocabulary_)
+        except ValueError:
+            return      #empty vocabulary in this chunk. (Raised at the end if all chunks are like this.)
+        if est.binary: X.data.fill(1)
+        aDf = np.bincount(X.indices, minlength=X.shape[1])
+        aTf = np.asarray(X.sum(axis=0)).ravel()
+        if est.fixed_vocabulary_:
+            self.aDf += aDf
+            self.aTf += aTf
+        else:
+            dDf, dTf = self.dDf, self.dTf
+            for sTerm, j in vocabulary.iteritems():
+                dDf[sTerm] = dDf.get(sTerm, 0)   + aDf[j]
+                dTf[sTerm] = dTf.get(sTerm, 0.0) + aTf[j]
+    
+    def finish(self):
+        est = self.est
+        if est.fixed_vocabulary_:
+            aDf = self.aDf
+        else:
+            if not self.dDf: raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+            lTerm = sorted(self.dDf.keys())
+            aDf = np.array([self.dDf[s] for s in lTerm], dtype=np.int64)
+            aTf = np.array([self.dTf[s] for s in lTerm], dtype=np.float64)
+            
+            max_doc_count = est.max_df if isinstance(est.max_df, (int, long, np.integer)) else est.max_df * self.nDoc
+            min_doc_count = est.min_df if isinstance(est.min_df, (int, long, np.integer)) else est.min_df * self.nDoc
+            if max_doc_count < min_doc_count: raise ValueError("max_df corresponds to < documents than min_df")
+            
+            #same selection as CountVectorizer._limit_features
+            mask = (aDf <= max_doc_count) & (aDf >= min_doc_count)
+            if est.max_features is not None and mask.sum() > est.max_features:
+                mask_inds = (-aTf[mask]).argsort()[:est.max_features]
+                new_mask = np.zeros(len(aDf), dtype=bool)
+                new_mask[np.where(mask)[0][mask_inds]] = True
+                mask = new_mask
+            aKept = np.flatnonzero(mask)
+            if len(aKept) == 0: raise ValueError("After pruning, no terms remain. Try a lower min_df or a higher max_df.")
+            est.vocabulary_ = { lTerm[j]:i for i, j in enumerate(aKept.tolist()) }
+            est.stop_words_ = set(s for s, b in zip(lTerm, mask.tolist()) if not b)
+            aDf = aDf[aKept]
+        
+        #same as TfidfTransformer.fit
+        if est.use_idf:
+            n_samples, n_features = self.nDoc, len(aDf)
+            df = aDf + int(est.smooth_idf)
+            n_samples += int(est.smooth_idf)
+            idf = np.log(float(n_samples) / df) + 1.0
+            est._tfidf._idf_diag = sp.spdiags(idf, diags=0, m=n_features, n=n_features, format='csr')
+        self.dDf, self.dTf = None, None
+        return est
+
+
+# --- AUTO-TESTS ------------------------------------------------------------------
+def test_PartialFit():
+    from sklearn.base import clone
+    from Transformer import SparseToDense
+    lDoc = ["abc", "", "abcd", "Hello World", "abc", "world", "xyz xyz", "a", "bb bb", "Hello"]
+    rnd = np.random.RandomState(0)
+    aX = rnd.normal(size=(len(lDoc), 3))
+    
+    class Select(Transformer):
+        def __init__(self, b): self.b = b
+        def transform(self, l): return aX[l] if self.b else [lDoc[i] for i in l]
+    
+    for kw in [dict(analyzer='char', ngram_range=(1,3)), dict(max_features=5, binary=True), dict(min_df=2, max_df=0.5, analyzer='char')
+               , dict(vocabulary=["world", "abc", "zzz"]), dict(use_idf=False)]:
+        union = FeatureUnion([ ("text", Pipeline([("sel", Select(False)), ("tfidf", TfidfVectorizer(**kw)), ("dense", SparseToDense())]))
+                             , ("num" , Pipeline([("sel", Select(True)), ("scaler", StandardScaler())])) ])
+        ref = clone(union).fit(range(len(lDoc)))
+        o = PartialFit.make(union)
+        for lChunk in [[0, 1, 2], [], [3], [4, 5, 6, 7, 8, 9]]: o.partial_fit(lChunk)
+        assert o.finish() is union
+        assert union.transformer_list[0][1].steps[1][1].vocabulary_ == ref.transformer_list[0][1].steps[1][1].vocabulary_
+        assert getattr(union.transformer_list[0][1].steps[1][1], "stop_words_", None) == getattr(ref.transformer_list[0][1].steps[1][1], "stop_words_", None)
+        assert np.allclose(union.transform(range(len(lDoc))), ref.transform(range(len(lDoc))))
+    
+    try:
+        PartialFit.make(Pipeline([("a", StandardScaler()), ("b", StandardScaler())]))
+        assert False, "Should have raised an exception"
+    except ValueError: pass
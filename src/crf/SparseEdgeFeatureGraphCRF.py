@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+"""
+    A pystruct EdgeFeatureGraphCRF accepting sparse node and edge feature matrices
+
+    Copyright Xerox(C) 2016 JL. Meunier
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+    Developed  for the EU project READ. The READ project has received funding
+    from the European Union's Horizon 2020 research and innovation programme
+    under grant agreement No 674943.
+
+"""
+import numpy as np
+import scipy.sparse as sp
+
+from pystruct.models import EdgeFeatureGraphCRF
+
+
+class SparseEdgeFeatureGraphCRF(EdgeFeatureGraphCRF):
+    """
+    pystruct computes the potentials and the joint feature with np.dot, which does not accept scipy.sparse matrices.
+    
+    This adapter computes them with the dot method of the feature matrices, so that the node and edge features can be 
+    sparse (e.g. csr_matrix), and delegates to the original code on dense features (so that the results are unchanged). 
+    The potentials and joint feature vector are dense, as usual. 
+    """
+
+    def _get_unary_potentials(self, x, w):
+        features = self._get_features(x)
+        if not sp.issparse(features): return EdgeFeatureGraphCRF._get_unary_potentials(self, x, w)
+        
+        self._check_size_w(w)
+        self._check_size_x(x)
+        unary_params = w[:self.n_states * self.n_features].reshape(self.n_states, self.n_features)
+        return features.dot(unary_params.T)
+
+    def _get_pairwise_potentials(self, x, w):
+        edge_features = self._get_edge_features(x)
+        if not sp.issparse(edge_features): return EdgeFeatureGraphCRF._get_pairwise_potentials(self, x, w)
+        
+        self._check_size_w(w)
+        self._check_size_x(x)
+        pairwise = np.asarray(w[self.n_states * self.n_features:])
+        pairwise = pairwise.reshape(self.n_edge_features, -1)
+        return edge_features.dot(pairwise).reshape(edge_features.shape[0], self.n_states, self.n_states)
+
+    def joint_feature(self, x, y):
+        features, edges = self._get_features(x), self._get_edges(x)
+        edge_features = self._get_edge_features(x)
+        if not (sp.issparse(features) or sp.issparse(edge_features)): return EdgeFeatureGraphCRF.joint_feature(self, x, y)
+        
+        self._check_size_x(x)
+        n_nodes = features.shape[0]
+        if isinstance(y, tuple):
+            # y is result of relaxation, tuple of unary and pairwise marginals
+            unary_marginals, pw = y
+            unary_marginals = unary_marginals.reshape(n_nodes, self.n_states)
+        else:
+            y = y.reshape(n_nodes)
+            #one hot encoding
+            unary_marginals = np.zeros((n_nodes, self.n_states), dtype=np.int)
+            unary_marginals[np.arange(n_nodes), y] = 1
+            pw = np.zeros((edges.shape[0], self.n_states ** 2))
+            pw[np.arange(len(edges)), y[edges[:, 1]] + self.n_states * y[edges[:, 0]]] = 1
+
+        pw = np.asarray(edge_features.T.dot(pw))
+        for i in self.symmetric_edge_features:
+            pw_ = pw[i].reshape(self.n_states, self.n_states)
+            pw[i] = (pw_ + pw_.T).ravel() / 2.
+        for i in self.antisymmetric_edge_features:
+            pw_ = pw[i].reshape(self.n_states, self.n_states)
+            pw[i] = (pw_ - pw_.T).ravel() / 2.
+
+        unaries_acc = np.asarray(features.T.dot(unary_marginals)).T
+        return np.hstack([unaries_acc.ravel(), pw.ravel()])
+    
+
+# --- AUTO-TESTS ------------------------------------------------------------------
+def test_SparseEdgeFeatureGraphCRF():
+    rnd = np.random.RandomState(0)
+    n_states, n_nodes, n_edges = 3, 30, 50
+    X  = sp.random(n_nodes, 20, density=0.2, format='csr', random_state=rnd)
+    EF = sp.random(n_edges, 10, density=0.3, format='csr', random_state=rnd)
+    E  = rnd.randint(0, n_nodes, size=(n_edges, 2))
+    Y  = rnd.randint(0, n_states, size=n_nodes)
+    crf = SparseEdgeFeatureGraphCRF(inference_method='ad3', symmetric_edge_features=[0], antisymmetric_edge_features=[1])
+    crf.initialize([(X, E, EF)], [Y])
+    w = rnd.normal(size=crf.size_joint_feature)
+    xs, xd = (X, E, EF), (X.toarray(), E, EF.toarray())
+    assert np.allclose(crf._get_unary_potentials(xs, w)   , crf._get_unary_potentials(xd, w))
+    assert np.allclose(crf._get_pairwise_potentials(xs, w), crf._get_pairwise_potentials(xd, w))
+    assert np.allclose(crf.joint_feature(xs, Y)           , crf.joint_feature(xd, Y))
+    y_relaxed = crf.inference(xd, w, relaxed=True)
+    assert np.allclose(crf.joint_feature(xs, y_relaxed)   , crf.joint_feature(xd, y_relaxed))
+    assert np.array_equal(crf.inference(xs, w), crf.inference(xd, w))
@@ -25,12 +25,19 @@
     under grant agreement No 674943.
     
 """
+import numpy as np
+
 from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.pipeline import FeatureUnion
+from sklearn.externals.joblib import parallel_backend
 
 class Transformer(BaseEstimator, TransformerMixin):
-    def __init__(self):
+    dtype = np.float64      #dtype of the features (class attribute for the transformers pickled before it existed)
+    
+    def __init__(self, dtype=np.float64):
         BaseEstimator.__init__(self)
         TransformerMixin.__init__(self)
+        self.dtype = dtype
         
     def fit(self, x, y=None):
         return self
@@ -40,4 +47,23 @@ class SparseToDense(Transformer):
         Transformer.__init__(self)
     def transform(self, o):
         return o.toarray()
+
+class ThreadedFeatureUnion(FeatureUnion):
+    """
+    A FeatureUnion whose branches run in n_jobs threads, rather than processes, so that:
+    - the nodes or edges are shared by the branches, rather than pickled for each of them (they may refer to the DOM)
+    - the fitted branches are the transformers of the union, as when n_jobs=1
+    The numpy and scipy computations release the GIL.
+    """
+    def fit(self, X, y=None):
+        with parallel_backend('threading'):
+            return FeatureUnion.fit(self, X, y)
+        
+    def fit_transform(self, X, y=None, **fit_params):
+        with parallel_backend('threading'):
+            return FeatureUnion.fit_transform(self, X, y, **fit_params)
+        
+    def transform(self, X):
+        with parallel_backend('threading'):
+            return FeatureUnion.transform(self, X)
     
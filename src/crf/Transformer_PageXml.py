@@ -26,11 +26,29 @@
 """
 import numpy as np
 
+import util.lcs
 from Transformer import Transformer
-from Edge import HorizontalEdge, VerticalEdge, SamePageEdge, CrossPageEdge
+from NodeTable import NodeTable
+from NgramVectorizer import NodeTextDocuments
+from Edge import HorizontalEdge, VerticalEdge, CrossPageEdge, lEDGE_CLASS
 
 fEPSILON = 10
 
+def _getEdgeTypeOffset(tblEdge, lOffset):
+    """
+    lOffset gives the column offset of the features of vertical, horizontal, cross-page edges
+    return for each edge of the EdgeTable the column offset of its features, as a list
+    """
+    aOffset = np.zeros(len(lEDGE_CLASS), dtype=np.int32)
+    for cEdge, z in zip([VerticalEdge, HorizontalEdge, CrossPageEdge], lOffset): aOffset[lEDGE_CLASS.index(cEdge)] = z
+    return aOffset[tblEdge.type].tolist()
+
+def _asNodeTable(lNode):
+    """
+    return the NodeTable of these nodes, making one if needed
+    """
+    return lNode if isinstance(lNode, NodeTable) else NodeTable(lNode)
+
 #------------------------------------------------------------------------------------------------------
 class NodeTransformerText(Transformer):
     """
@@ -45,8 +63,10 @@ class NodeTransformerTextEnclosed(Transformer):
     """
     we will get a list of block and need to send back what a textual feature extractor (TfidfVectorizer) needs.
     So we return a list of strings  
+    (or NodeTextDocuments for a NodeTable, so that a NodeTextTfidfVectorizer reuses the n-grams of each node)
     """
     def transform(self, lNode):
+        if isinstance(lNode, NodeTable): return NodeTextDocuments(lNode)
         return map(lambda x: "{%s}"%x.text, lNode) #start/end characters
 
 #------------------------------------------------------------------------------------------------------
@@ -69,65 +89,62 @@ class NodeTransformerTextEnclosed(Transformer):
 #------------------------------------------------------------------------------------------------------
 class NodeTransformerTextLen(Transformer):
     """
-    we will get a list of block and need to send back what StandardScaler needs for in-place scaling, a numpy array!.
+    we will get a NodeTable and need to send back what StandardScaler needs for in-place scaling, a numpy array!.
     So we return a numpy array  
     """
-    def transform(self, lNode):
-        a = np.empty( ( len(lNode), 2 ) , dtype=np.float64)             #--- FEAT #1  text length
-        #for i, blk in enumerate(lNode): a[i] = len(blk.text)
-        for i, blk in enumerate(lNode):
-            a[i,:] = len(blk.text), blk.text.count(' ')
+    def transform(self, tblNode):
+        a = np.empty( ( len(tblNode), 2 ) , dtype=self.dtype)             #--- FEAT #1  text length
+        a[:,0] = tblNode.textend - tblNode.textstart
+        a[:,1] = _TextPredicates.countSpaces(tblNode)
         return a
 
 
 #------------------------------------------------------------------------------------------------------
 class NodeTransformerXYWH(Transformer):
     """
-    we will get a list of block and need to send back what StandardScaler needs for in-place scaling, a numpy array!.
+    we will get a NodeTable and need to send back what StandardScaler needs for in-place scaling, a numpy array!.
     So we return a numpy array  
     """
-    def transform(self, lNode):
+    def transform(self, tblNode):
 #         a = np.empty( ( len(lNode), 5 ) , dtype=np.float64)
 #         for i, blk in enumerate(lNode): a[i, :] = [blk.x1, blk.y2, blk.x2-blk.x1, blk.y2-blk.y1, blk.fontsize]        #--- 2 3 4 5 6 
-        a = np.empty( ( len(lNode), 2+4+2+4 ) , dtype=np.float64)
-        for i, blk in enumerate(lNode): 
-            page = blk.page
-            x1,y1,x2,y2 = blk.x1, blk.y1, blk.x2, blk.y2
-            w,h = float(page.w), float(page.h)
-            #Normalize by page with and height
-            xn1, yn1, xn2, yn2 = x1/w, y1/h, x2/w, y2/h
-            #generate X-from-binding
-            if page.bEven:
-                xb1, xb2    = w - x2    , w - x1
-                xnb1, xnb2  = 1.0 - xn2 , 1.0 - xn1
-            else:
-                xb1, xb2    = x1    , x2
-                xnb1, xnb2  = xn1   , xn2
-            a[i, :] = [xb1, xb2     , x1, y2, x2-x1, y2-y1   , xnb1, xnb2   , xn1, yn2, xn2-xn1, yn2-yn1] 
+        a = np.empty( ( len(tblNode), 2+4+2+4 ) , dtype=self.dtype)
+        x1,y1,x2,y2 = tblNode.x1, tblNode.y1, tblNode.x2, tblNode.y2
+        w, h, _cnt = tblNode.getPageColumns()
+        bEven = (tblNode.page_pnum[tblNode.pageindex] % 2 == 0)
+        #Normalize by page with and height
+        xn1, yn1, xn2, yn2 = x1/w, y1/h, x2/w, y2/h
+        #generate X-from-binding
+        a[:, 0]     = np.where(bEven, w - x2    , x1)       #xb1
+        a[:, 1]     = np.where(bEven, w - x1    , x2)       #xb2
+        a[:, 2:6]   = np.column_stack([x1, y2, x2-x1, y2-y1])
+        a[:, 6]     = np.where(bEven, 1.0 - xn2 , xn1)      #xnb1
+        a[:, 7]     = np.where(bEven, 1.0 - xn1 , xn2)      #xnb2
+        a[:, 8:12]  = np.column_stack([xn1, yn2, xn2-xn1, yn2-yn1])
         return a
 
 #------------------------------------------------------------------------------------------------------
 class NodeTransformerNeighbors(Transformer):
     """
     Characterising the neighborough
+    
+    We get a NodeTable, and use its adjacency per edge class.
     """
-    def transform(self, lNode):
+    def transform(self, tblNode):
 #         a = np.empty( ( len(lNode), 5 ) , dtype=np.float64)
 #         for i, blk in enumerate(lNode): a[i, :] = [blk.x1, blk.y2, blk.x2-blk.x1, blk.y2-blk.y1, blk.fontsize]        #--- 2 3 4 5 6 
-        a = np.empty( ( len(lNode), 3+3 ) , dtype=np.float64)
-        for i, blk in enumerate(lNode): 
+        a = np.empty( ( len(tblNode), 3+3 ) , dtype=self.dtype)
+        for j, (cEdge, aValue) in enumerate([ (HorizontalEdge , tblNode.x1)
+                                            , (VerticalEdge   , tblNode.y1)
+                                            , (CrossPageEdge  , tblNode.pnum)]):
+            adj = tblNode.getAdjacency(cEdge)
             #number of horizontal/vertical/crosspage neighbors
-            a[i,0] = len(blk.lHNeighbor)
-            a[i,1] = len(blk.lVNeighbor)
-            a[i,2] = len(blk.lCPNeighbor)
+            a[:,j] = adj.getDegree()
             #number of horizontal/vertical/crosspage neighbors occuring after this block
-            ax1, ay1, apnum = blk.x1, blk.y1, blk.pnum
-            a[i,3] = sum(1 for _b in blk.lHNeighbor  if _b.x1 > ax1)
-            a[i,4] = sum(1 for _b in blk.lVNeighbor  if _b.y1 > ay1)
-            a[i,5] = sum(1 for _b in blk.lCPNeighbor if _b.pnum > apnum)
-            #number of horizontal/vertical/crosspage neighbors occuring after this block
-            #better to give direct info
-            a[i,0:3] = a[i,0:3] - a[i,3:6]
+            a[:,j+3] = adj.countNeighbors(aValue)
+        #number of horizontal/vertical/crosspage neighbors occuring after this block
+        #better to give direct info
+        a[:,0:3] = a[:,0:3] - a[:,3:6]
         
         #_debug(lNode, a)
         return a
@@ -135,29 +152,27 @@ class NodeTransformerNeighbors(Transformer):
 #------------------------------------------------------------------------------------------------------
 class Node1HotFeatures(Transformer):
     """
-    we will get a list of block and return a one-hot encoding, directly
+    we will get a NodeTable and return a one-hot encoding, directly
     """
-    def transform(self, lNode):
+    def transform(self, tblNode):
         #We allocate TWO more columns to store in it the tfidf and idf computed at document level.
         #a = np.zeros( ( len(lNode), 10 ) , dtype=np.float64)  # 4 possible orientations: 0, 1, 2, 3
-        a = np.zeros( ( len(lNode), 7+3+3 ) , dtype=np.float64)  # 4 possible orientations: 0, 1, 2, 3
+        a = np.zeros( ( len(tblNode), 7+3+3 ) , dtype=self.dtype)  # 4 possible orientations: 0, 1, 2, 3
         
-        for i, blk in enumerate(lNode): 
-            s = blk.text
-            if s.isalnum(): a[i, 0] = 1.0 
-            if s.isalpha(): a[i, 1] = 1.0 
-            if s.isdigit(): a[i, 2] = 1.0 
-            if s.islower(): a[i, 3] = 1.0
-            if s.istitle(): a[i, 4] = 1.0 
-            if s.isupper(): a[i, 5] = 1.0
-            if blk.pnum%2 == 0: a[i, 6] = 1.0 #odd/even page number
-            
-            #new in READ
-            #are we in page 1 or 2 or next ones?
-            a[i, 6 +max(1 , min(3, blk.pnum))]      = 1.0  #  a[i, 7-8-9 ]
-            #are we in page -2 or -1 or previous ones?
-            a[i, 12+max(-2, blk.pnum-blk.page.pagecnt)]  = 1.0  #  a[i, 10-11-12 ]
-            #a[i,blk.orientation] = 1.0   
+        pred = _TextPredicates(tblNode)
+        for j, aPred in enumerate([pred.isalnum, pred.isalpha, pred.isdigit, pred.islower, pred.istitle, pred.isupper]):
+            a[:, j] = aPred
+        pnum = tblNode.pnum
+        a[:, 6] = (pnum%2 == 0) #odd/even page number
+        
+        #new in READ
+        aRow = np.arange(len(tblNode))
+        #are we in page 1 or 2 or next ones?
+        a[aRow, 6 +np.clip(pnum, 1, 3)]      = 1.0  #  a[i, 7-8-9 ]
+        #are we in page -2 or -1 or previous ones?
+        _w, _h, pagecnt = tblNode.getPageColumns()
+        a[aRow, 12+np.maximum(-2, pnum-pagecnt)]  = 1.0  #  a[i, 10-11-12 ]
+        #a[i,blk.orientation] = 1.0   
             
         return a
 
@@ -187,10 +202,12 @@ class EdgeTransformerSourceText(Transformer):
         Transformer.__init__(self)
         self._edgeClass = [HorizontalEdge, VerticalEdge, CrossPageEdge][n]
         
-    def transform(self, lEdge):
+    def transform(self, tblEdge):
         #return map(lambda x: x.A.text, lEdge)
 #         return map(lambda x: "{%s}"%x.A.text, lEdge)
-        return map(lambda edge: "{%s}"%edge.A.text if isinstance(edge, self._edgeClass) else "_", lEdge)
+        lNode, iType = tblEdge.lNode, lEDGE_CLASS.index(self._edgeClass)
+        if isinstance(lNode, NodeTable): return NodeTextDocuments(lNode, np.where(tblEdge.type == iType, tblEdge.A, -1))
+        return ["{%s}"%lNode[iA].text if t == iType else "_" for iA, t in zip(tblEdge.A.tolist(), tblEdge.type.tolist())]
 
 #------------------------------------------------------------------------------------------------------
 class EdgeTransformerTargetText(Transformer):
@@ -202,10 +219,12 @@ class EdgeTransformerTargetText(Transformer):
         Transformer.__init__(self)
         self._edgeClass = [HorizontalEdge, VerticalEdge, CrossPageEdge][n]
 
-    def transform(self, lEdge):
+    def transform(self, tblEdge):
         #return map(lambda x: x.B.text, lEdge)
 #         return map(lambda x: "{%s}"%x.B.text, lEdge)
-        return map(lambda edge: "{%s}"%edge.B.text if isinstance(edge, self._edgeClass) else "_", lEdge)
+        lNode, iType = tblEdge.lNode, lEDGE_CLASS.index(self._edgeClass)
+        if isinstance(lNode, NodeTable): return NodeTextDocuments(lNode, np.where(tblEdge.type == iType, tblEdge.B, -1))
+        return ["{%s}"%lNode[iB].text if t == iType else "_" for iB, t in zip(tblEdge.B.tolist(), tblEdge.type.tolist())]
 
 #------------------------------------------------------------------------------------------------------
 class Edge1HotFeatures(Transformer):
@@ -220,66 +239,46 @@ class Edge1HotFeatures(Transformer):
     TODO crossing ruling-line
 
     """
-    def __init__(self, pageNumSequenciality):
-        Transformer.__init__(self)
+    def __init__(self, pageNumSequenciality, dtype=np.float64):
+        Transformer.__init__(self, dtype)
         self.sqnc = pageNumSequenciality
     def fit(self, x, y=None):
         return self
     
-    def transform(self, lEdge):
-        a = np.zeros( ( len(lEdge), 3 + 17*3 ) , dtype=np.float64)
-        for i, edge in enumerate(lEdge):
-            #-- vertical / horizontal / virtual / cross-page / not-neighbor
-            if isinstance(edge, VerticalEdge):
-                a[i,0] = 1.0
-                z = 0
-            elif isinstance(edge, HorizontalEdge):
-                a[i,1] = 1.0
-                z = 17
-            elif isinstance(edge, CrossPageEdge):
-                a[i,2] = 1.0
-                z = 34
-            else:
-                assert False, "INTERNAL ERROR: unknown type of edge"
+    def transform(self, tblEdge):
+        a = np.zeros( ( len(tblEdge), 3 + 17*3 ) , dtype=self.dtype)
+        if len(tblEdge) == 0: return a
+        tblNode = _asNodeTable(tblEdge.lNode)
+        aA, aB = tblEdge.A, tblEdge.B
+        aRow = np.arange(len(tblEdge))
+        aZ = np.array(_getEdgeTypeOffset(tblEdge, [0, 17, 34]), dtype=np.int32)
+        #-- vertical / horizontal / virtual / cross-page / not-neighbor
+        a[aRow, aZ // 17] = 1.0
             
 # 14/12/2016 - useless because of A[i, 0:1]            
 #             #-- same or consecutive page
 #             A,B = edge.A, edge.B        
 #             if A.pnum == B.pnum: 
 #                 a[i,3] = 1.0
-            
-            A,B = edge.A, edge.B        
-            
-            #sequenciality, either None, or increasing or decreasing
-            sA, sB = A.text, B.text
-            if sA == sB: a[i, z + 3] = 1.0
-            if self.sqnc.isPossibleSequence(sA, sB):
-                fInSequence = 1.0
-            elif self.sqnc.isPossibleSequence(sB, sA): 
-                fInSequence = -1.0
-            else:
-                fInSequence = 0.0
-                
-            if A.pnum == B.pnum:
-                a[i, z + 4] = fInSequence          #-1, 0, +1
-                a[i, z + 5] = abs(fInSequence)     # 0 or 1
-            else:
-                a[i, z + 6] = fInSequence          #-1, 0, +1
-                a[i, z + 7] = abs(fInSequence)     # 0 or 1
-             
-            if sA.isalnum(): a[i, z +  8] = 1.0
-            if sA.isalpha(): a[i, z +  9] = 1.0
-            if sA.isdigit(): a[i, z + 10] = 1.0
-            if sA.islower(): a[i, z + 11] = 1.0
-            if sA.istitle(): a[i, z + 12] = 1.0
-            if sA.isupper(): a[i, z + 13] = 1.0  
-                       
-            if sB.isalnum(): a[i, z + 14] = 1.0
-            if sB.isalpha(): a[i, z + 15] = 1.0
-            if sB.isdigit(): a[i, z + 16] = 1.0
-            if sB.islower(): a[i, z + 17] = 1.0
-            if sB.istitle(): a[i, z + 18] = 1.0
-            if sB.isupper(): a[i, z + 19] = 1.0  
+        
+        #sequenciality, either None, or increasing or decreasing
+        lText = tblNode.getTextList()
+        dTextId = dict()
+        aTextId = np.array([dTextId.setdefault(s, len(dTextId)) for s in lText], dtype=np.int32)
+        a[aRow, aZ + 3] = aTextId[aA] == aTextId[aB]
+        aInSequence = np.where(self.sqnc.isPossibleSequenceBatch(lText, aA, aB), 1.0
+                               , np.where(self.sqnc.isPossibleSequenceBatch(lText, aB, aA), -1.0, 0.0))
+        bSamePage = tblNode.pnum[aA] == tblNode.pnum[aB]
+        a[aRow, aZ + 4] = np.where(bSamePage, aInSequence, 0.0)            #-1, 0, +1
+        a[aRow, aZ + 5] = np.where(bSamePage, np.abs(aInSequence), 0.0)    # 0 or 1
+        a[aRow, aZ + 6] = np.where(bSamePage, 0.0, aInSequence)            #-1, 0, +1
+        a[aRow, aZ + 7] = np.where(bSamePage, 0.0, np.abs(aInSequence))    # 0 or 1
+        
+        #the str predicates, computed once per node, of the source then of the target node
+        pred = _TextPredicates(tblNode)
+        for j, aPred in enumerate([pred.isalnum, pred.isalpha, pred.isdigit, pred.islower, pred.istitle, pred.isupper]):
+            a[aRow, aZ +  8 + j] = aPred[aA]
+            a[aRow, aZ + 14 + j] = aPred[aB]
 
         return a
 
@@ -291,33 +290,24 @@ class EdgeBooleanFeatures(Transformer):
     vertical-, horizontal- centered  (at epsilon precision, epsilon typically being 5pt ?)
     left-, top-, right-, bottom- justified  (at epsilon precision)
     """
-    def transform(self, lEdge):
+    def transform(self, tblEdge):
         #DISC a = np.zeros( ( len(lEdge), 16 ) , dtype=np.float64)
-        a = - np.ones( ( len(lEdge), 3*6 ) , dtype=np.float64)
-        for i, edge in enumerate(lEdge):
-            if isinstance(edge, VerticalEdge):
-                z=0
-            elif isinstance(edge, HorizontalEdge):
-                z=6
-            elif isinstance(edge, CrossPageEdge):
-                z=12
-            
-            A,B = edge.A, edge.B        
-            #-- centering
-            if A.x1 + A.x2 - (B.x1 + B.x2) <= 2 * fEPSILON:     #horizontal centered
-                a[i, z + 0] = 1.0
-            if A.y1 + A.y2 - (B.y1 + B.y2) <= 2 * fEPSILON:     #V centered
-                a[i, z + 1] = 1.0
-            
-            #justified
-            if abs(A.x1-B.x1) <= fEPSILON:
-                a[i, z + 2] = 1.0
-            if abs(A.y1-B.y1) <= fEPSILON:
-                a[i, z + 3] = 1.0
-            if abs(A.x2-B.x2) <= fEPSILON:
-                a[i, z + 4] = 1.0
-            if abs(A.y2-B.y2) <= fEPSILON:
-                a[i, z + 5] = 1.0       
+        a = - np.ones( ( len(tblEdge), 3*6 ) , dtype=self.dtype)
+        if len(tblEdge) == 0: return a
+        tblNode = _asNodeTable(tblEdge.lNode)
+        aA, aB = tblEdge.A, tblEdge.B
+        aRow = np.arange(len(tblEdge))
+        aZ = np.array(_getEdgeTypeOffset(tblEdge, [0, 6, 12]), dtype=np.int32)
+        Ax1, Ay1, Ax2, Ay2 = [aCol[aA] for aCol in (tblNode.x1, tblNode.y1, tblNode.x2, tblNode.y2)]
+        Bx1, By1, Bx2, By2 = [aCol[aB] for aCol in (tblNode.x1, tblNode.y1, tblNode.x2, tblNode.y2)]
+        for j, bTest in enumerate([ Ax1 + Ax2 - (Bx1 + Bx2) <= 2 * fEPSILON      #horizontal centered
+                                  , Ay1 + Ay2 - (By1 + By2) <= 2 * fEPSILON      #V centered
+                                  #justified
+                                  , np.abs(Ax1 - Bx1) <= fEPSILON
+                                  , np.abs(Ay1 - By1) <= fEPSILON
+                                  , np.abs(Ax2 - Bx2) <= fEPSILON
+                                  , np.abs(Ay2 - By2) <= fEPSILON ]):
+            a[aRow[bTest], aZ[bTest] + j] = 1.0
         #_debug(lEdge, a)
         return a
 
@@ -331,19 +321,17 @@ class EdgeNumericalSelector(Transformer):
     identical content in [0, 1] as ratio of lcs to "union"
     max( lcs, 25)
     """
-    def transform(self, lEdge):
+    def transform(self, tblEdge):
         #no font size a = np.zeros( ( len(lEdge), 5 ) , dtype=np.float64)
 #         a = np.zeros( ( len(lEdge), 7 ) , dtype=np.float64)
-        a = np.zeros( ( len(lEdge), 3*8 ) , dtype=np.float64)
-        for i, edge in enumerate(lEdge):
-            if isinstance(edge, VerticalEdge):
-                z=0
-            elif isinstance(edge, HorizontalEdge):
-                z=8
-            elif isinstance(edge, CrossPageEdge):
-                z=16
-
-            A,B = edge.A, edge.B        
+        a = np.zeros( ( len(tblEdge), 3*8 ) , dtype=self.dtype)
+        lNode = tblEdge.lNode
+        #all LCS at once: the same pairs of texts occur often
+        lText = lNode.getTextList() if isinstance(lNode, NodeTable) else [nd.text for nd in lNode]
+        lLcs = util.lcs.lcs_length_batch(lText, tblEdge.A, tblEdge.B).tolist()
+        for i, (iA, iB, length, z, lcs) in enumerate(zip(tblEdge.A.tolist(), tblEdge.B.tolist(), tblEdge.length.tolist()
+                                                    , _getEdgeTypeOffset(tblEdge, [0, 8, 16]), lLcs)):
+            A,B = lNode[iA], lNode[iB]
             
             #overlap
             ovr = A.significantOverlap(B, 0)
@@ -355,7 +343,6 @@ class EdgeNumericalSelector(Transformer):
             
             #
             na, nb = len(A.text), len(B.text)
-            lcs = lcs_length(A.text,na, B.text,nb)
             try:
                 a[i, z+2] =  float( lcs / (na+nb-lcs) )
             except ZeroDivisionError:
@@ -364,12 +351,12 @@ class EdgeNumericalSelector(Transformer):
             a[i, z+4] = min(lcs, 100.0)
             
             #new in READ: the length of a same-page edge, along various normalisation schemes
-            if isinstance(edge, SamePageEdge):
-                if isinstance(edge, VerticalEdge):
-                    norm_length = edge.length / float(edge.A.page.h)
+            if z != 16:     #same-page edge
+                if z == 0:  #vertical
+                    norm_length = length / float(A.page.h)
                     a[i, z+5] = norm_length
                 else:
-                    norm_length = edge.length / float(edge.A.page.w)
+                    norm_length = length / float(A.page.w)
                     a[i, z+6] = norm_length
                 a[i, z+7] = norm_length    #normalised length whatever direction it has
                     
@@ -382,6 +369,64 @@ class EdgeNumericalSelector(Transformer):
         return a  
 
 # -----------------------------------------------------------------------------------------------------------------------------    
+class _TextPredicates:
+    """
+    The str predicates (isalnum, isalpha, isdigit, islower, istitle, isupper) of the node texts, each as an array.
+    
+    They are computed from the classes of the characters of the text buffer of the NodeTable, counted per node 
+    using cumulative sums. The character classes are the ASCII ones, as for the Python 2 str methods in the default C locale.
+    Unicode texts are processed by the np.char functions.
+    """
+    def __init__(self, tblNode):
+        sText, aStart, aEnd = tblNode.sText, tblNode.textstart, tblNode.textend
+        if isinstance(sText, unicode):
+            aText = np.array(tblNode.getTextList(), dtype=np.unicode_).reshape( (len(tblNode),) )
+            for sPred in ["isalnum", "isalpha", "isdigit", "islower", "istitle", "isupper"]:
+                setattr(self, sPred, getattr(np.char, sPred)(aText))
+            return
+
+        c = np.frombuffer(sText, dtype=np.uint8)
+        bUpper = (c >= ord('A')) & (c <= ord('Z'))
+        bLower = (c >= ord('a')) & (c <= ord('z'))
+        bDigit = (c >= ord('0')) & (c <= ord('9'))
+        bCased = bUpper | bLower
+        #title case: an uppercase char must follow an uncased one, a lowercase char must follow a cased one
+        bPrevCased = np.zeros(len(c), dtype=np.bool_)
+        bPrevCased[1:] = bCased[:-1]
+        bPrevCased[aStart[aStart < aEnd]] = False  #the first char of a text has no predecessor
+        bUntitled = (bUpper & bPrevCased) | (bLower & ~bPrevCased)
+
+        #number of chars of each class in each text
+        nUpper, nLower, nDigit, nUntitled = [self._countPerText(b, aStart, aEnd) for b in (bUpper, bLower, bDigit, bUntitled)]
+        aLen = aEnd - aStart
+        bNotEmpty = aLen > 0
+        nAlpha = nUpper + nLower
+        self.isalnum    = bNotEmpty & (nAlpha + nDigit == aLen)
+        self.isalpha    = bNotEmpty & (nAlpha == aLen)
+        self.isdigit    = bNotEmpty & (nDigit == aLen)
+        self.islower    = (nLower > 0) & (nUpper == 0)
+        self.isupper    = (nUpper > 0) & (nLower == 0)
+        self.istitle    = (nAlpha > 0) & (nUntitled == 0)
+
+    def countSpaces(cls, tblNode):
+        """
+        return the number of spaces of each node text
+        """
+        sText = tblNode.sText
+        if isinstance(sText, unicode): return np.char.count(np.array(tblNode.getTextList(), dtype=np.unicode_), u' ')
+        return cls._countPerText(np.frombuffer(sText, dtype=np.uint8) == ord(' '), tblNode.textstart, tblNode.textend)
+    countSpaces = classmethod(countSpaces)
+
+    def _countPerText(cls, bChar, aStart, aEnd):
+        """
+        bChar is a boolean array about the chars of the text buffer
+        return the number of true values for each text
+        """
+        aCumul = np.zeros(len(bChar)+1, dtype=np.int32)
+        np.cumsum(bChar, out=aCumul[1:])
+        return aCumul[aEnd] - aCumul[aStart]
+    _countPerText = classmethod(_countPerText)
+
 def _debug(lO, a):
     for i,o in enumerate(lO):
         print o
@@ -390,27 +435,8 @@ def _debug(lO, a):
                 
 def lcs_length(a,na, b,nb):
     """
-    Compute the length of the longest common string. Very fast. JLM March 2016
-    
-    NOTE: I did not compare against fastlcs...
+    Compute the length of the longest common string. 
+    (see util.lcs, which is bit-parallel and memorizes the results)
     """
-    #na, nb = len(a), len(b)
-    if nb < na: a, na, b, nb = b, nb, a, na
-    if na==0: return 0
-    na1 = na+1
-    curRow  = [0]*na1
-    prevRow = [0]*na1
-    range1a1 = range(1, na1)
-    for i in range(nb):
-        bi = b[i]
-        prevRow, curRow = curRow, prevRow
-        curRow[0] = 0
-        curRowj = 0
-        for j in range1a1:
-            if bi == a[j-1]:
-                curRowj = max(1+prevRow[j-1], prevRow[j], curRowj)
-            else:
-                curRowj = max(prevRow[j], curRowj)
-            curRow[j] = curRowj
-    return curRowj
+    return util.lcs.lcs_length(a, b)
 
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+'''
+The graph class and the sample document shared by the tests (and the benchmarks)
+
+Created on 18 Oct 2026
+
+@author: meunier
+'''
+import os
+
+from crf.Graph_MultiPageXml import Graph_MultiPageXml
+from crf.NodeType_PageXml   import NodeType_PageXml
+
+
+class MyGraph(Graph_MultiPageXml):
+    #our own node types, not to interfere with the tasks
+    _lNodeType       = []
+
+nt = NodeType_PageXml("TR"                   #some short prefix because labels below are prefixed with it
+                      , ['catch-word', 'header', 'heading', 'marginalia', 'page-number']   #EXACTLY as in GT data!!!!
+                      , []      #no ignored label/ One of those above or nothing, otherwise Exception!!
+                      , True    #no label means OTHER
+                      )
+nt.setXpathExpr( (".//pc:TextRegion"        #how to find the nodes
+                  , "./pc:TextEquiv")       #how to get their text
+               )
+MyGraph.addNodeType(nt)
+
+sFilename = os.path.join(os.path.dirname(__file__), "7749.mpxml")
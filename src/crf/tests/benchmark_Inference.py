@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+'''
+Benchmark of the inference methods: latency and accuracy of the approximate FastInference methods versus AD3
+
+    python -m crf.tests.benchmark_Inference [--model <model-folder> <model-name>] [<test.mpxml>+]
+
+By default, trains a model on the test document of this folder, and tests on it.
+Accuracy is measured against the annotated labels; agreement and score are relative to the AD3 solution.
+
+Created on 18 Oct 2026
+
+@author: meunier
+'''
+import sys
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from crf.FastInference import FastInference
+from crf.FeatureDefinition_PageXml_std import FeatureDefinition_PageXml_StandardOnes
+from crf.Model_SSVM_AD3 import Model_SSVM_AD3
+from crf.tests import MyGraph, sFilename
+from crf.tests.test_sparse_features import dFeatureConfig
+
+
+def _trainModel(lGraph, sModelDir):
+    fe = FeatureDefinition_PageXml_StandardOnes(**dFeatureConfig)
+    fe.fitTranformers(lGraph)
+    fe.cleanTransformers()
+    mdl = Model_SSVM_AD3("benchmark", sModelDir)
+    mdl.configureLearner(njobs=1, max_iter=100, save_every=1000)
+    mdl.setTranformers(fe.getTransformers())
+    mdl.train(lGraph, False)
+    return mdl
+
+def benchmark(mdl, lGraph, nRepeat=3):
+    lX, lY = mdl.transformGraphs(lGraph, True)
+    crf, w = mdl.ssvm.model, mdl.ssvm.w
+    lPotential = [(crf._get_unary_potentials(X, w), crf._get_pairwise_potentials(X, w), crf._get_edges(X)) for X in lX]
+    print "%d graphs, %d nodes, %d edges"%(len(lX), sum(len(Y) for Y in lY), sum(len(E) for _u, _p, E in lPotential))
+    print "%-8s  %10s  %12s  %8s  %9s  %10s"%("method", "total (s)", "max/graph (s)", "accuracy", "=AD3", "score/AD3")
+    
+    def ad3(X): return crf.inference(X, w)
+    lY_ad3 = None
+    for sMethod in ["ad3"] + FastInference.lMETHOD:
+        fun = ad3 if sMethod == "ad3" else (lambda X, inf=FastInference(sMethod): inf.infer(crf, X, w))
+        tTotal, tMax = None, None
+        for _i in range(nRepeat):
+            lT, lY_pred = [], []
+            for X in lX:
+                t0 = time.time()
+                lY_pred.append(fun(X))
+                lT.append(time.time() - t0)
+            tTotal, tMax = min(tTotal or sum(lT), sum(lT)), min(tMax or max(lT), max(lT))
+        if lY_ad3 is None: lY_ad3 = lY_pred
+        fAcc    = np.mean(np.hstack(lY_pred) == np.hstack(lY))
+        fSame   = np.mean(np.hstack(lY_pred) == np.hstack(lY_ad3))
+        fScore  = sum(FastInference.computeScore(u, p, E, Y) for (u, p, E), Y in zip(lPotential, lY_pred))
+        fScore0 = sum(FastInference.computeScore(u, p, E, Y) for (u, p, E), Y in zip(lPotential, lY_ad3))
+        print "%-8s  %10.3f  %12.3f  %8.4f  %9.4f  %10.4f"%(sMethod, tTotal, tMax, fAcc, fSame, fScore/fScore0)
+
+
+if __name__ == "__main__":
+    lsArg = sys.argv[1:]
+    sModelDir = None
+    if lsArg[:1] == ["--model"]:
+        sModelDir, sModelName = lsArg[1:3]
+        lsArg = lsArg[3:]
+    lGraph = MyGraph.loadGraphs(lsArg or [sFilename], bDetach=True, bLabelled=True)
+    if sModelDir:
+        benchmark(Model_SSVM_AD3(sModelName, sModelDir).load(), lGraph)
+    else:
+        sModelDir = tempfile.mkdtemp()
+        try:
+            benchmark(_trainModel(lGraph, sModelDir), lGraph)
+        finally:
+            shutil.rmtree(sModelDir, True)
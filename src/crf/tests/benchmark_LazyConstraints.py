@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+'''
+Benchmark of the lazy activation of the page constraints versus the constrained AD3 inference on the whole graphs
+
+    python -m crf.tests.benchmark_LazyConstraints --model <model-folder> <model-name> <test.mpxml>+
+
+The constraints are those of DU_StAZH_b: at most one catch-word, heading and page-number per page.
+The constrained AD3 inference is called directly through the ad3 module.
+
+Created on 18 Oct 2026
+
+@author: meunier
+'''
+import sys
+import time
+
+import numpy as np
+import ad3
+
+from crf.LazyConstraintInference import LazyConstraintInference
+from crf.Model_SSVM_AD3 import Model_SSVM_AD3
+from crf.tests import MyGraph, nt
+
+
+class MyConstrainedGraph(MyGraph):
+    pass
+MyConstrainedGraph.setPageConstraint( [  ('ATMOSTONE', nt, 'catch-word' , False)
+                                       , ('ATMOSTONE', nt, 'heading'    , False)
+                                       , ('ATMOSTONE', nt, 'page-number', False) ] )
+
+
+def ad3Solve(unary_potentials, pairwise_potentials, edges, constraints=None):
+    """
+    AD3 inference, with or without constraints, as done by pystruct
+    """
+    if constraints:
+        res = ad3.general_constrained_graph(unary_potentials, edges, pairwise_potentials, constraints, verbose=0, n_iterations=4000)
+    else:
+        res = ad3.general_graph(unary_potentials, edges, pairwise_potentials, verbose=0, n_iterations=4000)
+    unary_marginals = res[0]
+    return np.argmax(unary_marginals, axis=-1)
+
+def benchmark(mdl, lGraph, nRepeat=3):
+    lX, lY = mdl.transformGraphs(lGraph, True)
+    lConstraints = [g.instanciatePageConstraints() for g in lGraph]
+    crf, w = mdl.ssvm.model, mdl.ssvm.w
+    lPotential = [(crf._get_unary_potentials(X, w), crf._get_pairwise_potentials(X, w), crf._get_edges(X)) for X in lX]
+    print "%d graphs, %d pages, %d nodes, %d constraints"%(len(lX), sum(len(g.getNodeIndexByPage()) for g in lGraph)
+                                                         , sum(len(Y) for Y in lY), sum(len(lC) for lC in lConstraints))
+    print "%-8s  %10s  %8s  %9s"%("method", "total (s)", "accuracy", "=full")
+    
+    lY_full = None
+    for sMethod in ["full", "lazy"]:
+        tTotal = None
+        for _i in range(nRepeat):
+            lazy = LazyConstraintInference(ad3Solve)
+            t0 = time.time()
+            if sMethod == "full":
+                lY_pred = [ad3Solve(u, p, E, lC) for (u, p, E), lC in zip(lPotential, lConstraints)]
+            else:
+                lY_pred = [lazy.inference(u, p, E, lC) for (u, p, E), lC in zip(lPotential, lConstraints)]
+            tTotal = min(tTotal or (time.time() - t0), time.time() - t0)
+        if lY_full is None: lY_full = lY_pred
+        fAcc    = np.mean(np.hstack(lY_pred) == np.hstack(lY))
+        fSame   = np.mean(np.hstack(lY_pred) == np.hstack(lY_full))
+        print "%-8s  %10.3f  %8.4f  %9.4f"%(sMethod, tTotal, fAcc, fSame)
+    print lazy.getReport()
+
+
+if __name__ == "__main__":
+    lsArg = sys.argv[1:]
+    if lsArg[:1] != ["--model"] or len(lsArg) < 4:
+        print __doc__
+        sys.exit(1)
+    sModelDir, sModelName = lsArg[1:3]
+    lGraph = MyConstrainedGraph.loadGraphs(lsArg[3:], bDetach=True, bLabelled=True)
+    benchmark(Model_SSVM_AD3(sModelName, sModelDir).load(), lGraph)
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+'''
+Benchmark of the neighbor finding: original code versus vectorized code
+
+    python -m crf.tests.benchmark_NeighborFinder
+
+Created on 18 Oct 2026
+
+@author: meunier
+'''
+import time
+
+from crf.Block import Block
+from crf.tests.test_NeighborFinder import makeRandomBlocks
+
+
+def benchmark(lN=[50, 500, 5000], nRepeat=3):
+    print "%8s  %12s  %12s  %8s  %8s"%("#blocks", "original (s)", "new (s)", "speedup", "#edges")
+    for n in lN:
+        lBlk = makeRandomBlocks(n, seed=n)
+        lt = []
+        for findFun in [Block.findPageNeighborEdges_reference, Block.findPageNeighborEdges]:
+            t = None
+            for _i in range(nRepeat):
+                t0 = time.time()
+                lHEdge, lVEdge = findFun(lBlk)
+                t = min(t, time.time() - t0) if t is not None else time.time() - t0
+            lt.append( (t, len(lHEdge)+len(lVEdge)) )
+        (tRef, nRef), (tNew, nNew) = lt
+        assert nRef == nNew
+        print "%8d  %12.4f  %12.4f  %7.1fx  %8d"%(n, tRef, tNew, tRef / max(tNew, 1e-9), nNew)
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+'''
+Benchmark of the node feature transformers: original per-node loops versus vectorized code
+
+    python -m crf.tests.benchmark_NodeTransformers
+
+Created on 18 Oct 2026
+
+@author: meunier
+'''
+import time
+
+import numpy as np
+
+from crf.NodeTable import NodeTable
+from crf.tests.test_Transformer_PageXml import makeRandomNodes, lNodeFeatureReference
+
+
+def _time(fun, nRepeat):
+    t = None
+    for _i in range(nRepeat):
+        t0 = time.time()
+        a = fun()
+        t = min(t, time.time() - t0) if t is not None else time.time() - t0
+    return t, a
+
+def benchmark(lN=[1000, 10000, 100000], nRepeat=3):
+    print "%-24s  %8s  %12s  %12s  %8s"%("transformer", "#nodes", "original (s)", "new (s)", "speedup")
+    for n in lN:
+        lNode = makeRandomNodes(n, max(1, n/50), seed=n)
+        tbl = NodeTable(lNode)
+        for cTransformer, fun_reference in lNodeFeatureReference:
+            tRef, aRef = _time(lambda: fun_reference(lNode), nRepeat)
+            tNew, aNew = _time(lambda: cTransformer().transform(tbl), nRepeat)
+            assert np.array_equal(aRef, aNew)
+            print "%-24s  %8d  %12.4f  %12.4f  %7.1fx"%(cTransformer.__name__, n, tRef, tNew, tRef / max(tNew, 1e-9))
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+'''
+Benchmark of the page-number sequentiality checks: uncached conversions versus memorized ones
+
+    python -m crf.tests.benchmark_PageNumberSequenciality
+
+Created on 18 Oct 2026
+
+@author: meunier
+'''
+import random
+import time
+
+import numpy as np
+
+from crf.PageNumberSimpleSequenciality import PageNumberSimpleSequenciality
+
+
+def isPossibleSequence_reference(s1, s2):
+    """
+    the original, uncached, check
+    """
+    try:
+        n1 = int(s1)
+        n2 = int(s2)
+        return (n1 + 1) == n2
+    except:
+        return False
+
+def makeRandomEdgeTexts(nNode, nEdge, seed=0):
+    """
+    a few recurring short strings, as in a document: page numbers, folio marks, catch-words, headers
+    """
+    rnd = random.Random(seed)
+    lsText = [str(i) for i in range(1, 200)] + ["f. %d"%i for i in range(1, 50)] + ["Item", "Summa", "den", "Herr", "", "1 7 8 9", "XII"]
+    lText = [rnd.choice(lsText) for _i in range(nNode)]
+    aA = np.array([rnd.randrange(nNode) for _i in range(nEdge)])
+    aB = np.array([rnd.randrange(nNode) for _i in range(nEdge)])
+    return lText, aA, aB
+
+def benchmark(lN=[1000, 10000, 100000], nRepeat=3):
+    print "%8s  %8s  %14s  %14s  %14s"%("#nodes", "#edges", "original (s)", "memorized (s)", "batch (s)")
+    for n in lN:
+        lText, aA, aB = makeRandomEdgeTexts(n, 3*n, seed=n)
+        lPair = zip([lText[i] for i in aA], [lText[i] for i in aB])
+        tRef = tMemo = tBatch = None
+        for _i in range(nRepeat):
+            pns = PageNumberSimpleSequenciality()
+            t0 = time.time()
+            lRef = [isPossibleSequence_reference(s1, s2) or isPossibleSequence_reference(s2, s1) for s1, s2 in lPair]
+            t1 = time.time()
+            lMemo = [pns.isPossibleSequence(s1, s2) or pns.isPossibleSequence(s2, s1) for s1, s2 in lPair]
+            t2 = time.time()
+            pns = PageNumberSimpleSequenciality()
+            aBatch = pns.isPossibleSequenceBatch(lText, aA, aB) | pns.isPossibleSequenceBatch(lText, aB, aA)
+            t3 = time.time()
+            assert lRef == lMemo == aBatch.tolist()
+            tRef, tMemo, tBatch = [t if tOld is None else min(t, tOld) for t, tOld in [(t1-t0, tRef), (t2-t1, tMemo), (t3-t2, tBatch)]]
+        print "%8d  %8d  %14.4f  %14.4f  %14.4f"%(n, len(aA), tRef, tMemo, tBatch)
+
+
+if __name__ == "__main__":
+    benchmark()
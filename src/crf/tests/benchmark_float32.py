@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+'''
+Benchmark of the feature dtype: memory of the features and accuracy of the trained model, float64 versus float32
+
+    python -m crf.tests.benchmark_float32 [<train.mpxml>+ [--tst <test.mpxml>+]]
+
+By default, trains and tests on the test document of this folder.
+
+Created on 18 Oct 2026
+
+@author: meunier
+'''
+import os
+import sys
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+from crf.FeatureDefinition_PageXml_std import FeatureDefinition_PageXml_StandardOnes
+from crf.Model_SSVM_AD3 import Model_SSVM_AD3
+from crf.tests import MyGraph, sFilename
+from crf.tests.test_sparse_features import dFeatureConfig
+
+
+def _nbytes(M):
+    if sp.issparse(M): return M.data.nbytes + M.indices.nbytes + M.indptr.nbytes
+    return M.nbytes
+
+def _run(lGraph_trn, lGraph_tst, dtype, bSparse):
+    sModelDir = tempfile.mkdtemp()
+    try:
+        fe = FeatureDefinition_PageXml_StandardOnes(b_sparse=bSparse, dtype=dtype, **dFeatureConfig)
+        fe.fitTranformers(lGraph_trn)
+        fe.cleanTransformers()
+        mdl = Model_SSVM_AD3("benchmark", sModelDir)
+        mdl.configureLearner(njobs=1, max_iter=100, save_every=1000)
+        mdl.setTranformers(fe.getTransformers())
+        
+        t0 = time.time()
+        lX, lY = mdl.transformGraphs(lGraph_trn, True)
+        tFeat = time.time() - t0
+        nBytes = sum(_nbytes(X[0]) + _nbytes(X[2]) for X in lX)
+        del lX, lY
+        
+        t0 = time.time()
+        mdl.train(lGraph_trn, False)
+        tTrain = time.time() - t0
+        
+        lX, lY = mdl.transformGraphs(lGraph_tst, True)
+        lY_pred = mdl.ssvm.predict(lX)
+        fAcc = np.mean(np.hstack(lY_pred) == np.hstack(lY))
+        return nBytes, tFeat, tTrain, fAcc
+    finally:
+        shutil.rmtree(sModelDir, True)
+    
+def benchmark(lsTrn, lsTst):
+    lGraph_trn = MyGraph.loadGraphs(lsTrn, bDetach=True, bLabelled=True)
+    lGraph_tst = MyGraph.loadGraphs(lsTst, bDetach=True, bLabelled=True)
+    print "%-8s  %-6s  %14s  %12s  %10s  %8s"%("dtype", "sparse", "features (MB)", "features (s)", "train (s)", "accuracy")
+    for bSparse in [False, True]:
+        dRef = None
+        for dtype in [np.float64, np.float32]:
+            nBytes, tFeat, tTrain, fAcc = _run(lGraph_trn, lGraph_tst, dtype, bSparse)
+            print "%-8s  %-6s  %14.2f  %12.2f  %10.1f  %8.4f"%(np.dtype(dtype).name, bSparse, nBytes/1e6, tFeat, tTrain, fAcc)
+            if dRef is None: 
+                dRef = (nBytes, fAcc)
+            else:
+                print "%-8s  %-6s  %13.0f%%  %12s  %10s  %+8.4f"%("delta", "", 100.0*(nBytes-dRef[0])/dRef[0], "", "", fAcc-dRef[1])
+
+
+if __name__ == "__main__":
+    lsArg = sys.argv[1:]
+    if "--tst" in lsArg:
+        i = lsArg.index("--tst")
+        lsTrn, lsTst = lsArg[:i], lsArg[i+1:]
+    else:
+        lsTrn = lsTst = lsArg or [sFilename]
+    benchmark(lsTrn, lsTst)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+'''
+Testing the disk cache of features
+
+Created on 18 Oct 2026
+
+@author: meunier
+'''
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import scipy.sparse as sp
+
+import crf.FeatureCache
+from crf.FeatureDefinition_PageXml_std import FeatureDefinition_PageXml_StandardOnes
+from crf.Model_SSVM_AD3 import Model_SSVM_AD3
+from crf.tests import MyGraph, sFilename
+
+
+def _dense(M):
+    return M.toarray() if sp.issparse(M) else np.asarray(M)
+
+def test_matrices():
+    crf.FeatureCache.test_FeatureCache()
+    
+def test_cache():
+    sModelDir, sCacheDir = tempfile.mkdtemp(), tempfile.mkdtemp()
+    try:
+        lGraph = MyGraph.loadGraphs([sFilename], bDetach=True, bLabelled=True)
+        for bSparse in [False, True]:
+            fe = FeatureDefinition_PageXml_StandardOnes(500, (2,4), False, 250, (2,4), False, b_sparse=bSparse)
+            fe.fitTranformers(lGraph)
+            fe.cleanTransformers()
+            mdl = Model_SSVM_AD3("test", sModelDir)
+            mdl.setTranformers(fe.getTransformers())
+            mdl.saveTransformers()
+            [X0] = mdl.transformGraphs(lGraph)
+            
+            mdl.setFeatureCacheDir(sCacheDir)
+            [X1], [Y1] = mdl.transformGraphs(lGraph, True)   #miss
+            [X2], [Y2] = mdl.transformGraphs(lGraph, True)   #hit
+            assert mdl._featureCache.getHitMissCounts() == (1, 1)
+            assert np.array_equal(Y1, Y2)
+            
+            #same fitted transformers loaded from disk: same fingerprint
+            mdl2 = Model_SSVM_AD3("test", sModelDir)
+            mdl2.loadTransformers()
+            assert mdl2.getTransformerFingerprint() == mdl.getTransformerFingerprint()
+            mdl2.setFeatureCacheDir(sCacheDir)
+            [X3] = mdl2.transformGraphs(lGraph)
+            assert mdl2._featureCache.getHitMissCounts() == (1, 0)
+            
+            for X in [X1, X2, X3]:
+                for M0, M in zip(X0, X): 
+                    assert sp.issparse(M) == sp.issparse(M0)
+                    assert np.array_equal(_dense(M0), _dense(M))
+            assert isinstance(X3[1], np.memmap)
+        assert len(os.listdir(sCacheDir)) == 2
+    finally:
+        shutil.rmtree(sModelDir, True)
+        shutil.rmtree(sCacheDir, True)
+
+
+if __name__ == "__main__":
+    test_matrices()
+    test_cache()
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+'''
+Testing that fitting the transformers graph by graph gives the same features as fitting them at once
+
+Created on 18 Oct 2026
+
+@author: meunier
+'''
+import numpy as np
+
+import crf.PartialFit
+from crf.FeatureDefinition_PageXml_std import FeatureDefinition_PageXml_StandardOnes
+from crf.tests import MyGraph, sFilename
+
+
+def test_partial_fit():
+    crf.PartialFit.test_PartialFit()
+
+def test_streaming_fit():
+    lGraph = MyGraph.loadGraphs([sFilename, sFilename], bDetach=True, bLabelled=True)
+    for tConfig in [(500, (2,4), False, 250, (2,4), False), (50, (1,3), True, 20, (2,2), True)]:
+        fe = FeatureDefinition_PageXml_StandardOnes(*tConfig)
+        fe.fitTranformers(lGraph)
+        
+        feS = FeatureDefinition_PageXml_StandardOnes(*tConfig)
+        feS.fitTranformersStreaming(MyGraph.iterGraphs([sFilename, sFilename], bLabelled=True))
+        
+        for g in lGraph:
+            X, E, EF = g.buildNodeEdgeMatrices(*fe.getTransformers())
+            XS, ES, EFS = g.buildNodeEdgeMatrices(*feS.getTransformers())
+            assert np.allclose(X, XS) and np.array_equal(E, ES) and np.allclose(EF, EFS)
+        assert fe.tfidfNodeTextVectorizer.vocabulary_ == feS.tfidfNodeTextVectorizer.vocabulary_
+
+
+if __name__ == "__main__":
+    test_partial_fit()
+    test_streaming_fit()
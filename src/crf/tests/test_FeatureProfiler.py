@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+'''
+Testing the profile of the feature extraction
+
+Created on 18 Oct 2026
+
+@author: meunier
+'''
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+import crf.FeatureProfiler
+from crf.FeatureDefinition_PageXml_std import FeatureDefinition_PageXml_StandardOnes
+from crf.Model_SSVM_AD3 import Model_SSVM_AD3
+from crf.tests import MyGraph, sFilename
+
+
+def test_profiler():
+    crf.FeatureProfiler.test_FeatureProfiler()
+    
+def test_profile():
+    sModelDir = tempfile.mkdtemp()
+    try:
+        lGraph = MyGraph.loadGraphs([sFilename, sFilename], bDetach=True, bLabelled=True)
+        fe = FeatureDefinition_PageXml_StandardOnes(500, (2,4), False, 250, (2,4), False)
+        fe.fitTranformers(lGraph)
+        fe.cleanTransformers()
+        mdl = Model_SSVM_AD3("test", sModelDir)
+        mdl.setTranformers(fe.getTransformers())
+        mdl.saveTransformers()
+        lClass0 = [t.__class__ for t in mdl.getTransformers()]
+        lX0 = mdl.transformGraphs(lGraph)
+        assert mdl.getFeatureProfile() is None
+        
+        mdl.setFeatureProfiling(True)
+        lX = mdl.transformGraphs(lGraph)
+        for X0, X in zip(lX0, lX):
+            for M0, M in zip(X0, X): assert np.array_equal(M0, M)
+        
+        sReportFile = os.path.join(sModelDir, "profile.json")
+        mdl.getFeatureProfile().saveReport(sReportFile)
+        with open(sReportFile) as fd: dReport = json.load(fd)
+        assert len(dReport["graphs"]) == 2
+        dRecord = { d["path"]:d for d in dReport["transformers"] }
+        assert dRecord["node"]["shape"] == list(lX[1][0].shape) and dRecord["edge"]["shape"] == list(lX[1][2].shape)
+        assert dRecord["node"]["calls"] == dRecord["edge"]["calls"] == 2
+        #every transformer of the tree is there, e.g. the TF-IDF of the node texts
+        assert any(sPath.startswith("node/") and d["class"] == "NodeTextTfidfVectorizer" for sPath, d in dRecord.items())
+        assert all(d["calls"] == 2 for d in dRecord.values())
+        
+        #the instrumented transformers are pickled as usual
+        sFingerprint = mdl.getTransformerFingerprint()
+        mdl._sTransformerFingerprint = None
+        assert mdl.getTransformerFingerprint() == sFingerprint
+        
+        #concurrent profiled feature computations, e.g. from the prediction server
+        lResult, lError = [None] * 4, []
+        def run(i):
+            try:
+                [lResult[i]] = mdl.transformGraphs(lGraph[:1])
+            except Exception as e:
+                lError.append(e)
+        lThread = [threading.Thread(target=run, args=(i,)) for i in range(4)]
+        for th in lThread: th.start()
+        for th in lThread: th.join()
+        assert not lError, lError
+        for X in lResult:
+            for M0, M in zip(lX0[0], X): assert np.array_equal(M0, M)
+        assert len(mdl.getFeatureProfile().getReport()["graphs"]) == 6
+        #not left instrumented
+        assert [t.__class__ for t in mdl.getTransformers()] == lClass0
+        mdl._sTransformerFingerprint = None
+        assert mdl.getTransformerFingerprint() == sFingerprint
+    finally:
+        shutil.rmtree(sModelDir, True)
+
+
+if __name__ == "__main__":
+    test_profiler()
+    test_profile()
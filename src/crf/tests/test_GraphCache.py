@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+'''
+Testing the disk cache of graphs
+
+Created on 18 Oct 2026
+
+@author: meunier
+'''
+import os
+import shutil
+import tempfile
+
+from crf.Edge import lEDGE_CLASS
+from crf.tests import MyGraph, nt, sFilename
+
+
+def _dump(g):
+    return (  [(nd.domid, nd.pnum, nd.getBB(), nd.text, nd.cls, nd.orientation, nd.page.pnum, nd.page.pagecnt, nd.page.w, nd.page.h) for nd in g.lNode]
+            , [(e.__class__, e.A.domid, e.B.domid, getattr(e, "length", None)) for e in g.lEdge]
+            , [g.getAdjacency(cEdge).indices.tolist() for cEdge in lEDGE_CLASS] )
+
+def test_cache():
+    sCacheDir = tempfile.mkdtemp()
+    try:
+        [g0] = MyGraph.loadGraphs([sFilename], bDetach=True, bLabelled=True)
+
+        [g1] = MyGraph.loadGraphs([sFilename], bDetach=True, bLabelled=True, sCacheDir=sCacheDir)
+        assert len(os.listdir(sCacheDir)) == 1
+        [g2] = MyGraph.loadGraphs([sFilename], bDetach=True, bLabelled=True, sCacheDir=sCacheDir)
+        assert len(os.listdir(sCacheDir)) == 1
+
+        assert _dump(g0) == _dump(g1) == _dump(g2)
+        for nd in g2.lNode: assert nd.type is nt
+
+        #an unlabelled entry cannot serve a labelled load
+        shutil.rmtree(sCacheDir)
+        MyGraph.loadGraphs([sFilename], bDetach=True, bLabelled=False, sCacheDir=sCacheDir)
+        [g3] = MyGraph.loadGraphs([sFilename], bDetach=True, bLabelled=True, sCacheDir=sCacheDir)
+        assert _dump(g0) == _dump(g3)
+    finally:
+        shutil.rmtree(sCacheDir, True)
+
+
+if __name__ == "__main__":
+    test_cache()
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+'''
+Testing the parallel loading of graphs
+
+Created on 18 Oct 2026
+
+@author: meunier
+'''
+from crf.Edge import VerticalEdge
+from crf.tests import MyGraph, nt, sFilename
+
+
+def test_parallel_load():
+    lsFilename = [sFilename, sFilename, sFilename]
+
+    lGraph_seq = MyGraph.loadGraphs(lsFilename, bDetach=True, bLabelled=True)
+    lGraph_par = MyGraph.loadGraphs(lsFilename, bDetach=True, bLabelled=True, n_jobs=2)
+
+    assert len(lGraph_seq) == len(lGraph_par) == 3
+    for g1, g2 in zip(lGraph_seq, lGraph_par):
+        assert g2.doc is None
+        assert [nd.domid for nd in g1.lNode] == [nd.domid for nd in g2.lNode]
+        assert [nd.cls   for nd in g1.lNode] == [nd.cls   for nd in g2.lNode]
+        assert [(e.A.domid, e.B.domid, e.__class__) for e in g1.lEdge] == [(e.A.domid, e.B.domid, e.__class__) for e in g2.lEdge]
+        assert g1.getAdjacency(VerticalEdge).getDegree().tolist() == g2.getAdjacency(VerticalEdge).getDegree().tolist()
+        for nd in g2.lNode:
+            assert nd.type is nt
+            assert nd.node is None and nd.page.node is None
+
+def test_parallel_load_attached():
+    try:
+        MyGraph.loadGraphs([sFilename, sFilename], bDetach=False, n_jobs=2)
+        assert False, "Exception expected"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    test_parallel_load()
+    test_parallel_load_attached()
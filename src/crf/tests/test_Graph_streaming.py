@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+'''
+Testing the streaming construction of graphs, and the streaming write-back of the labels
+
+Created on 18 Oct 2026
+
+@author: meunier
+'''
+import os
+import shutil
+import tempfile
+
+import libxml2
+import numpy as np
+
+from crf.Edge import lEDGE_CLASS
+from crf.tests import MyGraph, sFilename
+from xml_formats.PageXml import MultiPageXml
+
+
+
+
+def _dump(g):
+    return (  [(nd.domid, nd.pnum, nd.getBB(), nd.text, nd.cls, nd.page.pnum, nd.page.pagecnt, nd.page.w, nd.page.h) for nd in g.lNode]
+            , [(e.__class__, e.A.domid, e.B.domid, getattr(e, "length", None)) for e in g.lEdge]
+            , [g.getAdjacency(cEdge).indices.tolist() for cEdge in lEDGE_CLASS] )
+
+def _dumpFile(sFilename):
+    doc = libxml2.parseFile(sFilename)
+    ctxt = doc.xpathNewContext()
+    lDump = [(nd.name, nd.prop("id"), nd.prop("custom")) for nd in ctxt.xpathEval("//*")]
+    ctxt.xpathFreeContext()
+    doc.freeDoc()
+    return lDump
+
+def test_streaming_load():
+    [g0] = MyGraph.loadGraphs([sFilename], bDetach=True, bLabelled=True)
+    [g1] = MyGraph.loadGraphs([sFilename], bDetach=True, bLabelled=True, bStreaming=True)
+    assert g1.doc is None
+    for nd in g1.lNode: assert nd.node is None and nd.page.node is None
+    assert _dump(g0) == _dump(g1)
+    
+    try:
+        MyGraph.loadGraphs([sFilename], bDetach=False, bStreaming=True)
+        assert False, "streaming graphs must be detached"
+    except ValueError:
+        pass
+
+def test_streaming_write():
+    sDir = tempfile.mkdtemp()
+    try:
+        [g0] = MyGraph.loadGraphs([sFilename], bDetach=False, bLabelled=False)
+        [g1] = MyGraph.loadGraphs([sFilename], bDetach=True, bLabelled=False, bStreaming=True)
+        Y = np.random.RandomState(0).randint(0, len(MyGraph.getLabelNameList()), len(g0.lNode))
+        
+        doc = g0.setDomLabels(Y)
+        sRefFilename = os.path.join(sDir, "ref.mpxml")
+        doc.saveFormatFileEnc(sRefFilename, "utf-8", True)
+        g0.detachFromDOM()
+        
+        sOutFilename = os.path.join(sDir, "out.mpxml")
+        assert g1.setDomLabelsStreaming(Y, sFilename, sOutFilename) == sOutFilename
+        assert _dumpFile(sRefFilename) == _dumpFile(sOutFilename)
+        
+        #the metadata is updated, as in the non-streaming mode
+        g1.setDomLabelsStreaming(Y, sFilename, sOutFilename, "me", "some comment")
+        doc = libxml2.parseFile(sOutFilename)
+        lNdMetadata = MultiPageXml._getMetadataNodeList(doc, None)
+        assert len(lNdMetadata) > 1
+        for nd in lNdMetadata:
+            assert "me" in nd.serialize() and "some comment" in nd.serialize()
+        doc.freeDoc()
+    finally:
+        shutil.rmtree(sDir, True)
+
+
+if __name__ == "__main__":
+    test_streaming_load()
+    test_streaming_write()
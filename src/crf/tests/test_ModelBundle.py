@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+'''
+Testing the loading of a model from a model bundle, and the freshness of the bundle w.r.t. the pickled model files
+
+Created on 18 Oct 2026
+
+@author: meunier
+'''
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+from pystruct.learners import OneSlackSSVM
+
+from crf.Model_SSVM_AD3 import Model_SSVM_AD3
+from crf.SparseEdgeFeatureGraphCRF import SparseEdgeFeatureGraphCRF
+
+
+def _makeModel(sDir):
+    mdl = Model_SSVM_AD3("m", sDir)
+    mdl.ssvm = OneSlackSSVM(SparseEdgeFeatureGraphCRF(inference_method='ad3'))
+    mdl.ssvm.w = np.arange(20, dtype=np.float64)
+    mdl.ssvm.constraints_ = [np.zeros(1000)]
+    mdl.setTranformers( (StandardScaler().fit(np.random.RandomState(0).rand(10, 3)), None) )
+    mdl.saveTransformers()
+    mdl.save()
+    with open(mdl.getModelFilename(), "wb") as fd: fd.write("not a pickle")
+    #pickled files older than the bundle to come
+    t = time.time() - 10
+    for s in [mdl.getModelFilename(), mdl.getTransformerFilename(), mdl.getBaselineFilename()]: os.utime(s, (t, t))
+    return mdl
+
+def test_bundle():
+    sDir = tempfile.mkdtemp()
+    try:
+        mdl = _makeModel(sDir)
+        sFingerprint = mdl.getTransformerFingerprint()
+        mdl.saveBundle()
+        
+        mdl2 = Model_SSVM_AD3("m", sDir).load()
+        assert isinstance(mdl2.ssvm.w, np.memmap) and np.array_equal(mdl2.ssvm.w, mdl.ssvm.w)
+        assert mdl2.ssvm.constraints_ is None and mdl.ssvm.constraints_ is not None
+        assert mdl2.getTransformerFingerprint() == sFingerprint
+        node_tr, _ = mdl2.getTransformers()
+        X = np.random.RandomState(1).rand(5, 3)
+        assert np.array_equal(node_tr.transform(X), mdl.getTransformers()[0].transform(X))
+        
+        #not fresh enough
+        assert not Model_SSVM_AD3("m", sDir).loadBundle(time.time()+10)
+        
+        #a pickled model file more recent than the bundle
+        t = time.time() + 10
+        os.utime(mdl.getTransformerFilename(), (t, t))
+        assert not Model_SSVM_AD3("m", sDir).loadBundle()
+    finally:
+        shutil.rmtree(sDir, True)
+
+
+if __name__ == "__main__":
+    test_bundle()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+'''
+Testing that the vectorized neighbor finder finds the same edges as the original code
+
+Created on 18 Oct 2026
+
+@author: meunier
+'''
+import random
+
+import libxml2
+
+from crf.Block import Block
+from crf.tests import MyGraph, sFilename
+
+
+def makeRandomBlocks(nBlock, seed=0, bOverlap=False):
+    """
+    make a page of blocks: lines of blocks of various size, as in a register
+    if bOverlap, blocks are randomly placed, overlapping each other
+    """
+    rnd = random.Random(seed)
+    lBlk = list()
+    if bOverlap:
+        for _i in range(nBlock):
+            lBlk.append( Block(1, (rnd.randint(0, 2000), rnd.randint(0, 3000), rnd.randint(1, 300), rnd.randint(1, 100)), "", 0, 0, None) )
+        return lBlk
+    y = 0
+    while len(lBlk) < nBlock:
+        x = rnd.randint(0, 50)
+        h = rnd.randint(10, 60)
+        while x < 2000 and len(lBlk) < nBlock:
+            w = rnd.randint(5, 300)
+            yy = y + rnd.randint(0, 10)
+            lBlk.append( Block(1, (x, yy, w, h), "", 0, 0, None) )
+            x = x + w + rnd.randint(1, 40)
+        y = y + h + rnd.randint(1, 30)
+    return lBlk
+
+def _edges(lEdge):
+    return [(e.__class__, id(e.A), id(e.B), e.length) for e in lEdge]
+
+def _checkSame(lBlk, bShortOnly=False):
+    lBB = [blk.getBB() for blk in lBlk]
+    lHRef, lVRef = Block.findPageNeighborEdges_reference(lBlk, bShortOnly)
+    lH, lV = Block.findPageNeighborEdges(lBlk, bShortOnly)
+    assert lBB == [blk.getBB() for blk in lBlk]
+    #same edges, in same order
+    assert _edges(lHRef) == _edges(lH)
+    assert _edges(lVRef) == _edges(lV)
+    return len(lH), len(lV)
+
+def test_random_pages():
+    for seed in range(8):
+        for n in [0, 1, 2, 5, 50, 300]:
+            for bOverlap in [False, True]:
+                lBlk = makeRandomBlocks(n, seed, bOverlap)
+                _checkSame(lBlk, False)
+                _checkSame(lBlk, True)
+
+def test_random_consecutive_pages():
+    for seed in range(8):
+        for n in [0, 1, 5, 50, 300]:
+            for bOverlap in [False, True]:
+                lPrevBlk = makeRandomBlocks(n, seed, bOverlap)
+                lBlk     = makeRandomBlocks(n, seed+100, bOverlap)
+                for i, blk in enumerate(lBlk): blk.orientation = i % 2
+                lEdgeRef = Block.findConsecPageOverlapEdges_reference(lPrevBlk, lBlk)
+                lEdge    = Block.findConsecPageOverlapEdges(lPrevBlk, lBlk)
+                assert [(id(e.A), id(e.B)) for e in lEdgeRef] == [(id(e.A), id(e.B)) for e in lEdge]
+
+def test_document():
+    g = MyGraph()
+    doc = libxml2.parseFile(sFilename)
+    nEdge, nCPEdge = 0, 0
+    lPrevPageNode = None
+    for _pnum, page, domNdPage in g._iter_Page_DomNode(doc):
+        lPageNode = [nd for nodeType in g.getNodeTypeList() for nd in nodeType._iter_GraphNode(doc, domNdPage, page) ]
+        nH, nV = _checkSame(lPageNode)
+        nEdge += nH + nV
+        if lPrevPageNode:
+            lEdgeRef = Block.findConsecPageOverlapEdges_reference(lPrevPageNode, lPageNode)
+            lEdge    = Block.findConsecPageOverlapEdges(lPrevPageNode, lPageNode)
+            assert [(id(e.A), id(e.B)) for e in lEdgeRef] == [(id(e.A), id(e.B)) for e in lEdge]
+            nCPEdge += len(lEdge)
+        lPrevPageNode = lPageNode
+    doc.freeDoc()
+    assert nEdge > 0 and nCPEdge > 0
+
+
+if __name__ == "__main__":
+    test_random_pages()
+    test_random_consecutive_pages()
+    test_document()
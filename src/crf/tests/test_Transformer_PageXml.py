@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+
+'''
+Testing the node feature transformers against a straightforward per-node computation
+
+Created on 18 Oct 2026
+
+@author: meunier
+'''
+import random
+
+import numpy as np
+
+from crf.Block import Block
+from crf.Edge import HorizontalEdge, VerticalEdge, CrossPageEdge
+from crf.NodeTable import NodeTable
+from crf.Page import Page
+from crf.Transformer_PageXml import NodeTransformerNeighbors, NodeTransformerTextLen, NodeTransformerXYWH, Node1HotFeatures
+from crf.Transformer_PageXml import Edge1HotFeatures, EdgeBooleanFeatures, fEPSILON
+from crf.EdgeTable import EdgeTable
+from crf.PageNumberSimpleSequenciality import PageNumberSimpleSequenciality
+from crf.tests import MyGraph, sFilename
+
+
+def _neighbors_reference(g):
+    """
+    the neighbors features, computed node by node from the list of edges
+    """
+    dlNeighbor = { cEdge:[list() for _nd in g.lNode] for cEdge in [HorizontalEdge, VerticalEdge, CrossPageEdge] }
+    dIndex = { id(nd):i for i, nd in enumerate(g.lNode) }
+    for edge in g.lEdge:
+        iA, iB = dIndex[id(edge.A)], dIndex[id(edge.B)]
+        dlNeighbor[edge.__class__][iA].append(edge.B)
+        dlNeighbor[edge.__class__][iB].append(edge.A)
+    a = np.empty( ( len(g.lNode), 6 ) , dtype=np.float64)
+    for i, blk in enumerate(g.lNode):
+        lH, lV, lCP = dlNeighbor[HorizontalEdge][i], dlNeighbor[VerticalEdge][i], dlNeighbor[CrossPageEdge][i]
+        a[i,3] = sum(1 for _b in lH  if _b.x1 > blk.x1)
+        a[i,4] = sum(1 for _b in lV  if _b.y1 > blk.y1)
+        a[i,5] = sum(1 for _b in lCP if _b.pnum > blk.pnum)
+        a[i,0:3] = [len(lH) - a[i,3], len(lV) - a[i,4], len(lCP) - a[i,5]]
+    return a
+
+def _textlen_reference(lNode):
+    a = np.empty( ( len(lNode), 2 ) , dtype=np.float64)
+    for i, blk in enumerate(lNode):
+        a[i,:] = len(blk.text), blk.text.count(' ')
+    return a
+
+def _xywh_reference(lNode):
+    a = np.empty( ( len(lNode), 2+4+2+4 ) , dtype=np.float64)
+    for i, blk in enumerate(lNode): 
+        page = blk.page
+        x1,y1,x2,y2 = blk.x1, blk.y1, blk.x2, blk.y2
+        w,h = float(page.w), float(page.h)
+        xn1, yn1, xn2, yn2 = x1/w, y1/h, x2/w, y2/h
+        if page.bEven:
+            xb1, xb2    = w - x2    , w - x1
+            xnb1, xnb2  = 1.0 - xn2 , 1.0 - xn1
+        else:
+            xb1, xb2    = x1    , x2
+            xnb1, xnb2  = xn1   , xn2
+        a[i, :] = [xb1, xb2     , x1, y2, x2-x1, y2-y1   , xnb1, xnb2   , xn1, yn2, xn2-xn1, yn2-yn1] 
+    return a
+
+def _1hot_reference(lNode):
+    a = np.zeros( ( len(lNode), 7+3+3 ) , dtype=np.float64)
+    for i, blk in enumerate(lNode): 
+        s = blk.text
+        if s.isalnum(): a[i, 0] = 1.0 
+        if s.isalpha(): a[i, 1] = 1.0 
+        if s.isdigit(): a[i, 2] = 1.0 
+        if s.islower(): a[i, 3] = 1.0
+        if s.istitle(): a[i, 4] = 1.0 
+        if s.isupper(): a[i, 5] = 1.0
+        if blk.pnum%2 == 0: a[i, 6] = 1.0
+        a[i, 6 +max(1 , min(3, blk.pnum))]      = 1.0
+        a[i, 12+max(-2, blk.pnum-blk.page.pagecnt)]  = 1.0
+    return a
+
+def _edge1hot_reference(tblEdge, sqnc):
+    a = np.zeros( ( len(tblEdge), 3 + 17*3 ) , dtype=np.float64)
+    for i, edge in enumerate(tblEdge):
+        z = {VerticalEdge:0, HorizontalEdge:17, CrossPageEdge:34}[edge.__class__]
+        a[i, z/17] = 1.0
+        A, B = edge.A, edge.B
+        sA, sB = A.text, B.text
+        if sA == sB: a[i, z + 3] = 1.0
+        if sqnc.isPossibleSequence(sA, sB):
+            fInSequence = 1.0
+        elif sqnc.isPossibleSequence(sB, sA): 
+            fInSequence = -1.0
+        else:
+            fInSequence = 0.0
+        if A.pnum == B.pnum:
+            a[i, z + 4] = fInSequence
+            a[i, z + 5] = abs(fInSequence)
+        else:
+            a[i, z + 6] = fInSequence
+            a[i, z + 7] = abs(fInSequence)
+        for j, s in enumerate([sA, sB]):
+            if s.isalnum(): a[i, z +  8 + 6*j] = 1.0
+            if s.isalpha(): a[i, z +  9 + 6*j] = 1.0
+            if s.isdigit(): a[i, z + 10 + 6*j] = 1.0
+            if s.islower(): a[i, z + 11 + 6*j] = 1.0
+            if s.istitle(): a[i, z + 12 + 6*j] = 1.0
+            if s.isupper(): a[i, z + 13 + 6*j] = 1.0  
+    return a
+
+def _edgeboolean_reference(tblEdge):
+    a = - np.ones( ( len(tblEdge), 3*6 ) , dtype=np.float64)
+    for i, edge in enumerate(tblEdge):
+        z = {VerticalEdge:0, HorizontalEdge:6, CrossPageEdge:12}[edge.__class__]
+        A, B = edge.A, edge.B
+        if A.x1 + A.x2 - (B.x1 + B.x2) <= 2 * fEPSILON: a[i, z + 0] = 1.0
+        if A.y1 + A.y2 - (B.y1 + B.y2) <= 2 * fEPSILON: a[i, z + 1] = 1.0
+        if abs(A.x1-B.x1) <= fEPSILON: a[i, z + 2] = 1.0
+        if abs(A.y1-B.y1) <= fEPSILON: a[i, z + 3] = 1.0
+        if abs(A.x2-B.x2) <= fEPSILON: a[i, z + 4] = 1.0
+        if abs(A.y2-B.y2) <= fEPSILON: a[i, z + 5] = 1.0
+    return a
+
+lNodeFeatureReference = [ (NodeTransformerTextLen, _textlen_reference)
+                        , (NodeTransformerXYWH   , _xywh_reference)
+                        , (Node1HotFeatures      , _1hot_reference) ]
+
+def makeRandomNodes(nNode, nPage, seed=0):
+    """
+    make a list of nodes, on several pages, with various texts
+    """
+    rnd = random.Random(seed)
+    lPage = [Page(pnum, nPage, rnd.randint(500, 3000), rnd.randint(500, 3000)) for pnum in range(1, nPage+1)]
+    lsText = ["", " ", "a", "A", "1", "12 34", "Abc Def", "abc", "ABC", "a1", "1a", "x.y", "2", " 3", "11", "ber", "\xc3\xa9t\xc3\xa9", "tab\there", "end "]
+    lNode = list()
+    for _i in range(nNode):
+        page = rnd.choice(lPage)
+        blk = Block(page.pnum, (rnd.randint(0, 2000), rnd.randint(0, 3000), rnd.randint(0, 300), rnd.randint(0, 100))
+                    , rnd.choice(lsText), 0, 0, None)
+        blk.page = page
+        lNode.append(blk)
+    return lNode
+
+def test_node_features_random():
+    for seed in range(5):
+        for nNode, nPage in [(0, 1), (1, 1), (20, 1), (200, 7)]:
+            lNode = makeRandomNodes(nNode, nPage, seed)
+            tbl = NodeTable(lNode)
+            for cTransformer, fun_reference in lNodeFeatureReference:
+                assert np.array_equal(cTransformer().transform(tbl), fun_reference(lNode)), cTransformer
+
+def test_node_features_document():
+    lGraph = MyGraph.loadGraphs([sFilename, sFilename], bDetach=True)
+    tbl = NodeTable.concat([g.getNodeTable() for g in lGraph])
+    for cTransformer, fun_reference in lNodeFeatureReference:
+        assert np.array_equal(cTransformer().transform(tbl), fun_reference(tbl.lNode)), cTransformer
+
+def _checkEdgeFeatures(tblEdge):
+    sqnc = PageNumberSimpleSequenciality()
+    assert np.array_equal(Edge1HotFeatures(sqnc).transform(tblEdge), _edge1hot_reference(tblEdge, sqnc))
+    assert np.array_equal(EdgeBooleanFeatures().transform(tblEdge), _edgeboolean_reference(tblEdge))
+
+def test_edge_features_random():
+    rnd = random.Random(0)
+    for seed in range(5):
+        for nNode, nPage, nEdge in [(0, 1, 0), (1, 1, 1), (20, 1, 50), (200, 7, 1000)]:
+            lNode = makeRandomNodes(nNode, nPage, seed)
+            aA = [rnd.randrange(nNode) for _i in range(nEdge)]
+            aB = [rnd.randrange(nNode) for _i in range(nEdge)]
+            aType = [rnd.choice([VerticalEdge, HorizontalEdge, CrossPageEdge]) for _i in range(nEdge)]
+            for lN in [lNode, NodeTable(lNode)]:
+                lEdge = [CrossPageEdge(lN[iA], lN[iB]) if cEdge is CrossPageEdge else cEdge(lN[iA], lN[iB], 1.0)
+                         for iA, iB, cEdge in zip(aA, aB, aType)]
+                _checkEdgeFeatures(EdgeTable.fromEdgeList(lN, lEdge))
+    #some edges in sequence
+    assert Edge1HotFeatures(PageNumberSimpleSequenciality()).transform(EdgeTable.fromEdgeList(lN, lEdge))[:, [4, 6, 21, 23, 38, 40]].any()
+
+def test_edge_features_document():
+    lGraph = MyGraph.loadGraphs([sFilename, sFilename], bDetach=True)
+    tblNode = NodeTable.concat([g.getNodeTable() for g in lGraph])
+    tblEdge = EdgeTable.concat([g.lEdge for g in lGraph], tblNode)
+    _checkEdgeFeatures(tblEdge)
+
+def test_lcs():
+    import util.lcs
+    util.lcs.test_lcs()
+    #all pairs of the edges of the document
+    [g] = MyGraph.loadGraphs([sFilename], bDetach=True)
+    lText = g.getNodeTable().getTextList()
+    aLcs = util.lcs.lcs_length_batch(lText, g.lEdge.A, g.lEdge.B)
+    assert aLcs.tolist() == [util.lcs.lcs_length_reference(lText[i], lText[j]) for i, j in zip(g.lEdge.A, g.lEdge.B)]
+
+def test_neighbors():
+    lGraph = MyGraph.loadGraphs([sFilename, sFilename], bDetach=True)
+    nt = NodeTransformerNeighbors()
+    for g in lGraph:
+        assert np.array_equal(nt.transform(g.getNodeTable()), _neighbors_reference(g))
+    #several graphs at once, as when fitting the transformers
+    a = nt.transform(NodeTable.concat([g.getNodeTable() for g in lGraph]))
+    assert np.array_equal(a, np.vstack([_neighbors_reference(g) for g in lGraph]))
+    assert a[:,3:6].sum() > 0
+
+def test_text_ngrams():
+    import crf.NgramVectorizer
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from crf.EdgeTable import EdgeTable
+    from crf.NgramVectorizer import NodeTextTfidfVectorizer
+    from crf.Transformer_PageXml import NodeTransformerTextEnclosed, EdgeTransformerSourceText, EdgeTransformerTargetText
+    crf.NgramVectorizer.test_NodeTextTfidfVectorizer()
+    lGraph = MyGraph.loadGraphs([sFilename, sFilename], bDetach=True)
+    tblNode = NodeTable.concat([g.getNodeTable() for g in lGraph])
+    tblEdge = EdgeTable.concat([g.lEdge for g in lGraph], tblNode)
+    lSelector = [ (NodeTransformerTextEnclosed(), tblNode, lGraph[0].getNodeTable())
+                  , (EdgeTransformerSourceText(1), tblEdge, lGraph[0].lEdge.withNodes(lGraph[0].getNodeTable()))
+                  , (EdgeTransformerTargetText(2), tblEdge, lGraph[0].lEdge.withNodes(lGraph[0].getNodeTable())) ]
+    for selector, tblFit, tbl in lSelector:
+        for kw in [dict(max_features=250, analyzer='char', ngram_range=(2,4)), dict(lowercase=False, analyzer='char', ngram_range=(1,3))]:
+            ref, vect = TfidfVectorizer(**kw), NodeTextTfidfVectorizer(**kw)
+            ref.fit(list(selector.transform(tblFit)))
+            vect.fit(selector.transform(tblFit))
+            assert ref.vocabulary_ == vect.vocabulary_
+            assert np.array_equal(ref.transform(list(selector.transform(tbl))).toarray(), vect.transform(selector.transform(tbl)).toarray())
+    #each node text was analysed once per analyser
+    assert len(tblNode.dNgramCounts) == 2
+
+
+if __name__ == "__main__":
+    test_node_features_random()
+    test_node_features_document()
+    test_edge_features_random()
+    test_edge_features_document()
+    test_lcs()
+    test_neighbors()
+    test_text_ngrams()
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+'''
+Testing that computing the features in parallel, per feature branch or per graph, gives the same features
+
+Created on 18 Oct 2026
+
+@author: meunier
+'''
+import shutil
+import tempfile
+
+import numpy as np
+
+from crf.FeatureDefinition_PageXml_std import FeatureDefinition_PageXml_StandardOnes
+from crf.Model_SSVM_AD3 import Model_SSVM_AD3
+from crf.tests import MyGraph, sFilename
+
+
+def test_parallel():
+    sModelDir = tempfile.mkdtemp()
+    try:
+        lGraph = MyGraph.loadGraphs([sFilename, sFilename, sFilename], bDetach=True)
+        lRef = None
+        for n_jobs, n_jobs_graph in [(1, 1), (3, 1), (1, 2), (2, 3)]:
+            fe = FeatureDefinition_PageXml_StandardOnes(500, (2,4), False, 250, (2,4), False, n_jobs=n_jobs)
+            fe.fitTranformers(lGraph)
+            fe.cleanTransformers()
+            mdl = Model_SSVM_AD3("test", sModelDir)
+            mdl.setTranformers(fe.getTransformers())
+            mdl.setTransformGraphsJobs(n_jobs_graph)
+            lX = mdl.transformGraphs(lGraph)
+            if lRef is None:
+                lRef = lX
+            else:
+                for X, XRef in zip(lX, lRef):
+                    for M, MRef in zip(X, XRef): assert np.array_equal(M, MRef)
+    finally:
+        shutil.rmtree(sModelDir, True)
+
+
+if __name__ == "__main__":
+    test_parallel()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+'''
+Testing the sparse node and edge features, and the sparse CRF adapter, against the dense ones
+
+Created on 18 Oct 2026
+
+@author: meunier
+'''
+import numpy as np
+import scipy.sparse as sp
+
+import crf.SparseEdgeFeatureGraphCRF
+from crf.FeatureDefinition_PageXml_std import FeatureDefinition_PageXml_StandardOnes
+from crf.tests import MyGraph, sFilename
+from crf.SparseEdgeFeatureGraphCRF import SparseEdgeFeatureGraphCRF
+
+
+
+dFeatureConfig = { 'n_tfidf_node':500, 't_ngrams_node':(2,4), 'b_tfidf_node_lc':False
+                 , 'n_tfidf_edge':250, 't_ngrams_edge':(2,4), 'b_tfidf_edge_lc':False }
+
+def _transformGraphs(lGraph, **kwargs):
+    fe = FeatureDefinition_PageXml_StandardOnes(**kwargs)
+    fe.fitTranformers(lGraph)
+    node_transformer, edge_transformer = fe.getTransformers()
+    return [g.buildNodeEdgeMatrices(node_transformer, edge_transformer) for g in lGraph]
+
+def test_sparse_adapter():
+    crf.SparseEdgeFeatureGraphCRF.test_SparseEdgeFeatureGraphCRF()
+
+def test_sparse_features():
+    lGraph = MyGraph.loadGraphs([sFilename], bDetach=True, bLabelled=True)
+    [(X, E, EF)]    = _transformGraphs(lGraph, **dFeatureConfig)
+    [(Xs, Es, EFs)] = _transformGraphs(lGraph, b_sparse=True, **dFeatureConfig)
+    assert not sp.issparse(X) and not sp.issparse(EF)
+    assert sp.issparse(Xs) and sp.issparse(EFs)
+    assert np.array_equal(X, Xs.toarray()) and np.array_equal(E, Es) and np.array_equal(EF, EFs.toarray())
+    
+    Y = lGraph[0].buildLabelMatrix()
+    model = SparseEdgeFeatureGraphCRF(inference_method='ad3')
+    model.initialize([(X, E, EF)], [Y])
+    w = np.random.RandomState(0).normal(size=model.size_joint_feature)
+    assert np.allclose(model.joint_feature((Xs, Es, EFs), Y), model.joint_feature((X, E, EF), Y))
+    assert np.array_equal(model.inference((Xs, Es, EFs), w), model.inference((X, E, EF), w))
+
+def test_dtype():
+    lGraph = MyGraph.loadGraphs([sFilename], bDetach=True, bLabelled=True)
+    [(X, E, EF)] = _transformGraphs(lGraph, **dFeatureConfig)
+    for bSparse in [False, True]:
+        [(X32, E32, EF32)] = _transformGraphs(lGraph, b_sparse=bSparse, dtype="float32", **dFeatureConfig)
+        assert X32.dtype == np.float32 and EF32.dtype == np.float32
+        if bSparse: X32, EF32 = X32.toarray(), EF32.toarray()
+        assert np.allclose(X, X32, atol=1e-5) and np.array_equal(E, E32) and np.allclose(EF, EF32, atol=1e-5)
+
+
+if __name__ == "__main__":
+    test_sparse_adapter()
+    test_sparse_features()
+    test_dtype()
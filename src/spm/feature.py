@@ -6,6 +6,7 @@
     READ project 
     
 """
+from util.lcs import lcs_length
 
 class sequenceOfFeatures(object):
     
@@ -306,24 +307,7 @@ class  featureObject(object):
     #--------- LCS code
     # Return the length of the longest common string of a and b.
     def lcs(self,a, b):
-    
-        na, nb = len(a), len(b)
-    
-        #switch a and b if b is shorter
-        if nb < na:
-            a, na, b, nb = b, nb, a, na
-    
-        curRow = [0]*(na+1)
-    
-        for i in range(nb):
-            prevRow, curRow = curRow, [0]*(na+1)
-            for j in range(na):
-                if b[i] == a[j]:
-                    curLcs = max(1+prevRow[j], prevRow[j+1], curRow[j])
-                else:
-                    curLcs = max(prevRow[j+1], curRow[j])
-                curRow[j+1] = curLcs
-        return curRow[na] 
+        return lcs_length(a, b)
 
     def __ne__(self,other):
         return not (self == other) 
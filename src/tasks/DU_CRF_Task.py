@@ -24,13 +24,16 @@
     under grant agreement No 674943.
     
 """
-import os, glob
+import os, glob, shutil
+import collections, multiprocessing, traceback
 from optparse import OptionParser
 
 from sklearn.linear_model import LogisticRegression
 from sklearn.grid_search import GridSearchCV
 
 from common.trace import traceln
+from util.pipeline import StagedPipeline
+from DU_Server import DU_Server
 
 import crf.Model
 from crf.Model_SSVM_AD3 import Model_SSVM_AD3
@@ -46,6 +49,7 @@ USAGE:
 - define your graph class
 - choose a model name and a folder where it will be stored
 - define the features and their configuration
+    ('n_jobs_graph' in the feature configuration is the number of processes computing the features of several graphs)
 - define the learner configuration
 - instantiate this class
 
@@ -82,6 +86,15 @@ See DU_StAZH_b.py
         self._mdl = None
         self._lBaselineModel = []
         self.bVerbose = True
+        self.sGraphCacheDir = None
+        self.sFeatureCacheDir = None
+        self.bStreaming = False
+        self.sFeatureProfileFile = None
+        self.iPredictJobs = 1
+        self.bPredictPipeline = False
+        self.nPredictFeatureThread, self.nPredictInferenceThread = 1, 1
+        self.sInferenceMethod = None
+        self.bLazyConstraints = False
         
         if cFeatureDefinition: self.cFeatureDefinition = cFeatureDefinition
         assert issubclass(self.cModelClass, crf.Model.Model), "Your model class must inherit from crf.Model.Model"
@@ -96,9 +109,70 @@ See DU_StAZH_b.py
         self.cFeatureDefinition = cFeatureDefinition
         assert issubclass(self.cFeatureDefinition, crf.FeatureDefinition.FeatureDefinition), "Your feature definition class must inherit from crf.FeatureDefinition.FeatureDefinition"
 
+    def setGraphCacheDir(self, sGraphCacheDir):
+        """
+        Folder where the graphs of the training and test files are cached, to avoid parsing the files again at next run
+        """
+        self.sGraphCacheDir = sGraphCacheDir
+
+    def setFeatureCacheDir(self, sFeatureCacheDir):
+        """
+        Folder where the features of the graphs are cached, per file and fitted feature extractors, to avoid computing
+        them again at next run (e.g. warm-start, re-test)
+        """
+        self.sFeatureCacheDir = sFeatureCacheDir
+        if self._mdl: self._mdl.setFeatureCacheDir(sFeatureCacheDir)
+
+    def setStreaming(self, bStreaming):
+        """
+        Parse the files page by page, and write the predicted labels page by page, so that the DOM of a whole 
+        document is never in memory. (For very long documents.)
+        Also fit the feature extractors graph by graph.
+        """
+        self.bStreaming = bStreaming
+        
+    def setFeatureProfileFile(self, sFeatureProfileFile):
+        """
+        Record the time and memory spent by each feature transformer, per graph, and save this profile as JSON in 
+        this file after training, testing or predicting
+        """
+        self.sFeatureProfileFile = sFeatureProfileFile
+        if self._mdl: self._mdl.setFeatureProfiling(bool(sFeatureProfileFile))
+        
+    def setInferenceMethod(self, sInferenceMethod):
+        """
+        Inference used to test and predict, e.g. "ad3" or a faster approximate one (see Model_SSVM_AD3.setInferenceMethod)
+        """
+        self.sInferenceMethod = sInferenceMethod
+        if self._mdl: self._mdl.setInferenceMethod(sInferenceMethod)
+        
+    def setLazyConstraints(self, bLazyConstraints):
+        """
+        Activate the logical constraints, if any, only on the pages that violate them when solving without constraints
+        (see Model_SSVM_AD3.setLazyConstraints)
+        """
+        self.bLazyConstraints = bLazyConstraints
+        if self._mdl: self._mdl.setLazyConstraints(bLazyConstraints)
+        
+    def setPredictJobs(self, iPredictJobs):
+        """
+        Number of processes predicting the files of the collection in parallel, each holding the loaded model.
+        (The feature extraction profile, if any, covers the files processed in this process only.)
+        """
+        self.iPredictJobs = max(1, iPredictJobs)
+        
+    def setPredictPipeline(self, bPipeline, nFeatureThread=1, nInferenceThread=1):
+        """
+        Predict the files of the collection with a pipeline of threads: a reader, nFeatureThread feature workers, 
+        nInferenceThread inference workers and a writer, so that reading, feature extraction, inference and writing 
+        of successive files overlap. (Unless predicting with several processes, see setPredictJobs.)
+        """
+        self.bPredictPipeline = bPipeline
+        self.nPredictFeatureThread, self.nPredictInferenceThread = max(1, nFeatureThread), max(1, nInferenceThread)
+        
     #---  COMMAND LINE PARSZER --------------------------------------------------------------------
     def getBasicTrnTstRunOptionParser(cls, sys_argv0=None, version=""):
-        usage = "%s <model-name> <model-directory> [--rm] [--trn <col-dir> [--warm]]+ [--tst <col-dir>]+ [--run <col-dir>]+"%sys_argv0
+        usage = "%s <model-name> <model-directory> [--rm] [--trn <col-dir> [--warm]]+ [--tst <col-dir>]+ [--run <col-dir>]+ [--serve <port>]"%sys_argv0
         description = """ 
         Train or test or remove the given model or predict using the given model.
         The data is given as a list of DS directories.
@@ -118,6 +192,24 @@ See DU_StAZH_b.py
                           , help="Attempt to warm-start the training")   
         parser.add_option("--rm", dest='rm',  action="store_true"
                           , help="Remove all model files")   
+        parser.add_option("--graphcache", dest='sGraphCacheDir',  action="store", type="string"
+                          , help="Cache the graphs of the training and test files in this folder, to skip their parsing at next run")   
+        parser.add_option("--featurecache", dest='sFeatureCacheDir',  action="store", type="string"
+                          , help="Cache the features of the graphs in this folder, to skip their computation at next run")   
+        parser.add_option("--stream", dest='bStreaming',  action="store_true"
+                          , help="Process the files page by page, and fit the feature extractors graph by graph, to bound the memory used by very long documents")   
+        parser.add_option("--profile-features", dest='sFeatureProfileFile',  action="store", type="string"
+                          , help="Record the time and memory spent by each feature transformer, and save this profile as JSON in this file")   
+        parser.add_option("--jobs", dest='iJobs',  action="store", type="int"
+                          , help="Predict the files of the collection with this number of parallel processes (with --serve: number of concurrent predictions)")   
+        parser.add_option("--pipeline", dest='bPipeline',  action="store_true"
+                          , help="Predict the files of the collection with a pipeline of threads: read, features, inference, write")   
+        parser.add_option("--serve", dest='iServePort',  action="store", type="int"
+                          , help="Load the model once and serve prediction requests on this port of the loopback interface (see DU_Client.py)")   
+        parser.add_option("--inference", dest='sInferenceMethod',  action="store", type="string"
+                          , help="Inference method to test or predict: ad3 (default, exact), or the faster approximate lbp, icm, lbp+icm")   
+        parser.add_option("--lazy-constraints", dest='bLazyConstraints',  action="store_true"
+                          , help="Solve without the logical constraints, then solve again with their constraints only the pages that violate them")   
         return usage, description, parser
     getBasicTrnTstRunOptionParser = classmethod(getBasicTrnTstRunOptionParser)
            
@@ -161,6 +253,11 @@ See DU_StAZH_b.py
             self.traceln("- loading a %s model"%self.cModelClass)
             self._mdl = self.cModelClass(self.sModelName, self.sModelDir)
             self._mdl.load()
+            self._mdl.setFeatureCacheDir(self.sFeatureCacheDir)
+            self._mdl.setTransformGraphsJobs(self.config_extractor_kwargs.get('n_jobs_graph', 1))
+            self._mdl.setFeatureProfiling(bool(self.sFeatureProfileFile))
+            if self.sInferenceMethod: self._mdl.setInferenceMethod(self.sInferenceMethod)
+            if self.bLazyConstraints: self._mdl.setLazyConstraints(True)
             self.traceln(" done")
         else:
             self.traceln("- %s model already loaded"%self.cModelClass)
@@ -180,6 +277,10 @@ See DU_StAZH_b.py
             if os.path.exists(s):
                 self.traceln("\t - rm %s"%s) 
                 os.unlink(s)
+        s = mdl.getBundleDirname()
+        if os.path.exists(s):
+            self.traceln("\t - rm -r %s"%s) 
+            shutil.rmtree(s)
         if os.path.exists(self.sModelDir) and not os.listdir(self.sModelDir):
             self.traceln("\t - rmdir %s"%self.sModelDir) 
             os.rmdir(self.sModelDir)
@@ -217,24 +318,41 @@ See DU_StAZH_b.py
             
         mdl.configureLearner(**self.config_learner_kwargs)
         mdl.setBaselineModelList(self._lBaselineModel)
+        mdl.setFeatureCacheDir(self.sFeatureCacheDir)
+        mdl.setTransformGraphsJobs(self.config_extractor_kwargs.get('n_jobs_graph', 1))
+        mdl.setFeatureProfiling(bool(self.sFeatureProfileFile))
         mdl.saveConfiguration( (self.config_extractor_kwargs, self.config_learner_kwargs) )
         self.traceln("\t - configuration: ", self.config_learner_kwargs )
 
-        self.traceln("- loading training graphs")
-        lGraph_trn = DU_GraphClass.loadGraphs(lFilename_trn, bDetach=True, bLabelled=True, iVerbose=1)
-        self.traceln(" %d graphs loaded"%len(lGraph_trn))
+        lGraph_trn = None
+        if not self.bStreaming:
+            self.traceln("- loading training graphs")
+            lGraph_trn = DU_GraphClass.loadGraphs(lFilename_trn, bDetach=True, bLabelled=True, iVerbose=1, sCacheDir=self.sGraphCacheDir)
+            self.traceln(" %d graphs loaded"%len(lGraph_trn))
 
         self.traceln("- retrieving or creating feature extractors...")
         try:
             mdl.loadTransformers(ts_trn)
         except crf.Model.ModelException:
-            fe = self.cFeatureDefinition(**self.config_extractor_kwargs)         
-            fe.fitTranformers(lGraph_trn)
+            #n_jobs_graph is for the model, the rest for the feature definition
+            fe = self.cFeatureDefinition(**{k:v for k,v in self.config_extractor_kwargs.items() if k != 'n_jobs_graph'})         
+            if self.bStreaming:
+                #graph by graph, loaded one at a time from disk
+                fe.fitTranformersStreaming(DU_GraphClass.iterGraphs(lFilename_trn, bDetach=True, bLabelled=True, iVerbose=1
+                                                                    , sCacheDir=self.sGraphCacheDir, bStreaming=True))
+            else:
+                fe.fitTranformers(lGraph_trn)
             fe.cleanTransformers()
             mdl.setTranformers(fe.getTransformers())
             mdl.saveTransformers()
         self.traceln(" done")
         
+        if lGraph_trn is None:
+            #the training needs all the graphs
+            self.traceln("- loading training graphs")
+            lGraph_trn = DU_GraphClass.loadGraphs(lFilename_trn, bDetach=True, bLabelled=True, iVerbose=1, sCacheDir=self.sGraphCacheDir, bStreaming=True)
+            self.traceln(" %d graphs loaded"%len(lGraph_trn))
+        
         self.traceln("- training model...")
         mdl.train(lGraph_trn, True, ts_trn)
         mdl.save()
@@ -244,13 +362,14 @@ See DU_StAZH_b.py
         
         if lFilename_tst:
             self.traceln("- loading test graphs")
-            lGraph_tst = DU_GraphClass.loadGraphs(lFilename_tst, bDetach=True, bLabelled=True, iVerbose=1)
+            lGraph_tst = DU_GraphClass.loadGraphs(lFilename_tst, bDetach=True, bLabelled=True, iVerbose=1, sCacheDir=self.sGraphCacheDir, bStreaming=self.bStreaming)
             self.traceln(" %d graphs loaded"%len(lGraph_tst))
     
             oReport = mdl.test(lGraph_tst)
         else:
             oReport = None, None
             
+        self._saveFeatureProfile()
         return oReport
 
     def test(self, lsTstColDir):
@@ -275,10 +394,11 @@ See DU_StAZH_b.py
             for dat in lPageConstraint: self.traceln("\t\t%s"%str(dat))
             
         self.traceln("- loading test graphs")
-        lGraph_tst = DU_GraphClass.loadGraphs(lFilename_tst, bDetach=True, bLabelled=True, iVerbose=1)
+        lGraph_tst = DU_GraphClass.loadGraphs(lFilename_tst, bDetach=True, bLabelled=True, iVerbose=1, sCacheDir=self.sGraphCacheDir, bStreaming=self.bStreaming)
         self.traceln(" %d graphs loaded"%len(lGraph_tst))
 
         oReport = self._mdl.test(lGraph_tst)
+        self._saveFeatureProfile()
         return oReport
 
     def predict(self, lsColDir):
@@ -301,31 +421,177 @@ See DU_StAZH_b.py
         if lPageConstraint: 
             for dat in lPageConstraint: self.traceln("\t\t%s"%str(dat))
         
-        self.traceln("- loading collection as graphs, and processing each in turn. (%d files)"%len(lFilename))
         du_postfix = "_du"+MultiPageXml.sEXT
-        lsOutputFilename = []
-        for sFilename in lFilename:
-            if sFilename.endswith(du_postfix): continue #:)
-            [g] = DU_GraphClass.loadGraphs([sFilename], bDetach=False, bLabelled=False, iVerbose=1)
-            
-            if lPageConstraint:
-                self.traceln("\t- prediction with logical constraints: %s"%sFilename)
-            else:
-                self.traceln("\t- prediction : %s"%sFilename)
-            Y = self._mdl.predict(g)
-                
+        lFilename = [sFilename for sFilename in lFilename if not sFilename.endswith(du_postfix)] #:)
+        if self.iPredictJobs > 1 and len(lFilename) > 1:
+            self.traceln("- loading collection as graphs, and processing them with %d processes. (%d files)"%(self.iPredictJobs, len(lFilename)))
+            lsOutputFilename = self._predictParallel(lFilename, lPageConstraint)
+        elif self.bPredictPipeline:
+            self.traceln("- loading collection as graphs, and processing them in a pipeline. (%d files)"%len(lFilename))
+            lsOutputFilename = self._predictPipeline(lFilename, lPageConstraint)
+        else:
+            self.traceln("- loading collection as graphs, and processing each in turn. (%d files)"%len(lFilename))
+            lsOutputFilename = [self._predictFile(sFilename, lPageConstraint) for sFilename in lFilename]
+        self.traceln(" done")
+        self._saveFeatureProfile()
+
+        return lsOutputFilename
+
+    def predictFile(self, sFilename):
+        """
+        predict the labels of the nodes of this file, and write them in its _du file
+        return the _du filename
+        """
+        if not self._mdl: raise Exception("The model must be loaded beforehand!")
+        return self._predictFile(sFilename, self.cGraphClass.getPageConstraint())
+    
+    def predictXml(self, sXml):
+        """
+        predict the labels of the nodes of a MultiPageXml document given as a string
+        return the labelled document, as a string
+        """
+        if not self._mdl: raise Exception("The model must be loaded beforehand!")
+        g = self.cGraphClass.loadGraphFromMemory(sXml, iVerbose=1)
+        Y = self._predictInfer("<memory>", self.cGraphClass.getPageConstraint(), g, self._predictTransform(g))
+        doc = g.setDomLabels(Y)
+        MultiPageXml.setMetadata(doc, None, self.sMetadata_Creator, self.sMetadata_Comments)
+        try:
+            return doc.serialize("utf-8", 1)    #1 to indent the XML
+        finally:
+            doc.freeDoc()
+    
+    def serve(self, iPort, nWorker=4):
+        """
+        Load the model, and serve prediction requests on this port of the loopback interface, until interrupted.
+        At most nWorker predictions run at a time. (See DU_Server, and DU_Client.py for the command line client.)
+        """
+        self.load()
+        server = DU_Server(self, iPort, nWorker=nWorker)
+        self.traceln("- serving predictions on http://127.0.0.1:%d/  (%d workers)"%(iPort, nWorker))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        self.traceln(" done")
+        
+    def _predictFile(self, sFilename, lPageConstraint):
+        """
+        predict the labels of the nodes of this file, and write them in its _du file
+        return the _du filename
+        """
+        g = self._predictLoad(sFilename)
+        X = self._predictTransform(g)
+        Y = self._predictInfer(sFilename, lPageConstraint, g, X)
+        del X
+        return self._predictWrite(sFilename, g, Y)
+    
+    #the 4 stages of the prediction of a file
+    def _predictLoad(self, sFilename):
+        [g] = self.cGraphClass.loadGraphs([sFilename], bDetach=self.bStreaming, bLabelled=False, iVerbose=1, bStreaming=self.bStreaming)
+        return g
+    
+    def _predictTransform(self, g):
+        [X] = self._mdl.transformGraphs([g])
+        return X
+    
+    def _predictInfer(self, sFilename, lPageConstraint, g, X):
+        if lPageConstraint:
+            self.traceln("\t- prediction with logical constraints: %s"%sFilename)
+        else:
+            self.traceln("\t- prediction : %s"%sFilename)
+        return self._mdl.predictFromFeatures(g, X)
+        
+    def _predictWrite(self, sFilename, g, Y):
+        sDUFilename = sFilename[:-len(MultiPageXml.sEXT)]+"_du"+MultiPageXml.sEXT
+        if self.bStreaming:
+            g.setDomLabelsStreaming(Y, sFilename, sDUFilename, self.sMetadata_Creator, self.sMetadata_Comments)
+        else:
             doc = g.setDomLabels(Y)
             MultiPageXml.setMetadata(doc, None, self.sMetadata_Creator, self.sMetadata_Comments)
-            sDUFilename = sFilename[:-len(MultiPageXml.sEXT)]+du_postfix
             doc.saveFormatFileEnc(sDUFilename, "utf-8", True)  #True to indent the XML
             doc.freeDoc()
-            del Y, g
-            self.traceln("\t done")
-            lsOutputFilename.append(sDUFilename)
-        self.traceln(" done")
-
+        del Y, g
+        self.traceln("\t done")
+        return sDUFilename
+    
+    def _predictPipeline(self, lFilename, lPageConstraint):
+        """
+        predict the files with a pipeline of threads: a reader, feature workers, inference workers and a writer, 
+        connected by bounded queues, so that reading the next file and writing the previous one overlap with the 
+        inference on the current one.
+        An error on a file is traced and the file is skipped, the other files are processed.
+        return the list of _du filenames, in the order of the files
+        """
+        pl = StagedPipeline(iQueueSize=2)
+        pl.addStage("read"      , lambda sFilename: (sFilename, self._predictLoad(sFilename)))
+        pl.addStage("features"  , lambda (sFilename, g): (sFilename, g, self._predictTransform(g)), self.nPredictFeatureThread)
+        pl.addStage("inference" , lambda (sFilename, g, X): (sFilename, g, self._predictInfer(sFilename, lPageConstraint, g, X))
+                    , self.nPredictInferenceThread)
+        pl.addStage("write"     , lambda (sFilename, g, Y): self._predictWrite(sFilename, g, Y))
+        lsOutputFilename, lsErrorFilename = list(), list()
+        for sFilename, sDUFilename, sError in pl.run(lFilename):
+            if sError:
+                self.traceln("\t- ERROR on %s\n%s"%(sFilename, sError))
+                lsErrorFilename.append(sFilename)
+            else:
+                lsOutputFilename.append(sDUFilename)
+        if lsErrorFilename: 
+            self.traceln("\t- %d file(s) in error: %s"%(len(lsErrorFilename), lsErrorFilename))
+        self.traceln("\t- pipeline:")
+        for sLine in pl.formatReport(): self.traceln("\t\t%s"%sLine)
+        return lsOutputFilename
+    
+    def _predictParallel(self, lFilename, lPageConstraint):
+        """
+        predict the files with a pool of processes
+        
+        The workers are forked, so they inherit this task and its loaded model. 
+        At most 2 files per process are in flight, and the results are collected in the order of the files. 
+        An error on a file is traced and the file is skipped, the other files are processed.
+        return the list of _du filenames, in the order of the files
+        """
+        global _predict_worker_data
+        _predict_worker_data = (self, lPageConstraint)
+        iMaxInFlight = 2 * self.iPredictJobs
+        lsOutputFilename, lsErrorFilename = list(), list()
+        def collect(res):
+            sFilename, sDUFilename, sError = res.get()
+            if sError:
+                self.traceln("\t- ERROR on %s\n%s"%(sFilename, sError))
+                lsErrorFilename.append(sFilename)
+            else:
+                lsOutputFilename.append(sDUFilename)
+        
+        pool = multiprocessing.Pool(min(self.iPredictJobs, len(lFilename)))
+        try:
+            qPending = collections.deque()
+            for sFilename in lFilename:
+                qPending.append(pool.apply_async(_predict_worker, (sFilename,)))
+                if len(qPending) >= iMaxInFlight: collect(qPending.popleft())
+            while qPending: collect(qPending.popleft())
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+            _predict_worker_data = None
+        if lsErrorFilename: 
+            self.traceln("\t- %d file(s) in error: %s"%(len(lsErrorFilename), lsErrorFilename))
         return lsOutputFilename
 
+    def _saveFeatureProfile(self):
+        """
+        trace and save the profile of the feature extraction, if any
+        """
+        prf = self._mdl.getFeatureProfile() if self._mdl else None
+        if self.sFeatureProfileFile and prf:
+            prf.traceReport()
+            prf.saveReport(self.sFeatureProfileFile)
+            self.traceln("\t- feature extraction profile saved in %s"%self.sFeatureProfileFile)
+
     #----------------------------------------------------------------------------------------------------------    
     def listMaxTimestampFile(cls, lsDir, sPattern):
         """
@@ -341,3 +607,18 @@ See DU_StAZH_b.py
         return ts, lFn
     listMaxTimestampFile = classmethod(listMaxTimestampFile)
     
+
+
+# --- Multiprocessing worker ------------------------------------------------------
+_predict_worker_data = None     #set by the parent process before forking the workers
+
+def _predict_worker(sFilename):
+    """
+    predict a file in a worker process
+    return (filename, _du filename, None) or (filename, None, error message)
+    """
+    doer, lPageConstraint = _predict_worker_data
+    try:
+        return sFilename, doer._predictFile(sFilename, lPageConstraint), None
+    except Exception:
+        return sFilename, None, traceback.format_exc()
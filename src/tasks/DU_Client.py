@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Client of the DU server: predict collections or documents with a model already loaded by a DU task in --serve mode
+    
+    Copyright Xerox(C) 2016 JL. Meunier
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+    
+    
+    Developed  for the EU project READ. The READ project has received funding 
+    from the European Union�s Horizon 2020 research and innovation programme 
+    under grant agreement No 674943.
+    
+"""
+import sys, os
+import glob
+import json
+import urllib2
+from optparse import OptionParser
+
+try: #to ease the use without proper Python installation
+    import TranskribusDU_version
+except ImportError:
+    sys.path.append( os.path.dirname(os.path.dirname( os.path.abspath(sys.argv[0]) )) )
+    import TranskribusDU_version
+
+from common.trace import traceln
+from tasks import _checkFindColDir, _exit
+
+#as in DU_CRF_Task, without importing it (and sklearn, pystruct...)
+sEXT        = ".mpxml"
+sDU_POSTFIX = "_du" + sEXT
+
+
+class DU_Client:
+    """
+    Sends prediction requests to a DU server (see DU_Server) on the loopback interface
+    """
+    def __init__(self, iPort, sHost="127.0.0.1"):
+        self.sURL = "http://%s:%d"%(sHost, iPort)
+
+    def _request(self, sPath, sBody=None, sContentType="application/json"):
+        req = urllib2.Request(self.sURL + sPath, sBody, {"Content-Type":sContentType} if sBody is not None else {})
+        fd = urllib2.urlopen(req)
+        try:
+            return fd.read()
+        finally:
+            fd.close()
+        
+    def predictFiles(self, lsFilename):
+        """
+        the server predicts these files, and writes their _du file
+        return the list of results: {"file":, "output":, "error":, "time":}
+        """
+        sBody = json.dumps({"files":[os.path.abspath(s) for s in lsFilename]})
+        return json.loads(self._request("/predict", sBody))["results"]
+
+    def predictXml(self, sXml):
+        """
+        return the document with its predicted labels, as a string
+        """
+        return self._request("/predict-xml", sXml, "application/xml")
+
+    def getMetrics(self):
+        return json.loads(self._request("/metrics"))
+
+    def listCollectionFiles(cls, lsColDir):
+        """
+        list the files to predict in these collection folders, as in the --run mode of the DU tasks
+        """
+        lsFilename = list()
+        for sDir in lsColDir:
+            lsFilename.extend(sorted(glob.iglob(os.path.join(sDir, "*[0-9]"+sEXT))))
+        return [s for s in lsFilename if not s.endswith(sDU_POSTFIX)]
+    listCollectionFiles = classmethod(listCollectionFiles)
+
+
+if __name__ == "__main__":
+    usage = "%s <port> [--run <col-dir>]+ [--xml <file> [--out <file>]] [--metrics]"%sys.argv[0]
+    parser = OptionParser(usage=usage)
+    parser.add_option("--run", dest='lRun',  action="append", type="string"
+                      , help="Predict the given non-annotated collection(s), writing the _du files")    
+    parser.add_option("--xml", dest='sXmlFile',  action="store", type="string"
+                      , help="Send this document to the server, and write the labelled document to stdout (or --out)")    
+    parser.add_option("--out", dest='sOutFile',  action="store", type="string"
+                      , help="File where to write the labelled document of --xml")    
+    parser.add_option("--metrics", dest='bMetrics',  action="store_true"
+                      , help="Print the metrics of the server")    
+    (options, args) = parser.parse_args()
+    try:
+        [sPort] = args
+        iPort = int(sPort)
+    except Exception as e:
+        _exit(usage, 1, e)
+    
+    client = DU_Client(iPort)
+    iStatus = 0
+    if options.lRun:
+        lsFilename = DU_Client.listCollectionFiles(_checkFindColDir(options.lRun))
+        traceln("- predicting %d files"%len(lsFilename))
+        lResult = client.predictFiles(lsFilename)
+        for d in lResult:
+            if d["error"]:
+                traceln("\t- ERROR on %s\n%s"%(d["file"], d["error"]))
+                iStatus = 2
+            else:
+                traceln("\t%s  (%.2fs)"%(d["output"].encode("utf-8"), d["time"]))
+        traceln("Done, see in:\n  %s"%[d["output"].encode("utf-8") for d in lResult if d["output"]])
+    if options.sXmlFile:
+        with open(options.sXmlFile, "rb") as fd: sXml = fd.read()
+        sXml = client.predictXml(sXml)
+        if options.sOutFile:
+            with open(options.sOutFile, "wb") as fd: fd.write(sXml)
+        else:
+            sys.stdout.write(sXml)
+    if options.bMetrics:
+        print json.dumps(client.getMetrics(), indent=2)
+    sys.exit(iStatus)
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Server of DU predictions: a loaded DU task answering prediction requests over loopback HTTP
+    
+    Copyright Xerox(C) 2016 JL. Meunier
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+    
+    
+    Developed  for the EU project READ. The READ project has received funding 
+    from the European Union�s Horizon 2020 research and innovation programme 
+    under grant agreement No 674943.
+    
+"""
+import collections
+import json
+import threading
+import time
+import traceback
+import urlparse
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+
+from common.trace import traceln
+
+
+lLOOPBACK = ["127.0.0.1", "localhost", "::1"]
+
+
+class DU_ServerMetrics:
+    """
+    Per endpoint: number of requests and errors, and latency statistics over the last iWINDOW requests
+    """
+    iWINDOW = 1000
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tStart = time.time()
+        self.nInFlight = 0
+        self.dEndpoint = collections.OrderedDict()    #endpoint --> [nRequest, nError, deque of latencies]
+
+    def start(self):
+        with self._lock: self.nInFlight += 1
+        
+    def record(self, sEndpoint, fLatency, bError=False):
+        with self._lock:
+            self.nInFlight -= 1
+            try:
+                lDat = self.dEndpoint[sEndpoint]
+            except KeyError:
+                lDat = [0, 0, collections.deque(maxlen=self.iWINDOW)]
+                self.dEndpoint[sEndpoint] = lDat
+            lDat[0] += 1
+            if bError: lDat[1] += 1
+            lDat[2].append(fLatency)
+
+    def getReport(self):
+        """
+        return the metrics as a JSON-serializable dictionary (latencies in seconds)
+        """
+        with self._lock:
+            dReport = { "uptime"    : time.time() - self.tStart
+                      , "in_flight" : self.nInFlight
+                      , "endpoints" : dict() }
+            for sEndpoint, (nRequest, nError, qLatency) in self.dEndpoint.items():
+                lLatency = sorted(qLatency)
+                n = len(lLatency)
+                dReport["endpoints"][sEndpoint] = { "requests" : nRequest
+                                                  , "errors"   : nError
+                                                  , "latency"  : { "mean": sum(lLatency) / n
+                                                                 , "p50" : lLatency[int(0.50 * (n-1))]
+                                                                 , "p95" : lLatency[int(0.95 * (n-1))]
+                                                                 , "max" : lLatency[-1] } }
+        return dReport
+
+
+class DU_RequestHandler(BaseHTTPRequestHandler):
+    """
+    GET  /metrics       the metrics of the server, as JSON
+    POST /predict       a JSON body {"files": [<path>, ...]}: predict each file and write its _du file 
+                        return a JSON body {"results": [{"file":, "output":, "error":, "time":}, ...]}
+    POST /predict-xml   a MultiPageXml document as body: return the document with the predicted labels
+    """
+    def do_GET(self):
+        sPath = urlparse.urlparse(self.path).path
+        if sPath == "/metrics":
+            self._reply(200, json.dumps(self.server.metrics.getReport(), indent=2), "application/json")
+        else:
+            self._reply(404, "Unknown path: %s\n"%sPath, "text/plain")
+
+    def do_POST(self):
+        sPath = urlparse.urlparse(self.path).path
+        if sPath not in ["/predict", "/predict-xml"]:
+            return self._reply(404, "Unknown path: %s\n"%sPath, "text/plain")
+        sBody = self.rfile.read(int(self.headers.getheader("Content-Length", 0)))
+        metrics = self.server.metrics
+        metrics.start()
+        t0, bError = time.time(), False
+        try:
+            with self.server.semaphore:     #at most nWorker predictions at a time
+                if sPath == "/predict":
+                    lResult = [self._predictFile(sFilename) for sFilename in json.loads(sBody)["files"]]
+                    bError = any(d["error"] for d in lResult)
+                    self._reply(200, json.dumps({"results":lResult}, indent=2), "application/json")
+                else:
+                    self._reply(200, self.server.doer.predictXml(sBody), "application/xml")
+        except Exception:
+            bError = True
+            self._reply(500, traceback.format_exc(), "text/plain")
+        finally:
+            metrics.record(sPath, time.time() - t0, bError)
+
+    def _predictFile(self, sFilename):
+        if isinstance(sFilename, unicode): sFilename = sFilename.encode("utf-8")   #JSON strings are unicode
+        t0 = time.time()
+        try:
+            sDUFilename, sError = self.server.doer.predictFile(sFilename), None
+        except Exception:
+            sDUFilename, sError = None, traceback.format_exc()
+            traceln("\t- ERROR on %s\n%s"%(sFilename, sError))
+        return {"file":sFilename, "output":sDUFilename, "error":sError, "time":time.time() - t0}
+    
+    def _reply(self, iCode, sBody, sContentType):
+        self.send_response(iCode)
+        self.send_header("Content-Type", sContentType)
+        self.send_header("Content-Length", str(len(sBody)))
+        self.end_headers()
+        self.wfile.write(sBody)
+
+    def log_message(self, format, *args):
+        traceln("\t- %s"%(format%args))
+
+
+class DU_Server(ThreadingMixIn, HTTPServer):
+    """
+    An HTTP server, on the loopback interface only, predicting with a loaded DU task.
+    
+    Each request is served by its own thread, and at most nWorker requests are predicting at a time.
+    """
+    daemon_threads = True
+    
+    def __init__(self, doer, iPort, sHost="127.0.0.1", nWorker=4):
+        if sHost not in lLOOPBACK: raise ValueError("The DU server listens on the loopback interface only, not on: %s"%sHost)
+        HTTPServer.__init__(self, (sHost, iPort), DU_RequestHandler)
+        self.doer = doer
+        self.semaphore = threading.BoundedSemaphore(max(1, nWorker))
+        self.metrics = DU_ServerMetrics()
+
+
+# --- AUTO-TESTS ------------------------------------------------------------------
+def test_DU_ServerMetrics():
+    m = DU_ServerMetrics()
+    for i in range(10):
+        m.start()
+        m.record("/predict", float(i), i == 3)
+    m.start()
+    d = m.getReport()
+    assert d["in_flight"] == 1
+    assert d["endpoints"]["/predict"]["requests"] == 10 and d["endpoints"]["/predict"]["errors"] == 1
+    assert d["endpoints"]["/predict"]["latency"] == {"mean":4.5, "p50":4.0, "p95":8.0, "max":9.0}
+    json.dumps(d)
@@ -113,6 +113,18 @@ if __name__ == "__main__":
         doer.rm()
         sys.exit(0)
     
+    if options.sGraphCacheDir: doer.setGraphCacheDir(options.sGraphCacheDir)
+    if options.sFeatureCacheDir: doer.setFeatureCacheDir(options.sFeatureCacheDir)
+    if options.bStreaming: doer.setStreaming(True)
+    if options.sFeatureProfileFile: doer.setFeatureProfileFile(options.sFeatureProfileFile)
+    if options.iJobs: doer.setPredictJobs(options.iJobs)
+    if options.bPipeline: doer.setPredictPipeline(True)
+    if options.sInferenceMethod: doer.setInferenceMethod(options.sInferenceMethod)
+    if options.bLazyConstraints: doer.setLazyConstraints(True)
+    if options.iServePort:
+        doer.serve(options.iServePort, options.iJobs or 4)
+        sys.exit(0)
+    
     traceln("- classes: ", DU_GRAPH.getLabelNameList())
     
     
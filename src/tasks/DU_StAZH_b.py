@@ -88,6 +88,8 @@ class DU_StAZH_b(DU_CRF_Task):
                                   , 'n_tfidf_edge'    : 250
                                   , 't_ngrams_edge'   : (2,4)
                                   , 'b_tfidf_edge_lc' : False    
+                                  , 'n_jobs'          : 1        #threads computing the feature branches
+                                  , 'n_jobs_graph'    : 1        #processes computing the features of several graphs
                               }
                              , dLearnerConfig = {
                                    'C'                : .1 
@@ -125,6 +127,18 @@ if __name__ == "__main__":
         doer.rm()
         sys.exit(0)
     
+    if options.sGraphCacheDir: doer.setGraphCacheDir(options.sGraphCacheDir)
+    if options.sFeatureCacheDir: doer.setFeatureCacheDir(options.sFeatureCacheDir)
+    if options.bStreaming: doer.setStreaming(True)
+    if options.sFeatureProfileFile: doer.setFeatureProfileFile(options.sFeatureProfileFile)
+    if options.iJobs: doer.setPredictJobs(options.iJobs)
+    if options.bPipeline: doer.setPredictPipeline(True)
+    if options.sInferenceMethod: doer.setInferenceMethod(options.sInferenceMethod)
+    if options.bLazyConstraints: doer.setLazyConstraints(True)
+    if options.iServePort:
+        doer.serve(options.iServePort, options.iJobs or 4)
+        sys.exit(0)
+    
     traceln("- classes: ", DU_GRAPH.getLabelNameList())
     
     
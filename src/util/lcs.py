@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Length of the longest common subsequence of two strings, with a bit-parallel algorithm and a bounded memo cache
+    
+
+    Copyright Xerox(C) 2016 H. Déjean, JL. Meunier
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+    
+    
+    Developed  for the EU project READ. The READ project has received funding 
+    from the European Union's Horizon 2020 research and innovation programme 
+    under grant agreement No 674943.
+    
+"""
+import collections
+import threading
+
+import numpy as np
+
+
+def lcs_length_bitparallel(a, b):
+    """
+    Length of the longest common subsequence of the strings (or sequences) a and b
+    
+    Bit-parallel algorithm of Allison-Dix / Hyyrö: the DP row is a bit vector over the characters of the 
+    longest string (a Python long), updated with a few integer operations per character of the shortest string.
+    """
+    if len(b) > len(a): a, b = b, a
+    na = len(a)
+    if na == 0 or not b: return 0
+    
+    #bit mask of the positions of each char in a
+    dMask = dict()
+    for i, c in enumerate(a): dMask[c] = dMask.get(c, 0) | (1 << i)
+    
+    iFull = (1 << na) - 1
+    V = iFull
+    for c in b:
+        U = V & dMask.get(c, 0)
+        if U: V = ((V + U) | (V - U)) & iFull
+    return na - bin(V).count("1")   #the number of zero bits
+
+
+def lcs_length_reference(a, b):
+    """
+    Length of the longest common subsequence of a and b, by dynamic programming (reference implementation)
+    """
+    na, nb = len(a), len(b)
+    if nb < na: a, na, b, nb = b, nb, a, na
+    curRow = [0]*(na+1)
+    for i in range(nb):
+        prevRow, curRow = curRow, [0]*(na+1)
+        for j in range(na):
+            if b[i] == a[j]:
+                curLcs = max(1+prevRow[j], prevRow[j+1], curRow[j])
+            else:
+                curLcs = max(prevRow[j+1], curRow[j])
+            curRow[j+1] = curLcs
+    return curRow[na] 
+
+
+class LCSCache:
+    """
+    LCS lengths, memorized in a bounded LRU cache keyed by the (unordered) pair of strings.
+    
+    Documents repeat many strings (headers, page numbers, catch-words...), so many pairs are compared again and again.
+    """
+    iDEFAULT_MAX_SIZE = 100000
+    
+    def __init__(self, iMaxSize=None):
+        self.iMaxSize = iMaxSize or self.iDEFAULT_MAX_SIZE
+        self._dCache = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.nHit, self.nMiss = 0, 0
+    
+    def __len__(self):
+        return len(self._dCache)
+    
+    def clear(self):
+        with self._lock:
+            self._dCache.clear()
+            self.nHit, self.nMiss = 0, 0
+    
+    def lcs_length(self, a, b):
+        """
+        return the length of the longest common subsequence of a and b
+        """
+        k = (a, b) if a <= b else (b, a)
+        with self._lock:
+            try:
+                n = self._dCache.pop(k)
+                self._dCache[k] = n     #most recently used
+                self.nHit += 1
+                return n
+            except KeyError:
+                self.nMiss += 1
+        n = lcs_length_bitparallel(a, b)
+        with self._lock:
+            self._dCache[k] = n
+            if len(self._dCache) > self.iMaxSize: self._dCache.popitem(last=False)
+        return n
+    
+    def lcs_length_batch(self, lText, aA, aB):
+        """
+        lText is a list of strings, aA and aB are arrays of indices in this list
+        return the array of the LCS lengths of the pairs (lText[aA[i]], lText[aB[i]])
+            (each distinct pair of indices is computed once)
+        """
+        aA, aB = np.asarray(aA, dtype=np.int64), np.asarray(aB, dtype=np.int64)
+        if len(aA) == 0: return np.zeros(0, dtype=np.int64)
+        aPair = np.minimum(aA, aB) * len(lText) + np.maximum(aA, aB)
+        aUniquePair, aInverse = np.unique(aPair, return_inverse=True)
+        aLength = np.array([self.lcs_length(lText[i], lText[j]) for i, j in zip(*divmod(aUniquePair, len(lText)))]
+                           , dtype=np.int64)
+        return aLength[aInverse]
+
+
+#the shared cache
+_cache = LCSCache()
+
+def lcs_length(a, b):
+    """
+    return the length of the longest common subsequence of a and b, using the shared cache
+    """
+    return _cache.lcs_length(a, b)
+
+def lcs_length_batch(lText, aA, aB):
+    """
+    return the array of the LCS lengths of the pairs (lText[aA[i]], lText[aB[i]]), using the shared cache
+    """
+    return _cache.lcs_length_batch(lText, aA, aB)
+
+def getSharedCache():
+    return _cache
+
+
+# --- AUTO-TESTS ------------------------------------------------------------------
+def test_lcs():
+    import random
+    rnd = random.Random(0)
+    lText = ["", "a", "ab", "ba", "abc", "page 12", "Page 13", "catch-word", "\xc3\xa9t\xc3\xa9", u"\xe9t\xe9"]
+    lText += ["".join(rnd.choice("abcd ") for _i in range(rnd.randint(0, 150))) for _j in range(30)]
+    for a in lText:
+        for b in lText:
+            if type(a) != type(b): continue
+            assert lcs_length_bitparallel(a, b) == lcs_length_reference(a, b), (a, b)
+    
+    cache = LCSCache(5)
+    aA = [i % len(lText) for i in range(200)]
+    aB = [(7*i+3) % len(lText) for i in range(200)]
+    aB = [j if type(lText[j]) == type(lText[i]) else i for i, j in zip(aA, aB)]
+    assert cache.lcs_length_batch(lText, aA, aB).tolist() == [lcs_length_reference(lText[i], lText[j]) for i, j in zip(aA, aB)]
+    assert len(cache) == 5
+    assert cache.lcs_length("abc", "cab") == cache.lcs_length("cab", "abc") == 2
+    assert cache.nHit >= 1
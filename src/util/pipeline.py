@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+"""
+    A pipeline of stages run by threads and connected by bounded queues
+    
+
+    Copyright Xerox(C) 2016 JL. Meunier
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+    
+    
+    Developed  for the EU project READ. The READ project has received funding 
+    from the European Union's Horizon 2020 research and innovation programme 
+    under grant agreement No 674943.
+    
+"""
+import Queue
+import threading
+import time
+import traceback
+
+
+class _Stage:
+    """
+    a stage of the pipeline, and its counters
+    """
+    def __init__(self, sName, fun, nThread):
+        self.sName, self.fun, self.nThread = sName, fun, nThread
+        self.lock = threading.Lock()
+        self.nRunning = 0
+        self.nItem, self.nError = 0, 0
+        self.fBusy, self.fWait = 0.0, 0.0
+
+
+class StagedPipeline:
+    """
+    Items go through a sequence of stages. Each stage is a function applied to the output of the previous stage, 
+    run by one or several threads. Consecutive stages are connected by bounded queues, so that only a few items are 
+    in flight and the stages overlap, e.g. the next item is read while the current one is processed and the previous 
+    one is written.
+    
+    An exception on an item is caught: the item skips the remaining stages and is reported with the error.
+    For each stage, the processed items, the errors, the busy time and the time waiting for input are counted.
+    
+    NOTE: the threads share the GIL, so the stages overlap only when their code releases it (I/O, numpy, some 
+    C extensions).
+    """
+    _END = None     #end of the input of a stage thread
+    
+    def __init__(self, iQueueSize=2):
+        self.iQueueSize = iQueueSize
+        self.lStage = list()
+        self.fTime = 0.0
+        
+    def addStage(self, sName, fun, nThread=1):
+        """
+        add a stage, applying fun to each item, with nThread threads
+        return self
+        """
+        self.lStage.append(_Stage(sName, fun, max(1, nThread)))
+        return self
+    
+    def run(self, lItem):
+        """
+        process the items through the stages
+        return the list of (item, result, error) in the order of the items, result or error being None
+        """
+        t0 = time.time()
+        lQueue = [Queue.Queue(self.iQueueSize) for _stage in self.lStage] + [Queue.Queue()]
+        lThread = list()
+        for iStage, stage in enumerate(self.lStage):
+            nThreadNext = self.lStage[iStage+1].nThread if iStage+1 < len(self.lStage) else 1
+            stage.nRunning = stage.nThread
+            for _i in range(stage.nThread):
+                thread = threading.Thread(target=self._runStage, args=(stage, lQueue[iStage], lQueue[iStage+1], nThreadNext)
+                                          , name="%s-%d"%(stage.sName, _i))
+                thread.daemon = True
+                thread.start()
+                lThread.append(thread)
+
+        #feeding the first stage (it blocks when the pipeline is full), then collecting the results
+        lItem = list(lItem)
+        nThreadFirst = self.lStage[0].nThread if self.lStage else 1
+        for i, item in enumerate(lItem): lQueue[0].put( (i, item, item, None) )
+        for _i in range(nThreadFirst): lQueue[0].put(self._END)
+        lResult = [None] * len(lItem)
+        while True:
+            task = lQueue[-1].get()
+            if task is self._END: break
+            i, item, value, sError = task
+            lResult[i] = (item, value, sError)
+        for thread in lThread: thread.join()
+        self.fTime += time.time() - t0
+        return lResult
+    
+    def _runStage(self, stage, qIn, qOut, nThreadNext):
+        while True:
+            t0 = time.time()
+            task = qIn.get()
+            t1 = time.time()
+            if task is self._END: break
+            i, item, value, sError = task
+            if sError is None:
+                try:
+                    value = stage.fun(value)
+                except Exception:
+                    value, sError = None, traceback.format_exc()
+                with stage.lock:
+                    stage.nItem += 1
+                    if sError: stage.nError += 1
+                    stage.fBusy += time.time() - t1
+            with stage.lock: stage.fWait += t1 - t0
+            qOut.put( (i, item, value, sError) )
+        with stage.lock:
+            stage.nRunning -= 1
+            bLast = stage.nRunning == 0
+        if bLast: 
+            for _i in range(nThreadNext): qOut.put(self._END)
+
+    def getReport(self):
+        """
+        return a list of one dictionary per stage: name, threads, items, errors, busy and waiting times (summed over 
+        the threads of the stage), and throughput (items per second of busy time of one thread)
+        """
+        return [ { "name"      : stage.sName
+                 , "threads"   : stage.nThread
+                 , "items"     : stage.nItem
+                 , "errors"    : stage.nError
+                 , "busy"      : stage.fBusy
+                 , "wait"      : stage.fWait
+                 , "throughput": stage.nItem * stage.nThread / stage.fBusy if stage.fBusy > 0 else None 
+                 } for stage in self.lStage ]
+
+    def formatReport(self):
+        """
+        return the report as a list of lines of text, the bottleneck stage being the one with the lowest throughput
+        """
+        lReport = self.getReport()
+        lThroughput = [d["throughput"] for d in lReport if d["throughput"]]
+        fMin = min(lThroughput) if lThroughput else None
+        lsLine = ["%-12s %7s %6s %6s %9s %9s %12s"%("stage", "threads", "items", "errors", "busy (s)", "wait (s)", "items/s")]
+        for d in lReport:
+            lsLine.append("%-12s %7d %6d %6d %9.3f %9.3f %12s%s"%(d["name"], d["threads"], d["items"], d["errors"], d["busy"], d["wait"]
+                                                               , "%.2f"%d["throughput"] if d["throughput"] else "-"
+                                                               , "  <-- bottleneck" if fMin and d["throughput"] == fMin else ""))
+        lsLine.append("total time: %.3fs"%self.fTime)
+        return lsLine
+
+
+# --- AUTO-TESTS ------------------------------------------------------------------
+def test_StagedPipeline():
+    def fail_on_3(n):
+        if n == 3: raise ValueError("3!")
+        return n
+    for iQueueSize in [1, 3]:
+        for nThread in [1, 3]:
+            pl = StagedPipeline(iQueueSize)
+            pl.addStage("double", lambda n: 2*n, nThread).addStage("check", lambda n: fail_on_3(n/2)).addStage("str", str, nThread)
+            lResult = pl.run(range(10))
+            assert [item for item, _v, _e in lResult] == range(10)
+            assert [v for _i, v, _e in lResult] == [str(n) if n != 3 else None for n in range(10)]
+            assert [bool(e) for _i, _v, e in lResult] == [n == 3 for n in range(10)]
+            assert "ValueError" in lResult[3][2]
+            assert [(d["items"], d["errors"]) for d in pl.getReport()] == [(10, 0), (10, 1), (9, 0)]
+            assert len(pl.formatReport()) == 5
+    assert StagedPipeline().run([1]) == [(1, 1, None)]
+    assert StagedPipeline().addStage("s", str).run([]) == []